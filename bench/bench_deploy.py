@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Deploy Pipeline Benchmarks
+
+Runs setup.py's orchestration against stand-in gcloud and terraform
+executables (fake_cli.py) with scripted latencies, so wall-clock time,
+subprocess count and peak memory can be measured without a GCP project.
+
+Each scenario runs in a fresh Python process with its own working
+directory, cache and gcloud config. Results are compared with
+bench/baselines.json; a scenario that spawns more subprocesses than its
+baseline, or runs noticeably slower, fails the run.
+
+Usage:
+    python3 bench/bench_deploy.py                    # run and compare
+    python3 bench/bench_deploy.py -s fleet-9         # one scenario
+    python3 bench/bench_deploy.py --update-baselines # record new baselines
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+BASELINES_FILE = BENCH_DIR / "baselines.json"
+
+# Scripted CLI latencies (seconds) shared by all scenarios
+LATENCY = {
+    "gcloud": 0.2,
+    "gcloud projects list": 0.6,
+    "terraform init": 0.4,
+    "terraform plan": 0.4,
+    "terraform apply": 0.8,
+    "terraform output": 0.1,
+}
+
+# Answers for the interactive wizard, in prompt order
+WIZARD_ANSWERS = [
+    "bench-project-0001",                       # project autocomplete
+    "bench-service",                            # service name
+    "us-central1 (Iowa, USA)",                  # region
+    True,                                       # public access
+    "standard (scales to zero, lowest cost)",   # performance profile
+    True,                                       # deploy now?
+]
+
+SCENARIOS = {
+    'wizard': "interactive wizard plus deploy of one service",
+    'non-interactive': "headless deploy of one service from flags",
+    'no-op-redeploy': "second headless deploy with an unchanged configuration",
+    'image-update': "headless redeploy where only the container image changed",
+    'fleet-9': "fleet deploy of one service to all nine regions",
+    'large-project-list': "wizard with 5000 projects in the listing",
+}
+
+# Allowed slowdown before a scenario counts as a regression
+DEFAULT_TOLERANCE = 0.15
+ABSOLUTE_SLACK = 0.25
+
+
+class _Answer:
+    """Mimics a questionary Question: .ask() returns the scripted answer."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def ask(self):
+        return self.value
+
+
+class ScriptedQuestionary:
+    """Replaces the questionary module with a fixed list of answers."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    @staticmethod
+    def Style(*args, **kwargs):
+        return None
+
+    def _next(self, *args, **kwargs):
+        if not self.answers:
+            raise RuntimeError("wizard asked more questions than the benchmark scripted")
+        return _Answer(self.answers.pop(0))
+
+    text = autocomplete = select = confirm = _next
+
+
+def load_setup_module():
+    """Import the deploy tool (datacommons_deploy.py) from the repository."""
+    spec = importlib.util.spec_from_file_location("dc_setup", REPO_DIR / "datacommons_deploy.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_service():
+    """Start fake_service.py on a free port; returns (process, url)."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "fake_service.py"), "--port", str(port),
+         "--latency-ms", "1", "--jitter-ms", "0"],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    process.stdout.readline()  # "Serving on ..." once it is listening
+    return process, f"http://127.0.0.1:{port}/"
+
+
+def prepare_environment(workdir, scenario, service_url):
+    """Create the fake CLIs, scenario file and isolated dirs; set the environment."""
+    bin_dir = workdir / "bin"
+    bin_dir.mkdir()
+    for tool in ("gcloud", "terraform"):
+        wrapper = bin_dir / tool
+        wrapper.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "fake_cli.py"}" {tool} "$@"\n'
+        )
+        wrapper.chmod(0o755)
+
+    config = {
+        'latency': LATENCY,
+        'projects': 5000 if scenario == 'large-project-list' else 25,
+        # Answers the readiness probe after each deploy
+        'service_url': service_url,
+    }
+    (workdir / "scenario.json").write_text(json.dumps(config))
+
+    shutil.copytree(REPO_DIR / "terraform", workdir / "terraform",
+                    ignore=shutil.ignore_patterns(".terraform", "*.tfstate*", "terraform.tfvars",
+                                                  "tfplan", ".dc-*", "apply.log*"))
+
+    os.environ.update({
+        'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+        'BENCH_FAKE_CONFIG': str(workdir / "scenario.json"),
+        'BENCH_FAKE_LOG': str(workdir / "calls.log"),
+        'XDG_CACHE_HOME': str(workdir / "cache"),
+        'XDG_DATA_HOME': str(workdir / "data"),
+        'CLOUDSDK_CONFIG': str(workdir / "gcloud"),
+    })
+    for name in list(os.environ):
+        if name.startswith("DC_DEPLOY_"):
+            del os.environ[name]
+
+
+# Flags for the headless scenarios
+HEADLESS_ARGS = [
+    "--non-interactive", "--project", "bench-project-0001",
+    "--service-name", "bench-service", "--region", "us-central1",
+]
+
+
+def warm_up(dc, scenario):
+    """Create the state a scenario starts from; this part is not measured."""
+    if scenario in ('no-op-redeploy', 'image-update'):
+        if not run_scenario(dc, 'non-interactive'):
+            raise RuntimeError("warm-up deploy failed")
+        Path(os.environ['BENCH_FAKE_LOG']).write_text("")
+
+
+def run_scenario(dc, scenario):
+    """Run one scenario against the imported setup module; True on success."""
+    if scenario in ('wizard', 'large-project-list'):
+        dc.load_ui(check_dependencies=False)
+        from rich.console import Console
+        dc.console = Console(file=sys.stdout)
+        dc.questionary = ScriptedQuestionary(WIZARD_ANSWERS)
+        preflight = dc.start_preflight()
+        config = dc.collect_configuration(preflight)
+        if not config:
+            raise RuntimeError("wizard did not produce a configuration")
+        return dc.deploy_infrastructure(config, preflight)
+
+    if scenario in ('non-interactive', 'no-op-redeploy'):
+        return dc.run_non_interactive(dc.parse_args(HEADLESS_ARGS)) == 0
+
+    if scenario == 'image-update':
+        args = dc.parse_args(HEADLESS_ARGS + ["--image", "gcr.io/bench/app:2"])
+        return dc.run_non_interactive(args) == 0
+
+    if scenario == 'fleet-9':
+        manifest = Path("fleet.json")
+        manifest.write_text(json.dumps({'targets': [
+            {'project_id': "bench-project-0001", 'service_name': "bench-service",
+             'regions': "all"},
+        ]}))
+        return dc.run_fleet(dc.parse_args(["fleet", str(manifest), "--max-parallel", "9"])) == 0
+
+    raise ValueError(f"unknown scenario: {scenario}")
+
+
+def wait_for_background_work(dc, timeout=30):
+    """Wait for the state sync a fast-path deploy starts, so its calls are counted."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        shards = (dc.DEPLOY_STATE_DIR / "targets").glob("*/*/*")
+        if not any((dc.last_deploy(shard) or {}).get('pending_sync') for shard in shards):
+            return
+        time.sleep(0.05)
+    raise RuntimeError("background state sync did not finish")
+
+
+def child_main(scenario):
+    """Entry point of the per-scenario child process; prints one JSON line."""
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{scenario}-"))
+    service, service_url = start_service()
+    try:
+        prepare_environment(workdir, scenario, service_url)
+        os.chdir(workdir)
+        dc = load_setup_module()
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            warm_up(dc, scenario)
+            started = time.perf_counter()
+            success = run_scenario(dc, scenario)
+            wall = time.perf_counter() - started
+            wait_for_background_work(dc)
+
+        calls = Path(os.environ['BENCH_FAKE_LOG']).read_text().splitlines()
+        print(json.dumps({
+            'success': bool(success),
+            'wall_s': round(wall, 3),
+            'subprocesses': len(calls),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }))
+    finally:
+        service.kill()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(scenario, repeat):
+    """Run a scenario repeat times in child processes.
+
+    Reports the fastest wall time, the highest subprocess count and the
+    highest peak RSS seen, so noise only ever hides a slowdown, never an
+    extra subprocess.
+    """
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, __file__, "--run-scenario", scenario],
+            capture_output=True,
+            text=True,
+            cwd=REPO_DIR
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{scenario} crashed:\n{result.stderr}")
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None:
+            best = run
+            continue
+        best = {
+            'success': best['success'] and run['success'],
+            'wall_s': min(best['wall_s'], run['wall_s']),
+            'subprocesses': max(best['subprocesses'], run['subprocesses']),
+            'peak_rss_mb': max(best['peak_rss_mb'], run['peak_rss_mb']),
+        }
+    return best
+
+
+def compare(scenario, result, baseline, tolerance):
+    """Return the ways result regressed against baseline (empty if none)."""
+    problems = []
+    if not result['success']:
+        problems.append("deploy failed")
+    if result['subprocesses'] > baseline['subprocesses']:
+        problems.append(
+            f"subprocesses {baseline['subprocesses']} -> {result['subprocesses']}"
+        )
+    if result['wall_s'] > baseline['wall_s'] * (1 + tolerance) + ABSOLUTE_SLACK:
+        problems.append(f"wall time {baseline['wall_s']:.2f}s -> {result['wall_s']:.2f}s")
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + 2 * tolerance):
+        problems.append(
+            f"peak RSS {baseline['peak_rss_mb']:.0f}MB -> {result['peak_rss_mb']:.0f}MB"
+        )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark setup.py's deploy pipeline.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per scenario; the fastest is reported (default: 3)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown (default: 0.15)")
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="store these results as the new baselines")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        child_main(args.run_scenario)
+        return 0
+
+    baselines = json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+    scenarios = args.scenario or list(SCENARIOS)
+    regressions = 0
+
+    print(f"{'scenario':<22}{'wall':>9}{'procs':>8}{'rss':>9}  result")
+    for scenario in scenarios:
+        result = measure(scenario, args.repeat)
+        baseline = baselines.get(scenario)
+        if args.update_baselines or baseline is None:
+            verdict = "baseline recorded" if args.update_baselines else "no baseline"
+        else:
+            problems = compare(scenario, result, baseline, args.tolerance)
+            regressions += bool(problems)
+            verdict = "REGRESSION: " + "; ".join(problems) if problems else "ok"
+
+        print(f"{scenario:<22}{result['wall_s']:>8.2f}s{result['subprocesses']:>8}"
+              f"{result['peak_rss_mb']:>7.0f}MB  {verdict}")
+
+        if args.update_baselines:
+            baselines[scenario] = result
+
+    if args.update_baselines:
+        BASELINES_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaselines written to {BASELINES_FILE.relative_to(REPO_DIR)}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the gcloud and terraform CLIs used by the deploy benchmarks.
+
+Invoked through small wrapper scripts as: fake_cli.py TOOL [ARGS...]
+Behaviour comes from the scenario file named by BENCH_FAKE_CONFIG:
+
+    latency   - seconds per command prefix, e.g. {"terraform apply": 0.5}
+    failures  - fail the first N calls of a command prefix
+    failure_message - error text of those failures, e.g. a transient
+                "Error 503: backendError"
+    projects  - number of projects 'gcloud projects list' returns
+    page_latency - extra seconds between pages of --page-size projects
+    service_url - URL 'terraform output' reports (e.g. a fake_service.py)
+    services  - [{"name", "region"}] listed by 'gcloud run services list'
+    service_ready - Ready condition status 'gcloud run services describe' reports
+
+Every invocation is appended to BENCH_FAKE_LOG so the harness can count
+subprocesses.
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_LATENCY = 0.05
+
+
+def command_name(tool, args):
+    """Return e.g. 'terraform apply' or 'gcloud auth print-access-token'."""
+    words = [arg for arg in args if not arg.startswith('-')]
+    return " ".join([tool] + words[:2])
+
+
+def lookup(table, command, default=None):
+    """Find the entry for the longest prefix of command in table."""
+    matches = [prefix for prefix in table if command.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else default
+
+
+def should_fail(scenario, command, counters_dir):
+    """Fail the first N calls of a command prefix, as scripted."""
+    limit = lookup(scenario.get('failures', {}), command, 0)
+    if not limit:
+        return False
+    # Concurrent calls (fleet targets) share the counter; serialize them
+    with open(counters_dir / (command.replace(" ", "_") + ".count"), "a+") as counter:
+        fcntl.flock(counter, fcntl.LOCK_EX)
+        counter.seek(0)
+        calls = int(counter.read() or 0)
+        counter.truncate(0)
+        counter.write(str(calls + 1))
+    return calls < limit
+
+
+def option(args, name):
+    """Return the value of a --name=value argument, or None."""
+    for arg in args:
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def fake_gcloud(args, scenario):
+    command = command_name("gcloud", args)
+    if command == "gcloud auth print-access-token":
+        print("ya29.bench-token")
+    elif command == "gcloud projects list":
+        page_size = int(option(args, "--page-size") or 0)
+        for index in range(scenario.get('projects', 2)):
+            if page_size and index and index % page_size == 0:
+                sys.stdout.flush()
+                time.sleep(scenario.get('page_latency', 0))
+            print(f"bench-project-{index:04d}\tBench Project {index}")
+    elif command.startswith("gcloud projects describe"):
+        print(f"projectId: {args[2]}")
+    elif args[:3] == ["run", "services", "list"]:
+        print(json.dumps([
+            {'metadata': {'name': service['name'],
+                          'labels': {'cloud.googleapis.com/location': service['region']}}}
+            for service in scenario.get('services', [])
+        ]))
+    elif args[:3] == ["run", "services", "describe"]:
+        ready = scenario.get('service_ready', "True")
+        print(json.dumps({'status': {'conditions': [
+            {'type': 'Ready', 'status': ready,
+             'message': None if ready == "True" else "Revision failed to start"},
+        ]}}))
+    else:
+        print("{}")
+    return 0
+
+
+def fake_terraform(args, scenario, latency):
+    command = command_name("terraform", args)
+    if command == "terraform init":
+        Path(".terraform/providers/registry.terraform.io/hashicorp/google").mkdir(
+            parents=True, exist_ok=True
+        )
+        Path(".terraform.lock.hcl").touch()
+        print("Terraform has been successfully initialized!")
+        return 0
+    
+    if command == "terraform plan":
+        for arg in args:
+            if arg.startswith("-out="):
+                Path(arg[len("-out="):]).write_text("bench plan")
+        print("Plan: 2 to add, 0 to change, 0 to destroy.")
+        return 2 if "-detailed-exitcode" in args else 0
+    
+    if command.startswith("terraform apply"):
+        resources = [
+            "google_cloud_run_service.nginx",
+            "google_cloud_run_service_iam_member.public_access[0]",
+        ]
+        for addr in resources:
+            hook = {'resource': {'addr': addr}, 'action': 'create'}
+            print(json.dumps({'@level': 'info', '@message': f"{addr}: Creating...",
+                              'type': 'apply_start', 'hook': hook}), flush=True)
+            time.sleep(latency / len(resources))
+            print(json.dumps({'@level': 'info', '@message': f"{addr}: Creation complete",
+                              'type': 'apply_complete', 'hook': hook}), flush=True)
+        
+        state_file = Path("terraform.tfstate")
+        serial = json.loads(state_file.read_text())['serial'] if state_file.exists() else 0
+        state_file.write_text(json.dumps({'lineage': 'bench', 'serial': serial + 1,
+                                          'resources': [{'name': addr} for addr in resources]}))
+        print(json.dumps({'@level': 'info', '@message': "Apply complete!",
+                          'type': 'change_summary'}))
+        return 0
+    
+    if command == "terraform destroy":
+        state_file = Path("terraform.tfstate")
+        serial = json.loads(state_file.read_text())['serial'] if state_file.exists() else 0
+        state_file.write_text(json.dumps({'lineage': 'bench', 'serial': serial + 1,
+                                          'resources': []}))
+        print("Destroy complete! Resources: 2 destroyed.")
+        return 0
+    
+    if command.startswith("terraform output"):
+        sys.stdout.write(scenario.get('service_url', "https://bench-service-abc123-uc.a.run.app"))
+        return 0
+    
+    print("ok")
+    return 0
+
+
+def main():
+    tool, args = sys.argv[1], sys.argv[2:]
+    scenario = json.loads(Path(os.environ['BENCH_FAKE_CONFIG']).read_text())
+    command = command_name(tool, args)
+    
+    with open(os.environ['BENCH_FAKE_LOG'], "a") as log:
+        log.write(command + "\n")
+    
+    latency = lookup(scenario.get('latency', {}), command, DEFAULT_LATENCY)
+    counters_dir = Path(os.environ['BENCH_FAKE_LOG']).parent / "counters"
+    counters_dir.mkdir(exist_ok=True)
+    
+    if should_fail(scenario, command, counters_dir):
+        time.sleep(latency)
+        message = scenario.get('failure_message', f"scripted failure of {command}")
+        print(f"Error: {message}", file=sys.stderr)
+        return 1
+    
+    if tool == "terraform":
+        # apply spreads its latency over the streamed resource events
+        if not command.startswith("terraform apply"):
+            time.sleep(latency)
+        return fake_terraform(args, scenario, latency)
+    
+    time.sleep(latency)
+    return fake_gcloud(args, scenario)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Stand-in HTTP service for load testing without a Cloud Run deployment.
+
+Answers every GET with a small body after a configurable delay. The first
+request is slowed by --cold-start to mimic a new revision starting up, and
+--error-rate makes that fraction of requests fail with 503.
+
+Usage:
+    python3 bench/fake_service.py --port 8080 --latency-ms 20 --cold-start-ms 800
+    python3 setup.py loadtest http://127.0.0.1:8080/ --slo-p95-ms 100
+"""
+
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency, jitter, cold_start, error_rate):
+    state = {'cold': True}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with lock:
+                cold, state['cold'] = state['cold'], False
+            time.sleep((cold_start if cold else 0) + latency + random.uniform(0, jitter))
+
+            status = 503 if random.random() < error_rate else 200
+            body = b'{"status": "ok"}\n' if status == 200 else b'{"status": "unavailable"}\n'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stand-in HTTP service.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="base response delay (default: 20)")
+    parser.add_argument("--jitter-ms", type=float, default=10,
+                        help="random extra delay up to this much (default: 10)")
+    parser.add_argument("--cold-start-ms", type=float, default=0,
+                        help="extra delay for the first request (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="fraction of requests answered with 503 (default: 0)")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency_ms / 1000, args.jitter_ms / 1000,
+                           args.cold_start_ms / 1000, args.error_rate)
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    server.daemon_threads = True
+    print(f"Serving on http://127.0.0.1:{args.port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
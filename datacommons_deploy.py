@@ -0,0 +1,5623 @@
+"""
+Data Commons Cloud Run Deployment Tool
+
+Fully automated deployment tool - user only selects options,
+everything else is handled automatically including Terraform execution.
+
+Run it through setup.py. Python only caches the bytecode of imported
+modules, so keeping the code here spares every run a recompile.
+"""
+
+import argparse
+import bisect
+import calendar
+import configparser
+import contextlib
+import fnmatch
+import hashlib
+import heapq
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Terminal UI libraries. They are imported on first use by load_ui() so
+# that runs which never draw the wizard do not pay for importing them.
+questionary = None
+Live = Panel = Progress = SpinnerColumn = TextColumn = TimeElapsedColumn = None
+Table = Text = box = None
+
+# Only needed by the load test, and slow to import; loaded by run_load_test()
+asyncio = ssl = None
+
+REQUIREMENTS_FILE = Path(__file__).resolve().parent / "requirements.txt"
+# The command-line entry point, which background processes are started with
+ENTRY_POINT = Path(__file__).resolve().parent / "setup.py"
+
+# Terraform configuration, and per-target working directories for fleet deploys
+TERRAFORM_DIR = Path("terraform")
+DEPLOY_STATE_DIR = Path(".deploy")
+
+# Rich markup tags such as [bold cyan] or [/dim]; only style names count, so
+# bracketed text from other tools, like [default], is kept, as are escaped brackets
+_MARKUP_STYLE = (r"(?:not )?(?:bold|dim|italic|underline|strike|reverse|blink|on"
+                 r"|(?:bright_)?(?:black|red|green|yellow|blue|magenta|cyan|white)|#[0-9a-f]{6})")
+_MARKUP_TAG = re.compile(
+    rf"(?<!\\)\[(?:/|/?{_MARKUP_STYLE}(?: {_MARKUP_STYLE})*|/?link(?:=[^\[\]]*)?)\]",
+    re.IGNORECASE
+)
+
+
+class PlainConsole:
+    """Minimal stand-in for rich's Console used until the UI is loaded.
+    
+    Accepts the same print() calls as rich but strips markup and writes
+    plain text, so shared code paths work without importing rich.
+    """
+    
+    def __init__(self, file=None):
+        # None follows sys.stdout, even if it is replaced later
+        self.file = file
+    
+    def print(self, *objects, sep=" ", end="\n", **kwargs):
+        text = sep.join(str(obj) for obj in objects)
+        text = _MARKUP_TAG.sub("", text).replace("\\[", "[").replace("\\]", "]")
+        print(text, end=end, flush=True, file=self.file or sys.stdout)
+
+
+console = PlainConsole()
+
+
+def use_stderr_console():
+    """Send console output to stderr, so stdout carries only a JSON document."""
+    global console
+    console = PlainConsole(sys.stderr)
+
+
+def print_welcome_banner():
+    """Display professional 3D welcome banner."""
+    banner = """
+    ██████╗  █████╗ ████████╗ █████╗      ██████╗ ██████╗ ███╗   ███╗███╗   ███╗ ██████╗ ███╗   ██╗███████╗
+    ██╔══██╗██╔══██╗╚══██╔══╝██╔══██╗    ██╔════╝██╔═══██╗████╗ ████║████╗ ████║██╔═══██╗████╗  ██║██╔════╝
+    ██║  ██║███████║   ██║   ███████║    ██║     ██║   ██║██╔████╔██║██╔████╔██║██║   ██║██╔██╗ ██║███████╗
+    ██║  ██║██╔══██║   ██║   ██╔══██║    ██║     ██║   ██║██║╚██╔╝██║██║╚██╔╝██║██║   ██║██║╚██╗██║╚════██║
+    ██████╔╝██║  ██║   ██║   ██║  ██║    ╚██████╗╚██████╔╝██║ ╚═╝ ██║██║ ╚═╝ ██║╚██████╔╝██║ ╚████║███████║
+    ╚═════╝ ╚═╝  ╚═╝   ╚═╝   ╚═╝  ╚═╝     ╚═════╝ ╚═════╝ ╚═╝     ╚═╝╚═╝     ╚═╝ ╚═════╝ ╚═╝  ╚═══╝╚══════╝
+    """
+    
+    subtitle = """
+         ██████╗██╗      ██████╗ ██╗   ██╗██████╗     ██████╗ ██╗   ██╗███╗   ██╗
+        ██╔════╝██║     ██╔═══██╗██║   ██║██╔══██╗    ██╔══██╗██║   ██║████╗  ██║
+        ██║     ██║     ██║   ██║██║   ██║██║  ██║    ██████╔╝██║   ██║██╔██╗ ██║
+        ██║     ██║     ██║   ██║██║   ██║██║  ██║    ██╔══██╗██║   ██║██║╚██╗██║
+        ╚██████╗███████╗╚██████╔╝╚██████╔╝██████╔╝    ██║  ██║╚██████╔╝██║ ╚████║
+         ╚═════╝╚══════╝ ╚═════╝  ╚═════╝ ╚═════╝     ╚═╝  ╚═╝ ╚═════╝ ╚═╝  ╚═══╝
+    """
+    
+    console.print(banner, style="bold cyan", highlight=False)
+    console.print(subtitle, style="bold blue", highlight=False)
+    console.print()
+    console.print("    " + "═" * 90, style="dim blue")
+    console.print("                       AUTOMATED DEPLOYMENT TOOL - NO COMMANDS NEEDED", style="bold white")
+    console.print("    " + "═" * 90, style="dim blue")
+    console.print()
+    
+    description = Text()
+    description.append("This tool handles everything automatically:\n\n", style="white")
+    description.append("  ✓ Configuration collection and validation\n", style="green")
+    description.append("  ✓ Terraform initialization and planning\n", style="green")
+    description.append("  ✓ Infrastructure deployment\n", style="green")
+    description.append("  ✓ Service URL retrieval\n\n", style="green")
+    description.append("You only need to answer a few questions. Everything else is automated.", style="dim white")
+    
+    console.print(Panel(
+        description,
+        border_style="blue",
+        box=box.ROUNDED,
+        padding=(1, 2)
+    ))
+    console.print()
+
+
+# Input formats enforced by terraform/variables.tf
+PROJECT_ID_PATTERN = r'^[a-z][a-z0-9-]{4,28}[a-z0-9]$'
+SERVICE_NAME_PATTERN = r'^[a-z0-9][a-z0-9-]{0,61}[a-z0-9]$|^[a-z0-9]$'
+CPU_LIMIT_PATTERN = r'^[0-9]+m$'
+MEMORY_LIMIT_PATTERN = r'^[0-9]+(Mi|Gi)$'
+
+
+def validate_project_id(text):
+    """Validate GCP project ID format.
+    
+    Returns:
+        True if valid, otherwise the error message (questionary's
+        validate= convention)
+    """
+    if not re.match(PROJECT_ID_PATTERN, text):
+        return ("Invalid project ID format. Must be 6-30 characters, "
+                "lowercase letters, numbers, and hyphens only. "
+                "Must start with a letter.")
+    return True
+
+
+def validate_service_name(text):
+    """Validate Cloud Run service name format.
+    
+    Returns:
+        True if valid, otherwise the error message
+    """
+    if not re.match(SERVICE_NAME_PATTERN, text):
+        return ("Invalid service name. Must be 1-63 characters, "
+                "lowercase letters, numbers, and hyphens. "
+                "Must start and end with alphanumeric character.")
+    return True
+
+
+def get_available_regions():
+    """Return list of available GCP regions for Cloud Run."""
+    return [
+        "us-central1 (Iowa, USA)",
+        "us-east1 (South Carolina, USA)",
+        "us-east4 (Virginia, USA)",
+        "us-west1 (Oregon, USA)",
+        "europe-west1 (Belgium)",
+        "europe-west4 (Netherlands)",
+        "asia-east1 (Taiwan)",
+        "asia-northeast1 (Tokyo, Japan)",
+        "asia-southeast1 (Singapore)",
+    ]
+
+
+def get_region_ids():
+    """Return the region identifiers accepted by terraform/variables.tf."""
+    return [region.split(' ')[0] for region in get_available_regions()]
+
+
+# Local cache for gcloud results that rarely change between runs
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache") / "datacommons-deploy"
+
+# How long cached entries stay valid (seconds)
+PROJECTS_CACHE_TTL = 60 * 60
+PROJECT_ACCESS_CACHE_TTL = 60 * 60
+APIS_ENABLED_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Refresh tokens this long before they actually expire
+TOKEN_EXPIRY_MARGIN = 5 * 60
+# Used when the token's real expiry cannot be determined
+TOKEN_FALLBACK_TTL = 5 * 60
+
+# Set by --no-cache: ignore cached entries (fresh results are still stored)
+cache_bypass = os.environ.get('DC_DEPLOY_NO_CACHE') == '1'
+
+# Projects are listed a page at a time, so the picker can open on the first page
+PROJECT_PAGE_SIZE = 500
+# Stop a project listing that produces no page for this long (seconds)
+PROJECT_PAGE_TIMEOUT = 60
+
+# Set by --projects-in and --project-label: server-side filters for the
+# project listing ("folders/ID" or "organizations/ID", and KEY=VALUE)
+project_parent = os.environ.get('DC_DEPLOY_PROJECTS_IN')
+project_labels = []
+
+# Set by --upgrade: let terraform init upgrade providers and modules
+upgrade_providers = False
+
+# Set by --force-plan: always run terraform plan, even for unchanged inputs
+force_plan = False
+
+# Set by --full-refresh: refresh every resource in the next plan instead of
+# only those whose inputs changed
+full_refresh = False
+
+# Set by --parallelism: concurrent operations in terraform plan and apply
+# (None keeps Terraform's default of 10)
+terraform_parallelism = None
+
+# Terraform providers are downloaded once into this shared cache and
+# linked into each working directory by terraform init
+PLUGIN_CACHE_DIR = CACHE_DIR / "terraform-plugins"
+
+# Set by --provider-mirror: local filesystem mirror to install providers from
+provider_mirror = os.environ.get('DC_DEPLOY_PROVIDER_MIRROR')
+
+# Terraform does not guarantee the plugin cache is safe for concurrent
+# installs, so inits sharing it run one at a time, across processes too
+PLUGIN_CACHE_LOCK_FILE = ".dc-init.lock"
+PLUGIN_CACHE_LOCK_TIMEOUT = 15 * 60
+
+
+def _gcloud_config_dir():
+    """Return the gcloud configuration directory."""
+    return Path(os.environ.get('CLOUDSDK_CONFIG') or Path.home() / ".config" / "gcloud")
+
+
+def get_active_account():
+    """Return the active gcloud account without launching gcloud.
+    
+    Reads the active configuration file directly; falls back to 'default'
+    when no account is configured (the cache then stays per-machine).
+    """
+    account = os.environ.get('CLOUDSDK_CORE_ACCOUNT', '').strip()
+    if account:
+        return account
+    
+    try:
+        config_dir = _gcloud_config_dir()
+        active_file = config_dir / "active_config"
+        active = active_file.read_text().strip() if active_file.exists() else "default"
+        parser = configparser.ConfigParser()
+        parser.read(config_dir / "configurations" / f"config_{active or 'default'}")
+        return parser.get('core', 'account', fallback='default').strip() or 'default'
+    except Exception:
+        return 'default'
+
+
+def _cache_path(namespace, key):
+    """Return the cache file for a key within a namespace."""
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return CACHE_DIR / namespace / f"{digest}.json"
+
+
+def cache_get(namespace, key):
+    """Return the cached value for key, or None if missing, stale or bypassed."""
+    if cache_bypass:
+        return None
+    
+    path = _cache_path(namespace, key)
+    try:
+        entry = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    
+    if entry.get('key') != key or entry.get('expires_at', 0) <= time.time():
+        # Stale entry - evict it
+        path.unlink(missing_ok=True)
+        return None
+    return entry['value']
+
+
+def cache_put(namespace, key, value, ttl):
+    """Store value under key for ttl seconds.
+    
+    Entries are written atomically and readable only by the current user,
+    since the token cache holds credentials.
+    """
+    if ttl <= 0:
+        return
+    
+    path = _cache_path(namespace, key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        entry = {'key': key, 'expires_at': time.time() + ttl, 'value': value}
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Caching is best effort
+        pass
+
+
+def cache_delete(namespace, key):
+    """Remove a cached entry, e.g. one a failed command showed to be stale."""
+    try:
+        _cache_path(namespace, key).unlink(missing_ok=True)
+    except OSError:
+        # Caching is best effort
+        pass
+
+
+def prune_cache():
+    """Evict every expired entry from the cache directory."""
+    if not CACHE_DIR.exists():
+        return
+    
+    now = time.time()
+    for path in CACHE_DIR.glob("*/*.json"):
+        try:
+            if json.loads(path.read_text()).get('expires_at', 0) <= now:
+                path.unlink()
+        except (OSError, ValueError):
+            path.unlink(missing_ok=True)
+
+
+def _token_expiry(token):
+    """Look up when gcloud's cached access token expires.
+    
+    gcloud may hand back a token it issued earlier, so the time it was
+    printed says little about how long it stays valid. gcloud records the
+    real expiry in its access token database; None if it cannot be found.
+    """
+    db_path = _gcloud_config_dir() / "access_tokens.db"
+    if not db_path.exists():
+        return None
+    
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=1)
+        try:
+            row = conn.execute(
+                "SELECT token_expiry FROM access_tokens WHERE access_token = ?",
+                (token,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    
+    if not row or not row[0]:
+        return None
+    
+    try:
+        # Stored as a naive UTC timestamp, e.g. "2024-01-01 12:00:00.000000"
+        expiry = time.strptime(row[0].split('.')[0], "%Y-%m-%d %H:%M:%S")
+        return calendar.timegm(expiry)
+    except ValueError:
+        return None
+
+
+def _dependency_fingerprint():
+    """Identify the interpreter and requirements the dependency check covers."""
+    try:
+        requirements = REQUIREMENTS_FILE.read_bytes()
+    except OSError:
+        requirements = b""
+    digest = hashlib.sha256(requirements)
+    digest.update(sys.executable.encode())
+    digest.update(sys.version.encode())
+    return digest.hexdigest()
+
+
+def ensure_dependencies():
+    """Make sure the terminal UI libraries are installed.
+    
+    A marker in the cache directory records the last successful check for
+    this interpreter and requirements.txt, so normal runs cost one small
+    file read. Without a marker, the packages are located with find_spec
+    (which does not import them) and installed only if missing.
+    """
+    marker = CACHE_DIR / "deps-ok"
+    fingerprint = _dependency_fingerprint()
+    try:
+        if marker.read_text() == fingerprint:
+            return
+    except OSError:
+        pass
+    
+    missing = [
+        name for name in ("rich", "questionary")
+        if importlib.util.find_spec(name) is None
+    ]
+    if missing:
+        print("Installing required dependencies...")
+        print("This will take about 10-15 seconds...")
+        try:
+            # Install dependencies with --user flag for Cloud Shell compatibility
+            subprocess.check_call([
+                sys.executable, "-m", "pip", "install",
+                "--user", "-q", "-r", str(REQUIREMENTS_FILE)
+            ])
+            
+            # Make the freshly created user site-packages importable
+            import site
+            site.addsitedir(site.getusersitepackages())
+            importlib.invalidate_caches()
+            
+            print("Dependencies installed successfully!")
+        except Exception as e:
+            print(f"\nError installing dependencies: {e}")
+            print("\nPlease install manually:")
+            print("  pip3 install --user -r requirements.txt")
+            print("\nThen run the script again:")
+            print("  python3 setup.py")
+            sys.exit(1)
+    
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        marker.write_text(fingerprint)
+    except OSError:
+        pass
+
+
+def load_ui(check_dependencies=True):
+    """Import rich and questionary and switch console output to rich.
+    
+    Args:
+        check_dependencies: Verify (and if needed install) the packages
+            first; --fast-start skips this and assumes they are present
+    """
+    global questionary, Live, Panel, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+    global Table, Text, box, console
+    
+    if questionary is not None:
+        return
+    
+    if check_dependencies:
+        ensure_dependencies()
+    
+    try:
+        import questionary
+        from rich import box
+        from rich.console import Console
+        from rich.live import Live
+        from rich.panel import Panel
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+        from rich.table import Table
+        from rich.text import Text
+    except ImportError:
+        if not check_dependencies:
+            raise
+        # The marker is stale (packages removed since); check again properly
+        (CACHE_DIR / "deps-ok").unlink(missing_ok=True)
+        ensure_dependencies()
+        import questionary
+        from rich import box
+        from rich.console import Console
+        from rich.live import Live
+        from rich.panel import Panel
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+        from rich.table import Table
+        from rich.text import Text
+    
+    console = Console()
+
+
+@contextlib.contextmanager
+def spinner(description, transient=True, style="cyan"):
+    """Show a spinner while the block runs.
+    
+    Yields the rich Progress (None when the UI is not loaded, in which
+    case the description is printed once instead).
+    """
+    if Progress is None:
+        console.print(description)
+        yield None
+        return
+    
+    with Progress(
+        SpinnerColumn(style=style),
+        TextColumn(f"[{style}]{{task.description}}[/{style}]"),
+        console=console,
+        transient=transient
+    ) as progress:
+        progress.add_task(description, total=None)
+        yield progress
+
+
+class Tracer:
+    """Records timing spans and exports them as a Chrome trace.
+    
+    Spans are thread-safe, so concurrent preflight calls and fleet targets
+    show up on their own lanes in chrome://tracing or Perfetto.
+    """
+    
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """Time the enclosed block as one span."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            with self.lock:
+                self.spans.append({
+                    'name': name,
+                    'cat': category,
+                    'ph': 'X',
+                    'ts': round((start - self.origin) * 1e6),
+                    'dur': round((end - start) * 1e6),
+                    'pid': os.getpid(),
+                    'tid': thread.native_id,
+                    'args': {**args, 'thread': thread.name},
+                })
+    
+    def to_chrome_trace(self):
+        """Return the spans in Chrome trace event format."""
+        with self.lock:
+            events = sorted(self.spans, key=lambda span: span['ts'])
+        threads = {(span['tid'], span['args']['thread']) for span in events}
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+             'args': {'name': name}}
+            for tid, name in sorted(threads)
+        ]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+    
+    def write(self, path):
+        """Write the trace as JSON to path."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_chrome_trace()))
+        return path
+    
+    def summary(self):
+        """Aggregate span durations by category and name.
+        
+        Returns:
+            list: (category, name, count, total seconds) in first-seen order
+        """
+        totals = {}
+        with self.lock:
+            for span in sorted(self.spans, key=lambda span: span['ts']):
+                key = (span['cat'], span['name'])
+                count, total = totals.get(key, (0, 0))
+                totals[key] = (count + 1, total + span['dur'] / 1e6)
+        return [(cat, name, count, total) for (cat, name), (count, total) in totals.items()]
+    
+    def stage_totals(self, since=0.0, target=None):
+        """Total seconds per stage span started at or after since.
+        
+        Args:
+            since: time.perf_counter() value
+            target: Only count spans recorded with this target argument
+        """
+        start = (since - self.origin) * 1e6
+        totals = {}
+        with self.lock:
+            for span in sorted(self.spans, key=lambda span: span['ts']):
+                if (span['cat'] == 'stage' and span['ts'] >= start
+                        and span['args'].get('target') == target):
+                    totals[span['name']] = round(totals.get(span['name'], 0) + span['dur'] / 1e6, 3)
+        return totals
+
+
+tracer = Tracer()
+
+# Traces are written here by default; only the most recent ones are kept
+TRACE_DIR = DEPLOY_STATE_DIR / "traces"
+TRACE_KEEP = 20
+
+
+def run_subprocess(cmd, **kwargs):
+    """subprocess.run() wrapped in a timing span named after the command."""
+    words = [word for word in cmd if not word.startswith('-')][:3]
+    with tracer.span(" ".join(words), "subprocess", cmd=" ".join(cmd)):
+        return subprocess.run(cmd, **kwargs)
+
+
+def write_trace(path=None):
+    """Write the run's trace file, pruning old default traces.
+    
+    Returns:
+        Path: The trace file written
+    """
+    if path is None:
+        path = TRACE_DIR / f"deploy-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json"
+        old_traces = sorted(TRACE_DIR.glob("deploy-*.json"))[:-(TRACE_KEEP - 1)]
+        for old_trace in old_traces:
+            old_trace.unlink(missing_ok=True)
+    return tracer.write(path)
+
+
+def print_timing_summary():
+    """Print where the run's time went: stages, then subprocesses by command."""
+    rows = tracer.summary()
+    stages = [row for row in rows if row[0] == 'stage']
+    commands = sorted((row for row in rows if row[0] == 'subprocess'), key=lambda row: -row[3])
+    
+    console.print()
+    if Table is None:
+        console.print("Timing summary")
+        for category, name, count, total in stages + commands:
+            console.print(f"  {name:<36}{category:<12}{count:>4}x {total:>8.2f}s")
+        return
+    
+    table = Table(title="Timing summary", box=box.SIMPLE, padding=(0, 1))
+    table.add_column("Span", style="cyan")
+    table.add_column("Kind", style="dim")
+    table.add_column("Count", justify="right")
+    table.add_column("Total", justify="right")
+    for category, name, count, total in stages + commands:
+        table.add_row(name, category, str(count), f"{total:.2f}s")
+    console.print(table)
+
+
+def run_in_background(fn, *args):
+    """Run fn(*args) on a daemon thread and return a Future for its result.
+    
+    Daemon threads are used instead of a ThreadPoolExecutor so that a slow
+    gcloud call still in flight never blocks the interpreter from exiting
+    when the user cancels the wizard.
+    """
+    future = Future()
+    
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=runner, daemon=True).start()
+    return future
+
+
+def fetch_access_token():
+    """Return a gcloud access token, or None if the user is not authenticated.
+    
+    Tokens are cached per account until shortly before they expire.
+    """
+    account = get_active_account()
+    cached = cache_get("tokens", account)
+    if cached:
+        return cached
+    
+    try:
+        result = run_subprocess(
+            ["gcloud", "auth", "print-access-token"],
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            token = result.stdout.strip()
+            expiry = _token_expiry(token)
+            if expiry is not None:
+                ttl = expiry - time.time() - TOKEN_EXPIRY_MARGIN
+            else:
+                ttl = TOKEN_FALLBACK_TTL
+            cache_put("tokens", account, token, ttl)
+            return token
+        return None
+    except Exception:
+        return None
+
+
+def configure_gcloud_project(project_id):
+    """Point the gcloud CLI at the project (default and billing/quota project).
+    
+    Both settings are written to the same gcloud properties file, so they
+    run one after the other; callers overlap this with other work instead.
+    
+    Returns:
+        bool: True if the active project was set
+    """
+    # Set the active project (default project)
+    result = run_subprocess(
+        ["gcloud", "config", "set", "project", project_id],
+        capture_output=True,
+        timeout=300
+    )
+    
+    # Also set the billing/quota project (important for API calls)
+    run_subprocess(
+        ["gcloud", "config", "set", "billing/quota_project", project_id],
+        capture_output=True,
+        timeout=300
+    )
+    
+    return result.returncode == 0
+
+
+def start_preflight():
+    """Start the independent gcloud preflight calls concurrently.
+    
+    The access token check and the project listing do not depend on each
+    other, so both gcloud processes are launched together and the wizard
+    consumes the results as it needs them.
+    
+    The project listing streams into the picker's search index page by
+    page, so 'project_index' fills up while the listing is still running.
+    
+    Returns:
+        dict: Futures keyed by 'token' and 'projects', plus 'project_index'
+    """
+    index = ProjectIndex()
+    return {
+        'token': run_in_background(fetch_access_token),
+        'projects': run_in_background(get_available_projects, index.add),
+        'project_index': index,
+    }
+
+
+def terraform_env(project_id, token):
+    """Build the environment for Terraform commands against one project.
+    
+    Unlike ensure_gcloud_auth(), this changes neither the gcloud config nor
+    os.environ, so it is safe for concurrent deploys to different projects.
+    """
+    # Create environment with the token and explicit project settings
+    env = os.environ.copy()
+    env['GOOGLE_OAUTH_ACCESS_TOKEN'] = token
+    env['GOOGLE_PROJECT'] = project_id
+    env['GCLOUD_PROJECT'] = project_id
+    env['GCP_PROJECT'] = project_id
+    env['CLOUDSDK_CORE_PROJECT'] = project_id
+    env['CLOUDSDK_BILLING_QUOTA_PROJECT'] = project_id
+    # Override any Cloud Shell project ID
+    env['DEVSHELL_PROJECT_ID'] = project_id
+    # Shared provider cache / mirror
+    env.update(terraform_cli_settings())
+    return env
+
+
+def _mirrored_providers(mirror_dir):
+    """List the providers in a filesystem mirror as HOSTNAME/NAMESPACE/TYPE."""
+    mirror_dir = Path(mirror_dir)
+    return sorted(
+        "/".join(path.relative_to(mirror_dir).parts)
+        for path in mirror_dir.glob("*/*/*")
+        if path.is_dir()
+    )
+
+
+# Computed once per process by terraform_cli_settings()
+_cli_settings = None
+_cli_settings_lock = threading.Lock()
+
+
+def terraform_cli_settings():
+    """Return environment settings pointing Terraform at the shared caches.
+    
+    Every working directory shares one provider plugin cache. When a
+    provider mirror is configured, a CLI config file is generated that
+    installs the providers found in the mirror from it and everything else
+    directly. Settings the user already exported are left alone. The
+    settings and the CLI config file are generated once per process.
+    """
+    global _cli_settings
+    with _cli_settings_lock:
+        if _cli_settings is None:
+            _cli_settings = _generate_cli_settings()
+        return dict(_cli_settings)
+
+
+def _generate_cli_settings():
+    settings = {}
+    
+    if not os.environ.get('TF_PLUGIN_CACHE_DIR'):
+        PLUGIN_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        settings['TF_PLUGIN_CACHE_DIR'] = str(PLUGIN_CACHE_DIR)
+    
+    if provider_mirror and not os.environ.get('TF_CLI_CONFIG_FILE'):
+        mirror_dir = Path(provider_mirror).expanduser().resolve()
+        mirrored = _mirrored_providers(mirror_dir)
+        if not mirrored:
+            console.print(f"[yellow]Warning: no providers found in mirror {mirror_dir}[/yellow]")
+            return settings
+        
+        patterns = ", ".join(f'"{name}"' for name in mirrored)
+        cli_config = CACHE_DIR / "terraformrc"
+        cli_config.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so a terraform another run started
+        # never reads a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=cli_config.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(f"""# Generated by setup.py --provider-mirror
+provider_installation {{
+  filesystem_mirror {{
+    path    = "{mirror_dir}"
+    include = [{patterns}]
+  }}
+  direct {{
+    exclude = [{patterns}]
+  }}
+}}
+""")
+        os.replace(tmp_path, cli_config)
+        settings['TF_CLI_CONFIG_FILE'] = str(cli_config)
+    
+    return settings
+
+
+def ensure_gcloud_auth(project_id, preflight=None):
+    """Ensure gcloud is properly authenticated and project is set.
+    
+    The gcloud config update and the token fetch run concurrently. If the
+    wizard already started them (see start_preflight() and
+    collect_configuration()), their results are reused instead of
+    launching new gcloud processes.
+    
+    Returns:
+        dict: Environment variables to use for Terraform commands
+    """
+    preflight = preflight if preflight is not None else {}
+    
+    try:
+        console.print(f"[dim]Setting active project: {project_id}[/dim]")
+        project_setup = preflight.get('project_setup')
+        if project_setup is None:
+            project_setup = run_in_background(configure_gcloud_project, project_id)
+        
+        token_future = preflight.get('token')
+        token = token_future.result() if token_future is not None else None
+        if not token:
+            token = fetch_access_token()
+        
+        if not project_setup.result():
+            raise RuntimeError(f"could not set active project to {project_id}")
+        
+        if token:
+            env = terraform_env(project_id, token)
+            
+            # Also set it globally for other uses
+            os.environ['GOOGLE_OAUTH_ACCESS_TOKEN'] = token
+            os.environ['GOOGLE_PROJECT'] = project_id
+            os.environ['CLOUDSDK_CORE_PROJECT'] = project_id
+            os.environ['CLOUDSDK_BILLING_QUOTA_PROJECT'] = project_id
+            
+            console.print("[dim]Authentication verified[/dim]")
+            return env
+        
+        # If we can't get token, return default environment
+        console.print("[yellow]Warning: Could not retrieve access token[/yellow]")
+        return {**os.environ, **terraform_cli_settings()}
+        
+    except Exception as e:
+        console.print(f"[dim]Auth setup note: {escape_markup(str(e))}[/dim]")
+        return {**os.environ, **terraform_cli_settings()}
+
+
+def check_gcloud_auth(token_future=None):
+    """
+    Check if user is authenticated with gcloud and prompt if not.
+    
+    Uses access token as the source of truth since that's what Terraform needs.
+    Handles Cloud Shell environment appropriately to avoid misleading prompts.
+    
+    Args:
+        token_future: Optional Future from start_preflight() whose token is
+            used instead of launching another gcloud process
+    """
+    try:
+        # Check if we can get an access token - this is what we actually need
+        if token_future is not None:
+            token = token_future.result()
+        else:
+            token = fetch_access_token()
+        
+        # If we got a token successfully, we're authenticated
+        if token:
+            return True
+        
+        # No valid token - need to authenticate
+        # Detect Cloud Shell for appropriate messaging and auth method
+        in_cloud_shell = (
+            os.environ.get('CLOUD_SHELL') == 'true' or 
+            os.environ.get('GOOGLE_CLOUD_SHELL') == 'true'
+        )
+        
+        console.print()
+        console.print("[yellow]GCP authentication required[/yellow]")
+        console.print()
+        
+        if in_cloud_shell:
+            console.print("You need to authenticate to access your GCP project.")
+            console.print("This is a one-time setup for this Cloud Shell session.")
+        else:
+            console.print("You need to authenticate with Google Cloud to continue.")
+        
+        console.print()
+        
+        if questionary.confirm(
+            "Authenticate now?",
+            default=True,
+            style=questionary.Style([
+                ('question', 'bold yellow'),
+                ('answer', 'bold white'),
+            ])
+        ).ask():
+            console.print()
+            console.print("[cyan]Starting authentication...[/cyan]")
+            
+            if in_cloud_shell:
+                console.print("[dim]Using your Cloud Shell session for authentication.[/dim]")
+                console.print()
+                console.print("[yellow]Note:[/yellow] If you see a message about 'already authenticated',")
+                console.print("just press [bold]Y[/bold] and Enter to continue.")
+            else:
+                console.print("[dim]A browser window will open for you to log in.[/dim]")
+            
+            console.print()
+            
+            # Run gcloud auth login - let it be fully interactive
+            # (In Cloud Shell, user might need to answer "Y" to a prompt, then enter verification code)
+            result = run_subprocess(["gcloud", "auth", "login", "--update-adc"], check=False)
+            
+            if result.returncode == 0:
+                console.print()
+                console.print("[green]Authentication successful![/green]")
+                console.print()
+                return True
+            else:
+                console.print()
+                console.print("[red]Authentication failed.[/red]")
+                console.print()
+                console.print("Please run manually:")
+                console.print("  gcloud auth login")
+                console.print()
+                return False
+        else:
+            console.print()
+            console.print("[yellow]Authentication cancelled.[/yellow]")
+            console.print()
+            console.print("To authenticate manually, run:")
+            console.print("  gcloud auth login")
+            console.print()
+            return False
+            
+    except Exception as e:
+        console.print(f"[dim]Auth check error: {escape_markup(str(e))}[/dim]")
+        return False
+
+
+def project_list_filter():
+    """Build the gcloud filter for the project listing.
+    
+    Every term is one the Resource Manager API evaluates server-side, so
+    filtered-out projects are never sent.
+    """
+    terms = ["lifecycleState=ACTIVE"]
+    if project_parent:
+        kind, _, parent_id = project_parent.partition("/")
+        terms.append(f"parent.type={kind[:-1]} AND parent.id={parent_id}")
+    for label in project_labels:
+        key, _, value = label.partition("=")
+        terms.append(f"labels.{key}={value}")
+    return " AND ".join(terms)
+
+
+def _parse_project_line(line):
+    parts = line.rstrip("\n").split('\t', 1)
+    project_id = parts[0].strip()
+    # Without a separate name, the ID doubles as the name
+    project_name = parts[1].strip() if len(parts) == 2 else project_id
+    return {'id': project_id, 'name': project_name}
+
+
+def get_available_projects(on_page=None):
+    """Get list of GCP projects the user has access to (cached per account and filter).
+    
+    Projects are listed page by page with the filters applied server-side,
+    and on_page is called with each page as it arrives, so the picker can
+    open before a large listing finishes. If no page arrives for
+    PROJECT_PAGE_TIMEOUT seconds the listing is stopped; the projects
+    received so far are returned but not cached.
+    
+    Args:
+        on_page: Optional callback receiving each list of project records
+    """
+    account = get_active_account()
+    list_filter = project_list_filter()
+    cache_key = f"{account}/{list_filter}"
+    cached = cache_get("projects", cache_key)
+    if cached:
+        if on_page is not None:
+            on_page(cached)
+        return cached
+    
+    try:
+        process = subprocess.Popen(
+            ["gcloud", "projects", "list", f"--filter={list_filter}",
+             f"--page-size={PROJECT_PAGE_SIZE}", "--format=value(projectId,name)"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+    except OSError:
+        return []
+    
+    stalled = threading.Event()
+    watchdog = None
+    
+    def kill():
+        stalled.set()
+        process.kill()
+    
+    def rearm():
+        nonlocal watchdog
+        if watchdog is not None:
+            watchdog.cancel()
+        watchdog = threading.Timer(PROJECT_PAGE_TIMEOUT, kill)
+        watchdog.daemon = True
+        watchdog.start()
+    
+    projects, page = [], []
+    
+    def flush():
+        if page:
+            projects.extend(page)
+            if on_page is not None:
+                on_page(list(page))
+            page.clear()
+        rearm()
+    
+    with tracer.span("gcloud projects list", "subprocess", cmd=" ".join(process.args)):
+        rearm()
+        try:
+            for line in process.stdout:
+                if line.strip():
+                    page.append(_parse_project_line(line))
+                if len(page) >= PROJECT_PAGE_SIZE:
+                    flush()
+            process.wait()
+            flush()
+        finally:
+            watchdog.cancel()
+    
+    if process.returncode == 0 and not stalled.is_set():
+        cache_put("projects", cache_key, projects, PROJECTS_CACHE_TTL)
+    return projects
+
+
+def verify_project_access(project_id):
+    """Verify user has access to the specified GCP project.
+    
+    Only successful checks are cached, so a fixed permission problem is
+    picked up on the next run.
+    """
+    cache_key = f"{get_active_account()}/{project_id}"
+    if cache_get("project-access", cache_key):
+        return True
+    
+    try:
+        run_subprocess(
+            ["gcloud", "projects", "describe", project_id],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=300
+        )
+        cache_put("project-access", cache_key, True, PROJECT_ACCESS_CACHE_TTL)
+        return True
+    except Exception:
+        return False
+
+
+# APIs a deploy needs; enabled once per project outside the Terraform graph,
+# so plans and applies do not refresh them every time. The list is the
+# required_apis local in main.tf.
+REQUIRED_APIS_LOCAL = re.compile(r"required_apis\s*=\s*\[(.*?)\]", re.DOTALL)
+API_ENABLE_TIMEOUT = 300
+
+# Enablement futures by project, so concurrent targets share one gcloud call
+_api_enablement = {}
+_api_enablement_lock = threading.Lock()
+_required_apis = None
+
+
+def required_apis():
+    """Return the APIs listed in the required_apis local of terraform/main.tf."""
+    global _required_apis
+    if _required_apis is None:
+        try:
+            match = REQUIRED_APIS_LOCAL.search((TERRAFORM_DIR / "main.tf").read_text())
+        except OSError:
+            match = None
+        _required_apis = tuple(re.findall(r'"([^"]+)"', match.group(1))) if match else ()
+    return _required_apis
+
+
+def _apis_cache_key(project_id):
+    return f"{project_id}/{','.join(required_apis())}"
+
+
+def enable_required_apis(project_id):
+    """Enable required_apis() in a project with a single gcloud call.
+    
+    Success is cached, so later deploys to the project skip the call.
+    Enabling an API that is already enabled changes nothing, so --no-cache
+    only costs the call itself.
+    
+    Returns:
+        tuple: (success, error output)
+    """
+    if not required_apis():
+        return False, f"No required_apis list found in {TERRAFORM_DIR / 'main.tf'}"
+    cache_key = _apis_cache_key(project_id)
+    if cache_get("apis-enabled", cache_key):
+        return True, ""
+    
+    def enable():
+        try:
+            run_subprocess(
+                ["gcloud", "services", "enable", *required_apis(), f"--project={project_id}"],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=API_ENABLE_TIMEOUT
+            )
+            return True, ""
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr
+        except subprocess.TimeoutExpired:
+            return False, f"gcloud services enable timed out after {API_ENABLE_TIMEOUT}s"
+    
+    success, output = retry_transient(enable, f"Enabling APIs in {project_id}")
+    if success:
+        cache_put("apis-enabled", cache_key, True, APIS_ENABLED_CACHE_TTL)
+    return success, output
+
+
+def start_api_enablement(project_id):
+    """Return a Future for enable_required_apis(), started once per project."""
+    with _api_enablement_lock:
+        if project_id not in _api_enablement:
+            _api_enablement[project_id] = run_in_background(enable_required_apis, project_id)
+        return _api_enablement[project_id]
+
+
+def reenable_required_apis(project_id):
+    """Enable required_apis() again after a command found one disabled.
+    
+    The cached success is stale once an API has been disabled behind our
+    back, so it is dropped along with the finished enablement future.
+    
+    Returns:
+        tuple: (success, error output)
+    """
+    cache_delete("apis-enabled", _apis_cache_key(project_id))
+    with _api_enablement_lock:
+        _api_enablement.pop(project_id, None)
+    return start_api_enablement(project_id).result()
+
+
+# Most matches the project picker shows at once; typing narrows the rest
+PROJECT_MATCH_LIMIT = 50
+
+
+class _ProjectSegment:
+    """Search structures over one batch of projects (see ProjectIndex)."""
+    
+    def __init__(self, projects):
+        self.projects = sorted(projects, key=lambda project: project['id'])
+        self.ids = [project['id'].lower() for project in self.projects]
+        
+        tokens, lines = [], []
+        for position, project in enumerate(self.projects):
+            name = project['name'].lower()
+            for field in (self.ids[position], name):
+                tokens.append((field, position))
+                tokens.extend((word, position) for word in re.split(r'[^a-z0-9]+', field) if word)
+            # The ID and the name are separate lines, so a substring or
+            # fuzzy match never spans the two
+            lines.extend((self.ids[position], name.replace("\n", " ")))
+        tokens.sort()
+        self.tokens = tokens
+        
+        self.corpus = "\n".join(lines)
+        self.line_starts = []
+        offset = 0
+        for line in lines:
+            self.line_starts.append(offset)
+            offset += len(line) + 1
+    
+    def _line_matches(self, pattern):
+        # Yields the position of each project whose ID or name matches pattern
+        for match in pattern.finditer(self.corpus):
+            yield (bisect.bisect_right(self.line_starts, match.start()) - 1) // 2
+    
+    def matches(self, tier, query, patterns):
+        """Yield the positions of projects matching query in one ranking tier."""
+        if tier == 0:
+            start = bisect.bisect_left(self.ids, query)
+            if start < len(self.ids) and self.ids[start] == query:
+                yield start
+        elif tier == 1:
+            start = bisect.bisect_left(self.ids, query)
+            yield from itertools.takewhile(lambda position: self.ids[position].startswith(query),
+                                           range(start, len(self.ids)))
+        elif tier == 2:
+            start = bisect.bisect_left(self.tokens, (query, -1))
+            yield from (self.tokens[index][1] for index in itertools.takewhile(
+                lambda index: self.tokens[index][0].startswith(query), range(start, len(self.tokens))))
+        else:
+            yield from self._line_matches(patterns[tier - 3])
+
+
+class ProjectIndex:
+    """Search index over project IDs and names for the project picker.
+    
+    Filled a page at a time while the project listing streams in, so a
+    keystroke never walks every project in Python: ID and word prefixes
+    are found by bisecting sorted lists, and substring and fuzzy
+    (characters in order) matches by one regex pass over each page's IDs
+    and names packed into a single string. Searching stops as soon as
+    enough matches are found. Results are the project records.
+    """
+    
+    RANKING_TIERS = 5
+    
+    def __init__(self, projects=()):
+        self.segments = []
+        self.by_id = {}
+        # Set once the first page has been added
+        self.ready = threading.Event()
+        if projects:
+            self.add(projects)
+    
+    def __len__(self):
+        return len(self.by_id)
+    
+    def add(self, projects):
+        """Add a page of project records; safe while searches are running."""
+        segment = _ProjectSegment(projects)
+        self.by_id.update((project['id'], project) for project in segment.projects)
+        # Replaced rather than appended, so searches iterate a stable list
+        self.segments = self.segments + [segment]
+        self.ready.set()
+    
+    def search(self, query, limit=PROJECT_MATCH_LIMIT):
+        """Return up to limit project records matching query, best first.
+        
+        Ranking: exact ID, ID prefix, word prefix (of the ID or the name),
+        substring, then fuzzy matches.
+        """
+        segments = self.segments
+        query = query.strip().lower()
+        if not query:
+            merged = heapq.merge(*(segment.projects for segment in segments),
+                                 key=lambda project: project['id'])
+            return list(itertools.islice(merged, limit))
+        
+        patterns = (
+            re.compile(re.escape(query)),
+            # Anchored, backtracking-free form of q.*u.*e.*r.*y within one line
+            re.compile("^" + "".join(f"[^{re.escape(char)}\n]*{re.escape(char)}" for char in query),
+                       re.MULTILINE),
+        )
+        found = {}
+        for tier in range(self.RANKING_TIERS):
+            for segment in segments:
+                for position in segment.matches(tier, query, patterns):
+                    project = segment.projects[position]
+                    found.setdefault(project['id'], project)
+                    if len(found) >= limit:
+                        return list(found.values())
+        return list(found.values())
+    
+    def lookup(self, text):
+        """Return the project record for an entered ID, or None."""
+        return self.by_id.get(text.strip())
+
+
+def project_completer(index):
+    """Build a prompt_toolkit completer that searches a ProjectIndex.
+    
+    Completions insert the bare project ID, with the name shown beside it.
+    """
+    # prompt_toolkit is installed with questionary; only import it once the UI is up
+    from prompt_toolkit.completion import Completer, Completion
+    
+    class ProjectCompleter(Completer):
+        def get_completions(self, document, complete_event):
+            text = document.text_before_cursor
+            for project in index.search(text):
+                yield Completion(
+                    project['id'],
+                    start_position=-len(text),
+                    display_meta="" if project['name'] == project['id'] else project['name']
+                )
+    
+    return ProjectCompleter()
+
+
+def run_command(cmd, cwd=None, description="Running command", env=None):
+    """Run a command and return success status.
+    
+    Args:
+        cmd: Command to run
+        cwd: Working directory
+        description: Description for logging
+        env: Environment variables (defaults to os.environ if not provided)
+    """
+    try:
+        result = run_subprocess(
+            cmd,
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env if env is not None else os.environ
+        )
+        return True, result.stdout
+    except subprocess.CalledProcessError as e:
+        return False, e.stderr
+
+
+def tfvars_values(config):
+    """Return the Terraform variables for a configuration."""
+    values = {
+        'project_id': config['project_id'],
+        'service_name': config['service_name'],
+        'region': config['region'],
+        'allow_unauthenticated': config['allow_unauthenticated'],
+        'container_image': config.get('container_image') or DEFAULT_CONTAINER_IMAGE,
+    }
+    
+    # Optional settings (terraform/variables.tf defaults otherwise)
+    if config.get('env_vars'):
+        values['env_vars'] = dict(sorted(config['env_vars'].items()))
+    for name in ('cpu_limit', 'memory_limit'):
+        if config.get(name):
+            values[name] = config[name]
+    values.update(profile_settings(config))
+    return values
+
+
+def generate_tfvars(config, terraform_dir=TERRAFORM_DIR):
+    """Generate terraform.tfvars file from configuration.
+    
+    Values are written as JSON literals, which HCL accepts, so the file can
+    be read back with read_tfvars(). HCL would read ${ and %{ in strings as
+    template sequences, so they are escaped as $${ and %%{.
+    """
+    tfvars_content = "# Generated configuration for Data Commons deployment\n"
+    for name, value in tfvars_values(config).items():
+        literal = json.dumps(value).replace("${", "$${").replace("%{", "%%{")
+        tfvars_content += f"{name} = {literal}\n"
+    
+    tfvars_path = Path(terraform_dir) / "terraform.tfvars"
+    tfvars_path.parent.mkdir(parents=True, exist_ok=True)
+    # Leave an identical file untouched so its content hash and mtime hold
+    if not tfvars_path.exists() or tfvars_path.read_text() != tfvars_content:
+        tfvars_path.write_text(tfvars_content)
+    
+    return tfvars_path
+
+
+def read_tfvars(terraform_dir):
+    """Read back the variables written by generate_tfvars() ({} if unreadable)."""
+    values = {}
+    try:
+        lines = (Path(terraform_dir) / "terraform.tfvars").read_text().splitlines()
+    except OSError:
+        return values
+    for line in lines:
+        name, separator, value = line.partition(" = ")
+        if separator and not line.startswith("#"):
+            try:
+                values[name] = _unescape_templates(json.loads(value))
+            except ValueError:
+                return {}
+    return values
+
+
+def _unescape_templates(value):
+    """Undo generate_tfvars()' escaping of HCL template sequences."""
+    if isinstance(value, str):
+        return value.replace("$${", "${").replace("%%{", "%{")
+    if isinstance(value, dict):
+        return {_unescape_templates(key): _unescape_templates(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unescape_templates(item) for item in value]
+    return value
+
+
+def _init_relevant_blocks(text):
+    """Extract the top-level terraform {} and module blocks from HCL source.
+    
+    Only these blocks (required providers, backend, module sources)
+    change what terraform init installs; resources and variables do not.
+    """
+    blocks, current, depth = [], [], 0
+    for line in text.splitlines():
+        if depth == 0 and not re.match(r'\s*(terraform|module\s+"[^"]*")\s*\{', line):
+            continue
+        current.append(line.strip())
+        depth += line.count('{') - line.count('}')
+        if depth <= 0:
+            blocks.append("\n".join(current))
+            current, depth = [], 0
+    return "\n".join(blocks)
+
+
+def init_fingerprint(terraform_dir):
+    """Fingerprint everything that decides whether terraform init must run.
+    
+    Covers the terraform/module blocks of the .tf files, the dependency
+    lock file and the providers and modules installed under .terraform.
+    """
+    terraform_dir = Path(terraform_dir)
+    digest = hashlib.sha256()
+    
+    for tf_file in sorted(terraform_dir.glob("*.tf")):
+        digest.update(tf_file.name.encode())
+        digest.update(_init_relevant_blocks(tf_file.read_text()).encode())
+    
+    lock_file = terraform_dir / ".terraform.lock.hcl"
+    if lock_file.exists():
+        digest.update(lock_file.read_bytes())
+    
+    installed = terraform_dir / ".terraform"
+    for path in sorted((installed / "providers").rglob("*")):
+        digest.update(str(path.relative_to(installed)).encode())
+    modules_manifest = installed / "modules" / "modules.json"
+    if modules_manifest.exists():
+        digest.update(modules_manifest.read_bytes())
+    
+    return digest.hexdigest()
+
+
+def terraform_init(terraform_dir, env):
+    """Run terraform init when something relevant changed since the last one.
+    
+    Init is skipped when the fingerprint recorded after the last successful
+    init still matches. Providers are only upgraded with --upgrade.
+    
+    Returns:
+        tuple: (success, output); output is None if init was skipped
+    """
+    fingerprint_file = Path(terraform_dir) / ".terraform" / "dc-init-fingerprint"
+    if not upgrade_providers and fingerprint_file.exists():
+        if fingerprint_file.read_text() == init_fingerprint(terraform_dir):
+            return True, None
+    
+    cmd = ["terraform", "init", "-input=false"]
+    if upgrade_providers:
+        cmd.append("-upgrade")
+    
+    cache_dir = Path(env.get('TF_PLUGIN_CACHE_DIR') or PLUGIN_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with file_lock(cache_dir / PLUGIN_CACHE_LOCK_FILE, PLUGIN_CACHE_LOCK_TIMEOUT,
+                   description="the provider cache"):
+        # A target whose first init waited here picks up the lock file the
+        # init before it shared, and so installs from the cache
+        seed_provider_lock(terraform_dir)
+        success, output = run_command(
+            cmd,
+            cwd=terraform_dir,
+            description="terraform init",
+            env=env
+        )
+        if success:
+            share_provider_lock(terraform_dir)
+    if success:
+        fingerprint_file.parent.mkdir(exist_ok=True)
+        fingerprint_file.write_text(init_fingerprint(terraform_dir))
+    return success, output
+
+
+# Dependency lock file; the copy in terraform/ seeds every target directory
+PROVIDER_LOCK_FILE = ".terraform.lock.hcl"
+
+
+def seed_provider_lock(terraform_dir):
+    """Copy the shared dependency lock file into a directory that has none.
+    
+    Without a lock file entry, terraform init (1.4 and later) does not
+    install the provider from the plugin cache but downloads it again.
+    """
+    seed = TERRAFORM_DIR / PROVIDER_LOCK_FILE
+    lock_file = Path(terraform_dir) / PROVIDER_LOCK_FILE
+    if seed.exists() and not lock_file.exists():
+        shutil.copy2(seed, lock_file)
+
+
+def share_provider_lock(terraform_dir):
+    """Make a target's lock file the shared seed after a successful init.
+    
+    The seed is only written when there is none yet or --upgrade picked
+    new provider versions; it is not committed, so the first init on a
+    machine creates it.
+    """
+    lock_file = Path(terraform_dir) / PROVIDER_LOCK_FILE
+    seed = TERRAFORM_DIR / PROVIDER_LOCK_FILE
+    if not lock_file.exists() or Path(terraform_dir).resolve() == TERRAFORM_DIR.resolve():
+        return
+    if seed.exists() and not upgrade_providers:
+        return
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=TERRAFORM_DIR, suffix=".tmp")
+        os.close(fd)
+        shutil.copy2(lock_file, tmp_path)
+        os.replace(tmp_path, seed)
+    except OSError:
+        # The seed only saves downloads
+        pass
+
+
+# How long plan and apply wait for a state lock held by a background sync
+STATE_LOCK_TIMEOUT = "2m"
+
+
+def parallelism_args():
+    """Return the -parallelism option for plan and apply, if one is set."""
+    return [f"-parallelism={terraform_parallelism}"] if terraform_parallelism else []
+
+
+def terraform_plan(terraform_dir, env, scope=None):
+    """Run terraform plan, saving the plan to tfplan.
+    
+    Args:
+        scope: Resources to refresh and plan (see plan_scope()); None
+            refreshes everything, an empty list nothing
+    
+    Returns:
+        tuple: (success, output, has_changes)
+    """
+    # -detailed-exitcode: 0 = no changes, 1 = error, 2 = changes present
+    cmd = ["terraform", "plan", "-input=false", "-detailed-exitcode", "-out=tfplan",
+           f"-lock-timeout={STATE_LOCK_TIMEOUT}", *parallelism_args()]
+    if scope is not None:
+        cmd += [f"-target={address}" for address in scope] if scope else ["-refresh=false"]
+    result = run_subprocess(
+        cmd,
+        cwd=terraform_dir,
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    if result.returncode not in (0, 2):
+        # Includes 127 (terraform missing) and negative codes (killed by a signal)
+        return False, result.stderr or result.stdout or f"terraform plan exited with {result.returncode}", False
+    return True, result.stdout, result.returncode == 2
+
+
+def _state_serial(terraform_dir):
+    """Return the lineage and serial of the local Terraform state."""
+    try:
+        state = json.loads((Path(terraform_dir) / "terraform.tfstate").read_text())
+        return f"{state.get('lineage')}:{state.get('serial')}"
+    except (OSError, ValueError):
+        return "no-state"
+
+
+def deploy_fingerprint(terraform_dir):
+    """Hash the inputs that determine a plan: tfvars, .tf files and state serial."""
+    terraform_dir = Path(terraform_dir)
+    digest = hashlib.sha256()
+    
+    for path in sorted(terraform_dir.glob("*.tf")) + [terraform_dir / "terraform.tfvars"]:
+        digest.update(path.name.encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+    digest.update(_state_serial(terraform_dir).encode())
+    
+    return digest.hexdigest()
+
+
+# Resources each Terraform variable feeds; a change to a variable missing
+# here (project, region, service name) plans every resource
+SERVICE_RESOURCE = 'google_cloud_run_service.nginx'
+PUBLIC_ACCESS_RESOURCE = 'google_cloud_run_service_iam_member.public_access'
+VARIABLE_RESOURCES = {
+    'allow_unauthenticated': (PUBLIC_ACCESS_RESOURCE,),
+    **{name: (SERVICE_RESOURCE,) for name in (
+        'container_image', 'env_vars', 'cpu_limit', 'memory_limit', 'min_instances',
+        'max_instances', 'container_concurrency', 'startup_cpu_boost',
+        'cpu_always_allocated', 'startup_probe',
+    )},
+}
+
+# Plans refresh only the resources whose inputs changed, except that at
+# least this often (seconds) a plan refreshes everything to catch drift
+FULL_REFRESH_INTERVAL = 24 * 60 * 60
+FULL_REFRESH_FILE = ".dc-full-refresh"
+
+
+def last_full_refresh(terraform_dir):
+    """Return when a plan or sync last refreshed every resource (0 if never)."""
+    try:
+        return (Path(terraform_dir) / FULL_REFRESH_FILE).stat().st_mtime
+    except OSError:
+        return 0
+
+
+def mark_full_refresh(terraform_dir):
+    """Record that every resource was just refreshed."""
+    (Path(terraform_dir) / FULL_REFRESH_FILE).touch()
+
+
+def plan_scope(terraform_dir):
+    """Return the resources the next plan has to refresh, or None for all.
+    
+    Compares the generated terraform.tfvars with the last successful
+    deploy and maps each changed variable to the resources it feeds. An
+    empty list means no input changed (only the state did), so the plan
+    skips the refresh entirely. Everything is refreshed after .tf file
+    changes, a fast-path deploy the state has not caught up with, a change
+    to an unmapped variable, when FULL_REFRESH_INTERVAL has passed, and
+    with --full-refresh or --force-plan.
+    """
+    last = last_deploy(terraform_dir)
+    if force_plan or full_refresh or not last or 'variables' not in last:
+        return None
+    if last.get('pending_sync') or last.get('tf_hash') != _tf_files_hash(terraform_dir):
+        return None
+    if time.time() - last_full_refresh(terraform_dir) > FULL_REFRESH_INTERVAL:
+        return None
+    
+    current = read_tfvars(terraform_dir)
+    scope = set()
+    for name in set(current) | set(last['variables']):
+        if current.get(name) == last['variables'].get(name):
+            continue
+        if name not in VARIABLE_RESOURCES:
+            return None
+        scope.update(VARIABLE_RESOURCES[name])
+    return sorted(scope)
+
+
+def describe_plan_scope(scope):
+    """Return a line explaining a narrowed plan, or None for a full one."""
+    if scope is None:
+        return None
+    if not scope:
+        return "Inputs unchanged; planned against the saved state without refreshing it"
+    names = ", ".join(resource_label(address) for address in scope)
+    return f"Refreshed and planned only what the changed inputs affect: {names}"
+
+
+def plan_deploy(terraform_dir, env):
+    """Plan a deploy, reusing earlier work when the inputs are unchanged.
+    
+    If the fingerprint equals the one recorded after the last successful
+    deploy, nothing is planned. Otherwise a plan saved earlier for the same
+    fingerprint (e.g. one that was never applied) is reused, and only
+    failing that is terraform plan run, scoped by plan_scope().
+    --force-plan always plans, refreshing everything.
+    
+    Returns:
+        tuple: (status, output); status is 'unchanged' (same inputs as the
+            last successful deploy), 'up-to-date' (planned, nothing to
+            change), 'planned' (tfplan ready to apply) or 'failed'
+    """
+    terraform_dir = Path(terraform_dir)
+    fingerprint = deploy_fingerprint(terraform_dir)
+    plans_dir = terraform_dir / ".dc-plans"
+    saved_plan = plans_dir / f"{fingerprint}.tfplan"
+    
+    if not force_plan:
+        last = last_deploy(terraform_dir)
+        if last and last.get('fingerprint') == fingerprint:
+            return 'unchanged', None
+        
+        if saved_plan.exists():
+            shutil.copy2(saved_plan, terraform_dir / "tfplan")
+            return 'planned', f"Reusing saved plan {fingerprint[:12]}"
+    
+    scope = plan_scope(terraform_dir)
+    success, output, has_changes = terraform_plan(terraform_dir, env, scope)
+    if not success:
+        return 'failed', output
+    if scope is None:
+        mark_full_refresh(terraform_dir)
+    
+    if not has_changes:
+        record_deploy(terraform_dir)
+        return 'up-to-date', output
+    
+    # Keep only the plan for the current inputs
+    shutil.rmtree(plans_dir, ignore_errors=True)
+    plans_dir.mkdir()
+    shutil.copy2(terraform_dir / "tfplan", saved_plan)
+    return 'planned', output
+
+
+def last_deploy(terraform_dir):
+    """Return the record of the last successful deploy in terraform_dir, if any."""
+    try:
+        return json.loads((Path(terraform_dir) / ".dc-last-deploy.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _tf_files_hash(terraform_dir):
+    """Hash the .tf files of a working directory."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(terraform_dir).glob("*.tf")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def record_deploy(terraform_dir, pending_sync=False):
+    """Remember the inputs of a successful deploy; saved plans are now stale.
+    
+    With pending_sync the service was updated outside Terraform and the
+    state has not caught up yet, so no fingerprint is recorded: the next
+    deploy plans against the live service. A failed readiness check (see
+    record_serving()) carries over until a later check passes.
+    """
+    terraform_dir = Path(terraform_dir)
+    record = {
+        'fingerprint': None if pending_sync else deploy_fingerprint(terraform_dir),
+        'deployed_at': time.time(),
+        'variables': read_tfvars(terraform_dir),
+        'tf_hash': _tf_files_hash(terraform_dir),
+        'pending_sync': pending_sync,
+        'not_serving': (last_deploy(terraform_dir) or {}).get('not_serving', False),
+    }
+    (terraform_dir / ".dc-last-deploy.json").write_text(json.dumps(record))
+    shutil.rmtree(terraform_dir / ".dc-plans", ignore_errors=True)
+
+
+def record_serving(terraform_dir, serving):
+    """Note whether the last deployed revision passed its readiness check."""
+    record = last_deploy(terraform_dir)
+    if record is not None:
+        record['not_serving'] = not serving
+        (Path(terraform_dir) / ".dc-last-deploy.json").write_text(json.dumps(record))
+
+
+def needs_readiness_check(terraform_dir, changed):
+    """Whether a deploy waits for the service: after a change, or until it once served."""
+    if not check_readiness:
+        return False
+    return changed or (last_deploy(terraform_dir) or {}).get('not_serving', False)
+
+
+# Variables the fast path can change with gcloud run services update
+FAST_PATH_VARIABLES = ('container_image', 'env_vars')
+
+
+def fast_path_changes(terraform_dir):
+    """Return the changed variables if only the image or env vars changed.
+    
+    Compares the generated terraform.tfvars with the last successful
+    deploy. Returns None when anything else differs (or nothing does), or
+    the state sync of the last fast-path deploy has not finished, in which
+    case the full Terraform pipeline runs.
+    """
+    last = last_deploy(terraform_dir)
+    if force_plan or not last or 'variables' not in last:
+        return None
+    # Until the state has caught up with the last fast-path deploy, deploy
+    # through Terraform, which plans against the live service
+    if last.get('pending_sync') or last.get('tf_hash') != _tf_files_hash(terraform_dir):
+        return None
+    
+    current = read_tfvars(terraform_dir)
+    changed = {name for name in set(current) | set(last['variables'])
+               if current.get(name) != last['variables'].get(name)}
+    if not changed or not changed <= set(FAST_PATH_VARIABLES):
+        return None
+    return {name: current.get(name) for name in changed}
+
+
+def update_service_revision(config, changes, env=None):
+    """Roll out a new revision with gcloud run services update.
+    
+    Returns:
+        tuple: (success, output)
+    """
+    cmd = [
+        "gcloud", "run", "services", "update", config['service_name'],
+        f"--project={config['project_id']}",
+        f"--region={config['region']}",
+        "--platform=managed",
+        "--quiet",
+    ]
+    if 'container_image' in changes:
+        cmd.append(f"--image={changes['container_image'] or DEFAULT_CONTAINER_IMAGE}")
+    if 'env_vars' in changes:
+        env_vars = changes['env_vars'] or {}
+        if env_vars:
+            # Pick a delimiter that no value contains (gcloud's ^DELIM^ syntax)
+            delimiter = next((d for d in "@|~#%;:" if not any(
+                d in f"{name}{value}" for name, value in env_vars.items()
+            )), None)
+            if delimiter is None:
+                return False, "Environment variable values use every gcloud list delimiter"
+            pairs = delimiter.join(f"{name}={value}" for name, value in env_vars.items())
+            cmd.append(f"--set-env-vars=^{delimiter}^{pairs}")
+        else:
+            cmd.append("--clear-env-vars")
+    
+    return run_command(cmd, description="gcloud run services update", env=env)
+
+
+def _tfvars_hash(terraform_dir):
+    """Hash the generated terraform.tfvars of a working directory."""
+    path = Path(terraform_dir) / "terraform.tfvars"
+    return hashlib.sha256(path.read_bytes() if path.exists() else b"").hexdigest()
+
+
+def start_state_sync(terraform_dir, env, key):
+    """Bring the Terraform state up to date in a detached background process.
+    
+    Runs 'setup.py sync-state', which outlives this process, so the deploy
+    returns as soon as the new revision serves. The sync takes the target
+    lock once this run releases it, so later runs of the target wait for
+    it; it is told which terraform.tfvars was rolled out.
+    """
+    terraform_dir = Path(terraform_dir).resolve()
+    with open(terraform_dir / "sync.log", "w") as log:
+        subprocess.Popen(
+            [sys.executable, str(ENTRY_POINT), "sync-state", str(terraform_dir),
+             f"--target={key}", f"--tfvars-hash={_tfvars_hash(terraform_dir)}"],
+            # Target locks are found relative to the working directory
+            cwd=Path.cwd(),
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env=env,
+            start_new_session=True
+        )
+
+
+def sync_state(terraform_dir, key, tfvars_hash):
+    """Refresh the Terraform state after a fast-path deploy.
+    
+    Holds the target lock throughout. The deploy is only recorded as
+    synced if terraform.tfvars is still the one that was rolled out
+    (tfvars_hash); a later run may have generated other inputs and failed
+    to deploy them.
+    
+    Returns:
+        int: Process exit code
+    """
+    with target_lock(key):
+        success, output = run_command(
+            ["terraform", "apply", "-refresh-only", "-auto-approve", "-input=false",
+             f"-lock-timeout={STATE_LOCK_TIMEOUT}"],
+            cwd=terraform_dir,
+            description="terraform apply -refresh-only"
+        )
+        console.print(output)
+        if not success:
+            print_error("State refresh failed; the next deploy will plan against the live service")
+            return 1
+        
+        mark_full_refresh(terraform_dir)
+        if _tfvars_hash(terraform_dir) != tfvars_hash:
+            print_success("Terraform state is up to date; the inputs changed since the "
+                          "revision update, so the next deploy plans them")
+            return 0
+        record_deploy(terraform_dir)
+    print_success("Terraform state is up to date")
+    return 0
+
+
+# Checkpoints: each deploy stage records its completion, so --resume can
+# continue from the first stage that did not finish
+CHECKPOINT_FILE = ".dc-checkpoint.json"
+DEPLOY_STAGES = ('configure', 'init', 'plan', 'apply', 'output', 'readiness')
+
+
+def _checkpoint_inputs(terraform_dir):
+    # The generated inputs only; state changes must not invalidate a checkpoint
+    tfvars = Path(terraform_dir) / "terraform.tfvars"
+    digest = hashlib.sha256(_tf_files_hash(terraform_dir).encode())
+    digest.update(tfvars.read_bytes() if tfvars.exists() else b"")
+    return digest.hexdigest()
+
+
+def load_checkpoint(terraform_dir):
+    """Return the checkpoint of the last deploy in terraform_dir, if any."""
+    try:
+        return json.loads((Path(terraform_dir) / CHECKPOINT_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_checkpoint(terraform_dir, checkpoint):
+    path = Path(terraform_dir) / CHECKPOINT_FILE
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+def start_checkpoint(terraform_dir, config):
+    """Record the configure stage; keeps earlier stages if the inputs are the same.
+    
+    Returns:
+        dict: The checkpoint ('inputs', 'config' and 'stages')
+    """
+    inputs = _checkpoint_inputs(terraform_dir)
+    checkpoint = load_checkpoint(terraform_dir)
+    if not checkpoint or checkpoint.get('inputs') != inputs:
+        checkpoint = {'inputs': inputs, 'config': config, 'stages': {}}
+    checkpoint['stages']['configure'] = {'at': time.time()}
+    _write_checkpoint(terraform_dir, checkpoint)
+    return checkpoint
+
+
+def checkpoint_stage(terraform_dir, stage, **outputs):
+    """Mark a stage complete; the stages after it have to run again."""
+    checkpoint = load_checkpoint(terraform_dir)
+    if checkpoint is None:
+        return
+    later = DEPLOY_STAGES[DEPLOY_STAGES.index(stage):]
+    checkpoint['stages'] = {name: done for name, done in checkpoint['stages'].items()
+                            if name not in later}
+    checkpoint['stages'][stage] = {'at': time.time(), **outputs}
+    _write_checkpoint(terraform_dir, checkpoint)
+
+
+def resume_stage(checkpoint):
+    """Return the stage after the last one a checkpoint completed (None if all did).
+    
+    Stages before that one count as done even without a checkpoint: the
+    fast path, for one, makes init and plan unnecessary.
+    """
+    done = [DEPLOY_STAGES.index(stage) for stage in checkpoint['stages']]
+    following = max(done, default=-1) + 1
+    return DEPLOY_STAGES[following] if following < len(DEPLOY_STAGES) else None
+
+
+# A required API is disabled, or its enablement has not propagated yet
+API_DISABLED_PATTERN = re.compile(
+    r"SERVICE_DISABLED|has not been used in project \S+ before or it is disabled",
+    re.IGNORECASE
+)
+
+# Retries: Google API errors that usually clear up by themselves, such as
+# rate limits, backend hiccups or an API enablement that has not propagated
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"Error 429|Error 50[0234]|rateLimitExceeded|RESOURCE_EXHAUSTED|Quota exceeded"
+    rf"|{API_DISABLED_PATTERN.pattern}"
+    r"|\bUNAVAILABLE\b|DEADLINE_EXCEEDED|connection reset by peer|TLS handshake timeout"
+    r"|i/o timeout|try again later",
+    re.IGNORECASE
+)
+TRANSIENT_RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 60.0
+
+
+def is_transient_error(output):
+    """Whether a failed command's output shows a transient Google API error."""
+    return bool(output and TRANSIENT_ERROR_PATTERN.search(output))
+
+
+def retry_delay(attempt):
+    """Backoff before retry number attempt: doubling, with half of it jittered.
+    
+    The jitter keeps fleet targets that failed together from retrying
+    together; the fixed half gives an API enablement time to propagate.
+    """
+    backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+def _report_retry(description, attempt, delay, output):
+    match = TRANSIENT_ERROR_PATTERN.search(output)
+    line = next((line for line in output.splitlines() if match.group(0) in line), match.group(0))
+    console.print(f"[yellow]{description} hit a transient error ({escape_markup(line.strip()[:160])}); "
+                  f"retrying in {delay:.0f}s (attempt {attempt + 1} of "
+                  f"{TRANSIENT_RETRY_ATTEMPTS})[/yellow]")
+
+
+def retry_transient(operation, description, on_retry=None, project_id=None):
+    """Run operation() again after transient Google API errors.
+    
+    Args:
+        operation: Callable returning a tuple whose first item is falsy or
+            'failed' on failure and whose last item is the output
+        on_retry: Called with (attempt, delay, output) before each retry;
+            prints a warning by default
+        project_id: When set, a disabled-API error enables required_apis()
+            in the project again (once) before retrying, instead of
+            trusting the cached enablement
+    
+    Returns:
+        The result of the last attempt
+    """
+    reenabled = False
+    for attempt in range(1, TRANSIENT_RETRY_ATTEMPTS + 1):
+        result = operation()
+        failed = result[0] in (False, 'failed')
+        if not failed or attempt == TRANSIENT_RETRY_ATTEMPTS or not is_transient_error(result[-1]):
+            return result
+        if project_id and not reenabled and API_DISABLED_PATTERN.search(result[-1]):
+            reenabled = True
+            enabled, _ = reenable_required_apis(project_id)
+            if not enabled:
+                return result
+        delay = retry_delay(attempt)
+        if on_retry is None:
+            _report_retry(description, attempt, delay, result[-1])
+        else:
+            on_retry(attempt, delay, result[-1])
+        time.sleep(delay)
+    return result
+
+
+def apply_with_retries(terraform_dir, env, run_apply, on_retry=None, project_id=None):
+    """Apply the saved plan, planning again and retrying after transient errors.
+    
+    A failed apply may already have changed some resources, which makes
+    the saved plan stale, so each retry starts with a fresh plan, and a
+    plan saved for these inputs is dropped once the apply has failed.
+    
+    Args:
+        run_apply: Callable running terraform_apply(); returns its result
+        project_id: Passed to retry_transient()
+    
+    Returns:
+        tuple: (success, output) like terraform_apply()
+    """
+    replan = False
+    
+    def attempt():
+        nonlocal replan
+        if replan:
+            shutil.rmtree(Path(terraform_dir) / ".dc-plans", ignore_errors=True)
+            status, output = plan_deploy(terraform_dir, env)
+            if status == 'failed':
+                return False, output
+            if status != 'planned':
+                # The failed attempt already made every change
+                return True, output or ""
+        replan = True
+        # A timed-out apply returns no output and is not retried
+        return run_apply()
+    
+    success, output = retry_transient(attempt, "terraform apply", on_retry, project_id)
+    if not success:
+        shutil.rmtree(Path(terraform_dir) / ".dc-plans", ignore_errors=True)
+    return success, output
+
+
+# Apply output kept in memory for error reports, and the on-disk log size
+APPLY_LOG_TAIL_LINES = 200
+APPLY_LOG_MAX_BYTES = 1024 * 1024
+
+# Time budget (seconds) for terraform apply of a single target. Targets
+# deployed together contend for the same API quotas, so each extra target
+# adds to the budget of every one of them.
+APPLY_TIMEOUT = 300
+TIMEOUT_PER_EXTRA_TARGET = 30
+
+
+def scaled_timeout(base, targets=1):
+    """Return the time budget for a stage when targets deploy together."""
+    return base + TIMEOUT_PER_EXTRA_TARGET * max(0, targets - 1)
+
+# Friendly names for the resources in terraform/main.tf
+RESOURCE_LABELS = {
+    'google_cloud_run_service.nginx': "Cloud Run service",
+    'google_cloud_run_service_iam_member.public_access[0]': "Public access IAM binding",
+    'google_cloud_run_service_iam_member.public_access': "Public access IAM binding",
+}
+
+
+def resource_label(addr):
+    """Return a readable name for a Terraform resource address."""
+    return RESOURCE_LABELS.get(addr, addr)
+
+
+class RollingLog:
+    """Append-only log file that rotates to <name>.1 once it grows too big."""
+    
+    def __init__(self, path, max_bytes=APPLY_LOG_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.file = open(self.path, "w")
+        self.size = 0
+    
+    def write(self, line):
+        if self.size + len(line) > self.max_bytes:
+            self.file.close()
+            os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            self.file = open(self.path, "w")
+            self.size = 0
+        self.file.write(line)
+        self.size += len(line)
+    
+    def close(self):
+        self.file.close()
+
+
+def _apply_message(event):
+    """Turn one terraform -json UI event into a line of readable text."""
+    message = event.get('@message', '')
+    diagnostic = event.get('diagnostic')
+    if diagnostic and diagnostic.get('detail'):
+        message = f"{message}\n{diagnostic['detail']}"
+    return message
+
+
+def terraform_apply(terraform_dir, env, timeout=APPLY_TIMEOUT, on_event=None):
+    """Apply the saved tfplan, streaming Terraform's machine-readable output.
+    
+    Events are parsed line by line as they arrive and passed to on_event.
+    The full output goes to a size-bounded apply.log in terraform_dir; only
+    the last APPLY_LOG_TAIL_LINES messages are kept in memory.
+    
+    Args:
+        on_event: Optional callback receiving each -json UI event (dict)
+    
+    Returns:
+        tuple: (success, output); output is the tail of the apply messages,
+            or None if the apply timed out
+    """
+    # Run terraform apply with the same authenticated environment
+    process = subprocess.Popen(
+        ["terraform", "apply", "-auto-approve", "-input=false", "-json",
+         f"-lock-timeout={STATE_LOCK_TIMEOUT}", *parallelism_args(), "tfplan"],
+        cwd=terraform_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,  # Combine stderr with stdout
+        text=True,
+        bufsize=1,
+        env=env
+    )
+    
+    timed_out = threading.Event()
+    
+    def kill():
+        # The apply may have finished just before the watchdog fired
+        if process.poll() is None:
+            timed_out.set()
+            process.kill()
+    
+    watchdog = threading.Timer(timeout, kill)
+    watchdog.daemon = True
+    watchdog.start()
+    
+    tail = deque(maxlen=APPLY_LOG_TAIL_LINES)
+    log = RollingLog(Path(terraform_dir) / "apply.log")
+    with tracer.span("terraform apply", "subprocess", cmd=" ".join(process.args)):
+        try:
+            for line in process.stdout:
+                log.write(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Not a UI event (e.g. a crash message); keep it verbatim
+                    tail.append(line.rstrip())
+                    continue
+            
+                if event.get('@level') in ('error', 'warn') or event.get('type') in (
+                    'apply_errored', 'change_summary'
+                ):
+                    tail.append(_apply_message(event))
+                if on_event is not None:
+                    on_event(event)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            # on_event raised (or we were interrupted); do not leave terraform running
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            log.close()
+    
+    if timed_out.is_set():
+        return False, None
+    return process.returncode == 0, "\n".join(tail)
+
+
+class ApplyProgress:
+    """Per-resource progress display fed by terraform_apply() events.
+    
+    Shows one line per resource with its own elapsed time when the UI is
+    loaded, and prints start/finish lines otherwise.
+    """
+    
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.tasks = {}
+        self.started = {}
+    
+    def __call__(self, event):
+        hook = event.get('hook') or {}
+        addr = (hook.get('resource') or {}).get('addr')
+        kind = event.get('type')
+        if not addr or kind not in ('apply_start', 'apply_progress', 'apply_complete', 'apply_errored'):
+            return
+        
+        label = resource_label(addr)
+        action = hook.get('action', 'update')
+        
+        if kind == 'apply_start':
+            self.started[addr] = time.monotonic()
+            if self.progress is not None:
+                self.tasks[addr] = self.progress.add_task(f"{label} ({action})", total=1)
+            else:
+                console.print(f"  ... {label} ({action})")
+        elif kind == 'apply_progress':
+            # Terraform reports every 10 seconds; the elapsed column already ticks
+            return
+        else:
+            elapsed = time.monotonic() - self.started.get(addr, time.monotonic())
+            done = kind == 'apply_complete'
+            mark = "[green]✓[/green]" if done else "[red]✗[/red]"
+            if self.progress is not None and addr in self.tasks:
+                self.progress.update(self.tasks[addr], completed=1,
+                                     description=f"{mark} {label}")
+            else:
+                console.print(f"  {mark} {label} ({elapsed:.0f}s)")
+
+
+def terraform_output(terraform_dir, name, env=None):
+    """Read one raw Terraform output. Returns (success, value)."""
+    success, value = run_command(
+        ["terraform", "output", "-raw", name],
+        cwd=terraform_dir,
+        env=env
+    )
+    return success, value.strip() if success else value
+
+
+def target_key(config):
+    """Identify a deployment target as project/region/service."""
+    return f"{config['project_id']}/{config['region']}/{config['service_name']}"
+
+
+def target_state_dir(config):
+    """Return the Terraform working directory (state shard) of a target."""
+    return DEPLOY_STATE_DIR / "targets" / target_key(config)
+
+
+# Per-target files a deploy from the shared terraform/ directory left behind
+LEGACY_STATE_FILES = ("terraform.tfstate", "terraform.tfstate.backup", ".dc-last-deploy.json",
+                      ".dc-full-refresh", ".dc-checkpoint.json", ".dc-latency.json")
+
+
+def adopt_legacy_state(config, target_dir):
+    """Move this target's state out of terraform/, where older versions kept it."""
+    values = read_tfvars(TERRAFORM_DIR)
+    if (target_dir / "terraform.tfstate").exists() or 'project_id' not in values:
+        return
+    if target_key(values) != target_key(config):
+        return
+    
+    moved = []
+    for name in LEGACY_STATE_FILES:
+        # A concurrent run may have moved it first
+        with contextlib.suppress(OSError):
+            os.replace(TERRAFORM_DIR / name, target_dir / name)
+            moved.append(name)
+    if "terraform.tfstate" in moved:
+        console.print(f"[dim]Moved the Terraform state of {target_key(config)} "
+                      f"from {TERRAFORM_DIR} to {target_dir}[/dim]")
+
+
+def prepare_target_dir(config):
+    """Create the Terraform working directory for one target.
+    
+    Each target gets its own copy of the Terraform configuration and keeps
+    its own state shard, so targets can be planned and applied concurrently
+    and each plan only reads its own small state. Files are only copied
+    when they changed, keeping init results valid.
+    """
+    target_dir = target_state_dir(config)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    adopt_legacy_state(config, target_dir)
+    
+    for source in TERRAFORM_DIR.glob("*.tf"):
+        destination = target_dir / source.name
+        if not destination.exists() or destination.read_bytes() != source.read_bytes():
+            shutil.copy2(source, destination)
+    
+    # Start from the known provider checksums (see seed_provider_lock())
+    seed_provider_lock(target_dir)
+    
+    return target_dir
+
+
+# Runs against the same target take turns through an advisory lock file. The
+# locks live outside the target directories, which a destroy deletes.
+TARGET_LOCK_DIR = DEPLOY_STATE_DIR / "locks"
+# Give up waiting for another run of the same target after this long (seconds)
+TARGET_LOCK_TIMEOUT = 30 * 60
+
+
+# In-process locks by lock file path: threads queue on these and hand the
+# lock over at once, and only the thread holding one polls the file lock
+_file_lock_threads = {}
+_file_lock_threads_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout, on_wait=None, description=None):
+    """Hold an advisory flock() on path, creating the file if needed.
+    
+    A caller that finds the lock held, by another thread or another
+    process, calls on_wait() once and waits for it, up to timeout seconds.
+    
+    Yields:
+        bool: Whether the caller had to wait
+    """
+    with _file_lock_threads_guard:
+        thread_lock = _file_lock_threads.setdefault(str(Path(path).resolve()), threading.Lock())
+    
+    waited = False
+    deadline = time.monotonic() + timeout
+    
+    def wait():
+        nonlocal waited
+        if not waited and on_wait is not None:
+            on_wait()
+        waited = True
+    
+    def timed_out():
+        return TimeoutError(f"another run still holds {description or path} after "
+                            f"{timeout // 60} minutes")
+    
+    if not thread_lock.acquire(blocking=False):
+        wait()
+        if not thread_lock.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise timed_out()
+    try:
+        try:
+            import fcntl
+        except ImportError:
+            # No flock() on this platform; other processes are not excluded
+            yield waited
+            return
+        
+        with open(path, "a") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    wait()
+                    if time.monotonic() > deadline:
+                        raise timed_out()
+                    time.sleep(0.5)
+            try:
+                yield waited
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+@contextlib.contextmanager
+def target_lock(key, on_wait=None):
+    """Hold the advisory lock of a target, given as target_key().
+    
+    A run that finds the lock held calls on_wait() once and waits for it,
+    up to TARGET_LOCK_TIMEOUT. The lock goes away with the process holding
+    it, even if that process crashes. Prepare the target's working
+    directory only once the lock is held: a destroy that held it before
+    may have deleted the directory.
+    
+    Yields:
+        bool: Whether this run had to wait for another one
+    """
+    TARGET_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    # Project IDs, regions and service names never contain underscores
+    with file_lock(TARGET_LOCK_DIR / f"{key.replace('/', '_')}.lock", TARGET_LOCK_TIMEOUT,
+                   on_wait, description=key) as waited:
+        yield waited
+
+
+# Deployment registry: every deploy and destroy, queryable without cloud calls
+DATA_DIR = Path(os.environ.get('XDG_DATA_HOME') or Path.home() / ".local" / "share") / "datacommons-deploy"
+REGISTRY_PATH = DATA_DIR / "registry.db"
+REGISTRY_SCHEMA_VERSION = 2
+
+REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deploys (
+    id           INTEGER PRIMARY KEY,
+    project_id   TEXT NOT NULL,
+    region       TEXT NOT NULL,
+    service_name TEXT NOT NULL,
+    action       TEXT NOT NULL,     -- deploy or destroy
+    outcome      TEXT NOT NULL,     -- deployed, updated, unchanged, destroyed, cancelled, failed
+    started_at   REAL NOT NULL,
+    duration     REAL,
+    url          TEXT,
+    plan_hash    TEXT,
+    config       TEXT,              -- JSON; environment variable values are left out
+    stages       TEXT,              -- JSON: stage name -> seconds
+    error        TEXT,
+    working_dir  TEXT,
+    time_to_ready REAL              -- seconds from deploy start until the URL answered
+);
+CREATE INDEX IF NOT EXISTS deploys_by_target
+    ON deploys (project_id, region, service_name, started_at);
+CREATE INDEX IF NOT EXISTS deploys_by_time ON deploys (started_at);
+"""
+
+# Statements that bring a registry of version N - 1 up to version N
+REGISTRY_MIGRATIONS = {
+    2: "ALTER TABLE deploys ADD COLUMN time_to_ready REAL",
+}
+
+# Outcomes after which the service exists
+LIVE_OUTCOMES = ('deployed', 'updated', 'unchanged')
+
+
+def open_registry():
+    """Open the registry database, creating it on first use."""
+    REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(REGISTRY_PATH, timeout=10)
+    connection.row_factory = sqlite3.Row
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version < REGISTRY_SCHEMA_VERSION:
+        if version == 0:
+            # WAL lets concurrent fleet targets record without blocking readers
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(REGISTRY_SCHEMA)
+        else:
+            for step in range(version + 1, REGISTRY_SCHEMA_VERSION + 1):
+                try:
+                    connection.execute(REGISTRY_MIGRATIONS[step])
+                except sqlite3.OperationalError as e:
+                    # Another process may have run the same migration a moment ago
+                    if "duplicate column name" not in str(e):
+                        raise
+        connection.execute(f"PRAGMA user_version = {REGISTRY_SCHEMA_VERSION}")
+    return connection
+
+
+def start_registry_entry(config, terraform_dir, action="deploy"):
+    """Begin a registry entry; fill in its fields and pass it to save_registry_entry()."""
+    return {
+        'project_id': config['project_id'],
+        'region': config['region'],
+        'service_name': config['service_name'],
+        'action': action,
+        'outcome': 'failed',
+        'started_at': time.time(),
+        'clock': time.perf_counter(),
+        'url': None,
+        'plan_hash': None,
+        'config': config,
+        'error': None,
+        'working_dir': str(Path(terraform_dir).resolve()) if terraform_dir else None,
+        'time_to_ready': None,
+    }
+
+
+def save_registry_entry(entry, target=None):
+    """Write an entry; a registry failure never fails the deploy itself.
+    
+    Args:
+        target: Target argument of the entry's stage spans (fleet deploys)
+    """
+    config = dict(entry['config'])
+    if config.get('env_vars'):
+        config['env_vars'] = sorted(config['env_vars'])
+    row = {
+        **{key: entry[key] for key in ('project_id', 'region', 'service_name', 'action',
+                                       'outcome', 'started_at', 'url', 'plan_hash',
+                                       'error', 'working_dir', 'time_to_ready')},
+        'duration': round(time.perf_counter() - entry['clock'], 3),
+        'config': json.dumps(config, sort_keys=True),
+        'stages': json.dumps(tracer.stage_totals(entry['clock'], target)),
+    }
+    if row['error']:
+        row['error'] = row['error'].strip()[-2000:]
+    
+    try:
+        with contextlib.closing(open_registry()) as connection, connection:
+            connection.execute(
+                f"INSERT INTO deploys ({', '.join(row)}) "
+                f"VALUES ({', '.join(':' + key for key in row)})",
+                row
+            )
+    except (sqlite3.Error, OSError) as e:
+        console.print(f"[yellow]Warning: could not update the deployment registry: {e}[/yellow]")
+
+
+def query_registry(sql, parameters=()):
+    """Run a read-only query against the registry; [] if it does not exist yet."""
+    if not REGISTRY_PATH.exists():
+        return []
+    with contextlib.closing(open_registry()) as connection:
+        return [dict(row) for row in connection.execute(sql, parameters)]
+
+
+def registry_latest(include_failed=True):
+    """Return the most recent entry for every target the registry knows."""
+    condition = "" if include_failed else "WHERE outcome != 'failed' AND outcome != 'cancelled'"
+    return query_registry(f"""
+        SELECT * FROM deploys WHERE id IN (
+            SELECT MAX(id) FROM deploys {condition}
+            GROUP BY project_id, region, service_name
+        )
+        ORDER BY project_id, region, service_name
+    """)
+
+
+def print_step_header(step_number, title):
+    """Print formatted step header."""
+    console.print()
+    step_text = Text()
+    step_text.append(f"[Step {step_number}] ", style="bold cyan")
+    step_text.append(title, style="bold white")
+    console.print(step_text)
+    console.print("─" * 60, style="dim blue")
+
+
+def print_success(message):
+    """Print success message."""
+    console.print(f"  ✓ {message}", style="green")
+
+
+def print_error(message):
+    """Print error message."""
+    console.print(f"  ✗ {message}", style="red")
+
+
+def escape_markup(text):
+    """Escape rich markup characters in text from external commands."""
+    return text.replace("[", "\\[").replace("]", "\\]")
+
+
+def collect_configuration(preflight=None):
+    """Collect configuration from user.
+    
+    Args:
+        preflight: Futures from start_preflight(); started here if not given.
+            A 'project_setup' future is added once the project is verified,
+            so gcloud is configured while the remaining questions are asked.
+    """
+    config = {}
+    if preflight is None:
+        preflight = start_preflight()
+    
+    # Check authentication first
+    already_authenticated = bool(preflight['token'].result())
+    if not check_gcloud_auth(preflight['token']):
+        console.print("[red]Authentication is required to continue.[/red]")
+        console.print()
+        return None
+    
+    if not already_authenticated:
+        # The listing started before login and failed; fetch a fresh token
+        # and project list with the new credentials
+        preflight.update(start_preflight())
+    
+    # Step 1: Project ID
+    print_step_header(1, "GCP Project Configuration")
+    console.print()
+    
+    # Auto-detect project from Cloud Shell if available
+    detected_project = os.environ.get('DEVSHELL_PROJECT_ID', '').strip()
+    
+    # The project listing was started speculatively in main(); only wait
+    # (and say so) if it has not delivered a page while the banner was on
+    # screen. A listing longer than one page keeps streaming into the index
+    # while the picker is open.
+    projects_future = preflight['projects']
+    index = preflight['project_index']
+    if not (projects_future.done() or index.ready.is_set()):
+        with spinner("Loading your GCP projects...", style="dim"):
+            while not (projects_future.done() or index.ready.wait(0.05)):
+                pass
+    loading = not projects_future.done() and len(index) >= PROJECT_PAGE_SIZE
+    available_projects = None if loading else projects_future.result()
+    console.print()
+    
+    if loading or available_projects:
+        # User has multiple projects - let them choose
+        if detected_project:
+            console.print(f"[dim]Cloud Shell project detected: {detected_project}[/dim]")
+            console.print()
+        
+        if loading or len(available_projects) > 1:
+            if loading:
+                console.print(f"[cyan]Found {len(index)} project(s) so far; "
+                              f"the rest load while you type.[/cyan]")
+            else:
+                console.print(f"[cyan]Found {len(available_projects)} project(s) you have access to.[/cyan]")
+            
+            # Use autocomplete for better UX with many projects
+            if len(index) > 10:
+                console.print("[dim]Type to filter, use arrow keys to select, or type full project ID[/dim]")
+            if len(index) > PROJECT_MATCH_LIMIT:
+                console.print(f"[dim]Showing the best {PROJECT_MATCH_LIMIT} matches as you type[/dim]")
+            
+            console.print()
+            
+            selected = questionary.autocomplete(
+                "Select your GCP project (type to filter):",
+                choices=[],
+                completer=project_completer(index),
+                default=detected_project if detected_project else "",
+                validate=lambda text: True,  # Allow any text for manual entry
+                style=questionary.Style([
+                    ('question', 'bold cyan'),
+                    ('answer', 'bold white'),
+                    ('highlighted', 'bg:#0066cc fg:#ffffff bold'),
+                ])
+            ).ask()
+            
+            if not selected:
+                return None
+            
+            # A picked completion is a bare project ID; anything else was typed
+            project = index.lookup(selected)
+            config['project_id'] = project['id'] if project else selected.strip()
+        else:
+            # Only one project available
+            single_project = available_projects[0]
+            console.print(f"[cyan]Found 1 project: {single_project['id']}[/cyan]")
+            console.print()
+            
+            use_detected = questionary.confirm(
+                f"Use project '{single_project['id']}'?",
+                default=True,
+                style=questionary.Style([
+                    ('question', 'bold cyan'),
+                    ('answer', 'bold white'),
+                ])
+            ).ask()
+            
+            if use_detected:
+                config['project_id'] = single_project['id']
+            else:
+                console.print()
+                config['project_id'] = questionary.text(
+                    "Enter your GCP Project ID:",
+                    validate=validate_project_id,
+                    style=questionary.Style([
+                        ('question', 'bold cyan'),
+                        ('answer', 'bold white'),
+                    ])
+                ).ask()
+    else:
+        # No projects found or error - fall back to manual entry
+        if detected_project:
+            console.print(f"[dim]Detected Cloud Shell project: {detected_project}[/dim]")
+            console.print()
+        
+        config['project_id'] = questionary.text(
+            "Enter your GCP Project ID:",
+            default=detected_project,  # Pre-fill if detected from Cloud Shell
+            validate=validate_project_id,
+            style=questionary.Style([
+                ('question', 'bold cyan'),
+                ('answer', 'bold white'),
+            ])
+        ).ask()
+    
+    if not config['project_id']:
+        return None
+    
+    # Verify project
+    console.print()
+    with spinner("Verifying project access..."):
+        if not verify_project_access(config['project_id']):
+            console.print()
+            print_error(f"Cannot access project: {config['project_id']}")
+            console.print("\n  [dim]Ensure project ID is correct and you have necessary permissions.[/dim]\n")
+            return None
+    
+    console.print()
+    print_success(f"Project verified: {config['project_id']}")
+    
+    # Configure gcloud in the background while the remaining questions are answered
+    preflight['project_setup'] = run_in_background(configure_gcloud_project, config['project_id'])
+    
+    # Step 2: Service Name
+    print_step_header(2, "Service Configuration")
+    console.print()
+    
+    config['service_name'] = questionary.text(
+        "Enter service name:",
+        default="datacommons-service",
+        validate=validate_service_name,
+        style=questionary.Style([
+            ('question', 'bold cyan'),
+            ('answer', 'bold white'),
+        ])
+    ).ask()
+    
+    if not config['service_name']:
+        return None
+    
+    console.print()
+    print_success(f"Service name: {config['service_name']}")
+    
+    # Step 3: Region
+    print_step_header(3, "Deployment Region")
+    console.print()
+    
+    region_choice = questionary.select(
+        "Select your deployment region:",
+        choices=get_available_regions(),
+        style=questionary.Style([
+            ('question', 'bold cyan'),
+            ('highlighted', 'bg:#0066cc fg:#ffffff bold'),
+        ])
+    ).ask()
+    
+    if not region_choice:
+        return None
+    
+    config['region'] = region_choice.split(' ')[0]
+    console.print()
+    print_success(f"Region: {region_choice}")
+    
+    # Step 4: Access Control
+    print_step_header(4, "Access Control")
+    console.print()
+    
+    config['allow_unauthenticated'] = questionary.confirm(
+        "Allow public (unauthenticated) access?",
+        default=True,
+        style=questionary.Style([
+            ('question', 'bold cyan'),
+            ('answer', 'bold white'),
+        ])
+    ).ask()
+    
+    if config['allow_unauthenticated'] is None:
+        return None
+    
+    console.print()
+    access_status = "Public access enabled" if config['allow_unauthenticated'] else "Authenticated access only"
+    print_success(access_status)
+    
+    # Step 5: Performance Profile
+    print_step_header(5, "Performance Profile")
+    console.print()
+    
+    profile_choice = questionary.select(
+        "Select a performance profile:",
+        choices=list(PROFILE_CHOICES),
+        style=questionary.Style([
+            ('question', 'bold cyan'),
+            ('highlighted', 'bg:#0066cc fg:#ffffff bold'),
+        ])
+    ).ask()
+    
+    if not profile_choice:
+        return None
+    
+    config['profile'] = PROFILE_CHOICES[profile_choice]
+    console.print()
+    print_success(f"Profile: {config['profile']}")
+    
+    return config
+
+
+# Environment variables read by the non-interactive mode, by config key
+CONFIG_ENV_VARS = {
+    'project_id': 'DC_DEPLOY_PROJECT_ID',
+    'service_name': 'DC_DEPLOY_SERVICE_NAME',
+    'region': 'DC_DEPLOY_REGION',
+    'allow_unauthenticated': 'DC_DEPLOY_ALLOW_UNAUTHENTICATED',
+    'cpu_limit': 'DC_DEPLOY_CPU_LIMIT',
+    'memory_limit': 'DC_DEPLOY_MEMORY_LIMIT',
+    'min_instances': 'DC_DEPLOY_MIN_INSTANCES',
+    'max_instances': 'DC_DEPLOY_MAX_INSTANCES',
+    'container_concurrency': 'DC_DEPLOY_CONTAINER_CONCURRENCY',
+    'profile': 'DC_DEPLOY_PROFILE',
+    'container_image': 'DC_DEPLOY_CONTAINER_IMAGE',
+    'env_vars': 'DC_DEPLOY_ENV_VARS',
+}
+
+# Settings that are whole numbers, with the range terraform/variables.tf allows
+CONFIG_INT_RANGES = {
+    'min_instances': (0, 1000),
+    'max_instances': (1, 1000),
+    'container_concurrency': (1, 1000),
+}
+
+# Settings that are text; a config file can hold any JSON or YAML type
+CONFIG_TEXT_SETTINGS = ('project_id', 'service_name', 'region', 'cpu_limit', 'memory_limit',
+                        'profile', 'container_image')
+
+# Defaults matching the wizard's defaults
+CONFIG_DEFAULTS = {
+    'service_name': "datacommons-service",
+    'region': "us-central1",
+    'allow_unauthenticated': True,
+    'profile': "standard",
+}
+
+# Image deployed when none is configured (terraform/variables.tf default)
+DEFAULT_CONTAINER_IMAGE = "gcr.io/cloudrun/hello"
+
+# Environment variable names Cloud Run accepts; the rest are set by Cloud Run
+ENV_VAR_NAME_PATTERN = r'^[A-Za-z_][A-Za-z0-9_]*$'
+RESERVED_ENV_VARS = {'PORT', 'K_SERVICE', 'K_REVISION', 'K_CONFIGURATION'}
+
+# Deploy profiles: Terraform variables a profile sets unless the
+# configuration sets them explicitly
+DEPLOY_PROFILES = {
+    'standard': {},
+    'latency-sensitive': {
+        'min_instances': 1,
+        'startup_cpu_boost': True,
+        'cpu_always_allocated': True,
+        'startup_probe': True,
+    },
+}
+
+# Wizard choices for the profiles
+PROFILE_CHOICES = {
+    "standard (scales to zero, lowest cost)": 'standard',
+    "latency-sensitive (1 warm instance, startup CPU boost, startup probe)": 'latency-sensitive',
+}
+
+
+def profile_settings(config):
+    """Return the Terraform variables implied by the configuration's profile.
+    
+    Explicit settings such as min_instances win over the profile's.
+    """
+    settings = dict(DEPLOY_PROFILES.get(config.get('profile') or 'standard', {}))
+    for key in CONFIG_INT_RANGES:
+        if config.get(key) is not None:
+            settings[key] = config[key]
+    return settings
+
+
+def _parse_bool(value):
+    """Interpret a config file or environment value as a boolean."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y', 'on'):
+        return True
+    if text in ('0', 'false', 'no', 'n', 'off'):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _parse_int(value):
+    """Interpret a config file or environment value as a whole number."""
+    if isinstance(value, bool):
+        raise ValueError(f"not a whole number: {value!r}")
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"not a whole number: {value!r}")
+
+
+def _parse_env_vars(value):
+    """Interpret env_vars given as a mapping, KEY=VALUE list or comma-separated text."""
+    if isinstance(value, dict):
+        return {str(name): str(item) for name, item in value.items()}
+    if isinstance(value, str):
+        value = [pair for pair in value.split(",") if pair.strip()]
+    if not isinstance(value, list):
+        raise ValueError(f"expected a mapping or KEY=VALUE list, got {value!r}")
+    env_vars = {}
+    for pair in value:
+        name, separator, item = str(pair).partition("=")
+        if not separator:
+            raise ValueError(f"expected KEY=VALUE, got {pair!r}")
+        env_vars[name.strip()] = item
+    return env_vars
+
+
+def coerce_config(config):
+    """Convert boolean and numeric settings given as text, in place.
+    
+    Raises:
+        ValueError: If a value cannot be converted
+    """
+    try:
+        config['allow_unauthenticated'] = _parse_bool(config['allow_unauthenticated'])
+    except ValueError as e:
+        raise ValueError(f"allow_unauthenticated: {e}")
+    
+    for key in CONFIG_INT_RANGES:
+        if config.get(key) is not None:
+            try:
+                config[key] = _parse_int(config[key])
+            except ValueError as e:
+                raise ValueError(f"{key}: {e}")
+    
+    if config.get('env_vars') is not None:
+        try:
+            config['env_vars'] = _parse_env_vars(config['env_vars'])
+        except ValueError as e:
+            raise ValueError(f"env_vars: {e}")
+    return config
+
+
+def load_config_file(path):
+    """Load deployment settings from a JSON or YAML file.
+    
+    YAML needs PyYAML, which is optional; JSON always works.
+    
+    Raises:
+        ValueError: If the file cannot be read or parsed
+    """
+    path = Path(path)
+    try:
+        text = path.read_text()
+    except OSError as e:
+        raise ValueError(f"Cannot read config file {path}: {e}")
+    
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(
+                "YAML config files need PyYAML (pip3 install --user pyyaml); "
+                "use a .json file instead"
+            )
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML in {path}: {e}")
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON in {path}: {e}")
+    
+    if not isinstance(data, dict):
+        raise ValueError(f"Config file {path} must contain a mapping of settings")
+    return data
+
+
+def build_config(args):
+    """Assemble a deployment configuration without prompting.
+    
+    Each setting is taken from the first source that provides it:
+    command line flag, DC_DEPLOY_* environment variable, config file,
+    then the wizard's default.
+    
+    Raises:
+        ValueError: If the config file is unusable or a value is malformed
+    """
+    file_config = load_config_file(args.config) if args.config else {}
+    unknown = set(file_config) - set(CONFIG_ENV_VARS)
+    if unknown:
+        raise ValueError(f"Unknown setting(s) in config file: {', '.join(sorted(unknown))}")
+    
+    config = {}
+    for key, env_var in CONFIG_ENV_VARS.items():
+        value = getattr(args, key, None)
+        if value is None:
+            value = os.environ.get(env_var)
+        if value is None:
+            value = file_config.get(key)
+        if value is None:
+            value = CONFIG_DEFAULTS.get(key)
+        config[key] = value
+    
+    # Cloud Shell knows the current project
+    if not config['project_id']:
+        config['project_id'] = os.environ.get('DEVSHELL_PROJECT_ID', '').strip() or None
+    
+    return coerce_config(config)
+
+
+def validate_config(config):
+    """Check a configuration against the rules the wizard enforces.
+    
+    Returns:
+        list: Error messages (empty if the configuration is valid)
+    """
+    errors = []
+    
+    # The checks below assume the right types
+    for key in CONFIG_TEXT_SETTINGS:
+        if config.get(key) is not None and not isinstance(config[key], str):
+            errors.append(f"{key}: must be text, got {config[key]!r}")
+    for key in CONFIG_INT_RANGES:
+        value = config.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            errors.append(f"{key}: must be a whole number, got {value!r}")
+    if errors:
+        return errors
+    
+    if not config.get('project_id'):
+        errors.append("project_id is required (--project or DC_DEPLOY_PROJECT_ID)")
+    else:
+        verdict = validate_project_id(config['project_id'])
+        if verdict is not True:
+            errors.append(f"project_id: {verdict}")
+    
+    verdict = validate_service_name(config.get('service_name') or '')
+    if verdict is not True:
+        errors.append(f"service_name: {verdict}")
+    
+    if config.get('region') not in get_region_ids():
+        errors.append(
+            f"region: {config.get('region')!r} is not one of {', '.join(get_region_ids())}"
+        )
+    
+    if config.get('cpu_limit') and not re.match(CPU_LIMIT_PATTERN, config['cpu_limit']):
+        errors.append("cpu_limit: must be in millicores format (e.g., '1000m')")
+    
+    if config.get('memory_limit') and not re.match(MEMORY_LIMIT_PATTERN, config['memory_limit']):
+        errors.append("memory_limit: must be in Mi or Gi format (e.g., '256Mi', '1Gi')")
+    
+    for key, (low, high) in CONFIG_INT_RANGES.items():
+        if config.get(key) is not None and not low <= config[key] <= high:
+            errors.append(f"{key}: must be between {low} and {high}")
+    
+    image = config.get('container_image')
+    if image is not None and (not image or re.search(r'\s', image)):
+        errors.append("container_image: must be an image reference such as gcr.io/project/app:tag")
+    
+    for name in config.get('env_vars') or {}:
+        if not re.match(ENV_VAR_NAME_PATTERN, name):
+            errors.append(f"env_vars: {name!r} is not a valid environment variable name")
+        elif name in RESERVED_ENV_VARS:
+            errors.append(f"env_vars: {name} is set by Cloud Run and cannot be overridden")
+    
+    if config.get('profile') not in DEPLOY_PROFILES:
+        errors.append(
+            f"profile: {config.get('profile')!r} is not one of {', '.join(DEPLOY_PROFILES)}"
+        )
+    else:
+        settings = profile_settings(config)
+        if settings.get('min_instances', 0) > settings.get('max_instances', 10):
+            errors.append("min_instances: cannot be larger than max_instances")
+    
+    return errors
+
+
+def run_non_interactive(args):
+    """Deploy from flags, environment and config file without any prompts.
+    
+    Returns:
+        int: Process exit code
+    """
+    if args.resume:
+        config = checkpoint_config()
+        if config is None:
+            return 2
+    else:
+        try:
+            config = build_config(args)
+        except ValueError as e:
+            print_error(str(e))
+            return 2
+    
+    errors = validate_config(config)
+    if errors:
+        for error in errors:
+            print_error(error)
+        return 2
+    
+    # Auth and project checks are independent; run them together
+    token_future = run_in_background(fetch_access_token)
+    access_future = run_in_background(verify_project_access, config['project_id'])
+    
+    if not token_future.result():
+        print_error("Not authenticated with gcloud")
+        console.print("  Run: gcloud auth login (or gcloud auth activate-service-account)")
+        return 1
+    
+    if not access_future.result():
+        print_error(f"Cannot access project: {config['project_id']}")
+        return 1
+    
+    print_configuration_summary(config)
+    
+    success = deploy_infrastructure(config, {'token': token_future}, assume_yes=True,
+                                    resume=args.resume)
+    return 0 if success else 1
+
+
+def checkpoint_config():
+    """Return the configuration of the deploy --resume continues, or None.
+    
+    That is the most recent single-target deploy with a checkpoint.
+    """
+    paths = (DEPLOY_STATE_DIR / "targets").glob(f"*/*/*/{CHECKPOINT_FILE}")
+    latest = max(paths, key=lambda path: path.stat().st_mtime, default=None)
+    checkpoint = load_checkpoint(latest.parent) if latest else None
+    if not checkpoint or not checkpoint.get('config'):
+        print_error(f"No deploy to resume: no {CHECKPOINT_FILE} under {DEPLOY_STATE_DIR / 'targets'}")
+        return None
+    return checkpoint['config']
+
+
+def print_configuration_summary(config):
+    """Show the configuration about to be deployed."""
+    rows = [
+        ("Project ID", config['project_id']),
+        ("Service Name", config['service_name']),
+        ("Region", config['region']),
+        ("Public Access",
+         "Yes (Public)" if config['allow_unauthenticated'] else "No (Authenticated only)"),
+    ]
+    if config.get('container_image'):
+        rows.append(("Container Image", config['container_image']))
+    if config.get('env_vars'):
+        rows.append(("Environment", ", ".join(sorted(config['env_vars']))))
+    if config.get('cpu_limit'):
+        rows.append(("CPU Limit", config['cpu_limit']))
+    if config.get('memory_limit'):
+        rows.append(("Memory Limit", config['memory_limit']))
+    settings = profile_settings(config)
+    if (config.get('profile') or 'standard') != 'standard':
+        rows.append(("Profile", config['profile']))
+    if 'min_instances' in settings or 'max_instances' in settings:
+        rows.append(("Instances", f"{settings.get('min_instances', 0)}-"
+                                  f"{settings.get('max_instances', 10)}"))
+    if config.get('container_concurrency') is not None:
+        rows.append(("Concurrency", f"{config['container_concurrency']} requests per instance"))
+    
+    console.print()
+    if Table is None:
+        console.print("Configuration Summary")
+        for setting, value in rows:
+            console.print(f"  {setting:<20}{value}")
+        return
+    
+    summary_table = Table(show_header=False, box=None, padding=(0, 2))
+    summary_table.add_column("Setting", style="cyan", width=20)
+    summary_table.add_column("Value", style="white")
+    
+    for setting, value in rows:
+        summary_table.add_row(setting, value)
+    
+    console.print(Panel(
+        summary_table,
+        title="[bold white]Configuration Summary[/bold white]",
+        border_style="blue",
+        box=box.ROUNDED,
+        padding=(1, 2)
+    ))
+
+
+def confirm_deploy(assume_yes, question="Deploy infrastructure now?"):
+    """Ask whether to go ahead, unless assume_yes."""
+    if assume_yes:
+        return True
+    return questionary.confirm(
+        question,
+        default=True,
+        style=questionary.Style([
+            ('question', 'bold yellow'),
+            ('answer', 'bold white'),
+        ])
+    ).ask()
+
+
+def deploy_infrastructure(config, preflight=None, assume_yes=False, resume=False):
+    """Deploy infrastructure using Terraform and record it in the registry.
+    
+    Args:
+        config: Configuration from collect_configuration() or build_config()
+        preflight: Preflight futures to reuse for gcloud auth setup
+        assume_yes: Apply the plan without asking for confirmation
+        resume: Continue from the first stage the last run did not complete
+    """
+    terraform_dir = target_state_dir(config)
+    entry = start_registry_entry(config, terraform_dir)
+    
+    def on_wait():
+        console.print(f"[yellow]Another run is deploying {target_key(config)}; "
+                      f"waiting for it to finish...[/yellow]")
+    
+    try:
+        with target_lock(target_key(config), on_wait) as waited:
+            prepare_target_dir(config)
+            return _deploy_infrastructure(config, preflight, assume_yes, entry, resume,
+                                          terraform_dir, waited)
+    except KeyboardInterrupt:
+        entry['outcome'] = 'cancelled'
+        raise
+    except Exception as e:
+        entry['error'] = str(e)
+        raise
+    finally:
+        save_registry_entry(entry)
+
+
+def _deploy_infrastructure(config, preflight, assume_yes, entry, resume, terraform_dir, waited):
+    console.print()
+    console.print()
+    console.print("═" * 90, style="bold blue")
+    console.print("                          AUTOMATED DEPLOYMENT STARTING", style="bold white")
+    console.print("═" * 90, style="bold blue")
+    console.print()
+    
+    # Get authentication environment with fresh token
+    # This will be used for ALL terraform commands
+    with tracer.span("gcloud auth", "stage"):
+        terraform_env = ensure_gcloud_auth(config['project_id'], preflight)
+    
+    # Step 1: Generate configuration
+    console.print("[bold cyan]Stage 1:[/bold cyan] Generating Terraform configuration...")
+    with tracer.span("configure", "stage"):
+        tfvars_path = generate_tfvars(config, terraform_dir)
+        checkpoint = start_checkpoint(terraform_dir, config)
+    print_success(f"Configuration saved: {tfvars_path}")
+    entry['plan_hash'] = deploy_fingerprint(terraform_dir)
+    
+    if resume:
+        stage = resume_stage(checkpoint)
+        if stage == 'readiness' and not (check_readiness
+                                         and checkpoint['stages']['apply'].get('changes', True)):
+            stage = None
+        if stage is None:
+            print_success("The last deploy of this configuration completed; nothing to resume")
+            entry['outcome'] = 'unchanged'
+            return True
+        console.print(f"[dim]Resuming from the {stage} stage.[/dim]")
+        if stage in ('output', 'readiness'):
+            # Terraform's part is done; only the checks after it remain
+            changed = checkpoint['stages']['apply'].get('changes', True)
+            entry['outcome'] = 'deployed' if changed else 'unchanged'
+            return show_deploy_result(config, terraform_dir, terraform_env, changed=changed,
+                                      entry=entry)
+    
+    # The run this one waited for may have deployed the very same inputs
+    last = last_deploy(terraform_dir) if waited else None
+    if last and last.get('fingerprint') == entry['plan_hash']:
+        print_success("The run this one waited for already deployed this configuration")
+        checkpoint_stage(terraform_dir, 'apply', changes=False)
+        entry['outcome'] = 'unchanged'
+        return show_deploy_result(config, terraform_dir, terraform_env, changed=False, entry=entry)
+    
+    # Image or environment-only changes skip Terraform
+    changes = fast_path_changes(terraform_dir)
+    if changes:
+        console.print("\n[bold cyan]Stage 2:[/bold cyan] Updating the Cloud Run revision directly...")
+        console.print(f"[dim]Only {' and '.join(sorted(changes))} changed since the last deploy.[/dim]")
+        console.print()
+        if not confirm_deploy(assume_yes, "Roll out the new revision now?"):
+            console.print("\n[yellow]Deployment cancelled by user.[/yellow]\n")
+            entry['outcome'] = 'cancelled'
+            return False
+        
+        deploy_started = time.monotonic()
+        with tracer.span("revision update", "stage"):
+            success, output = update_service_revision(config, changes, terraform_env)
+        if success:
+            record_deploy(terraform_dir, pending_sync=True)
+            checkpoint_stage(terraform_dir, 'apply', changes=True, via="revision update")
+            entry['outcome'] = 'updated'
+            print_success("New revision rolled out")
+            result = show_deploy_result(config, terraform_dir, terraform_env, entry=entry,
+                                        deploy_started=deploy_started)
+            start_state_sync(terraform_dir, terraform_env, target_key(config))
+            console.print(f"[dim]Terraform state is being refreshed in the background "
+                          f"(log: {terraform_dir / 'sync.log'}).[/dim]")
+            return result
+        
+        print_error("Direct update failed; deploying with Terraform instead")
+        console.print(f"[dim]{escape_markup(output or '')}[/dim]")
+    
+    # Runs alongside init; only the plan needs the APIs
+    apis = start_api_enablement(config['project_id'])
+    
+    # Step 2: Initialize Terraform (with auth token)
+    console.print("\n[bold cyan]Stage 2:[/bold cyan] Initializing Terraform...")
+    with tracer.span("init", "stage"):
+        success, output = retry_transient(
+            lambda: terraform_init(terraform_dir, terraform_env), "terraform init"
+        )
+    
+    if not success:
+        print_error("Terraform initialization failed")
+        console.print(f"\n[red]{escape_markup(output)}[/red]\n")
+        entry['error'] = output
+        return False
+    checkpoint_stage(terraform_dir, 'init')
+    
+    if output is None:
+        print_success("Terraform already initialized (providers unchanged)")
+    else:
+        print_success("Terraform initialized successfully")
+    
+    with tracer.span("enable apis", "stage"):
+        success, output = apis.result()
+    if not success:
+        print_error(f"Could not enable the required APIs: {', '.join(required_apis())}")
+        console.print(f"\n[red]{escape_markup(output)}[/red]\n")
+        entry['error'] = output
+        return False
+    
+    # Step 3: Terraform Plan (with auth token)
+    console.print("\n[bold cyan]Stage 3:[/bold cyan] Planning infrastructure changes...")
+    scope = plan_scope(terraform_dir)
+    with tracer.span("plan", "stage"):
+        status, output = retry_transient(
+            lambda: plan_deploy(terraform_dir, terraform_env), "terraform plan",
+            project_id=config['project_id']
+        )
+    
+    if status == 'failed':
+        print_error("Terraform plan failed")
+        console.print(f"\n[red]{escape_markup(output)}[/red]\n")
+        entry['error'] = output
+        return False
+    checkpoint_stage(terraform_dir, 'plan', status=status)
+    
+    if status in ('unchanged', 'up-to-date'):
+        checkpoint_stage(terraform_dir, 'apply', changes=False)
+        if status == 'unchanged':
+            print_success("Configuration unchanged since the last successful deploy (plan skipped)")
+        else:
+            print_success("Infrastructure is up to date - nothing to change")
+            if describe_plan_scope(scope):
+                console.print(f"[dim]{describe_plan_scope(scope)}.[/dim]")
+        console.print("[dim]Use --force-plan to check live infrastructure for drift.[/dim]")
+        entry['outcome'] = 'unchanged'
+        return show_deploy_result(config, terraform_dir, terraform_env, changed=False, entry=entry)
+    
+    if output and output.startswith("Reusing saved plan"):
+        print_success(f"{output} (inputs unchanged)")
+    else:
+        print_success("Infrastructure plan created")
+        if describe_plan_scope(scope):
+            console.print(f"[dim]{describe_plan_scope(scope)} "
+                          f"(use --full-refresh to refresh everything).[/dim]")
+    console.print(f"\n[dim]Review: Cloud Run service will be created in {config['region']}[/dim]")
+    
+    # Step 4: Confirm deployment
+    console.print()
+    if not confirm_deploy(assume_yes):
+        console.print("\n[yellow]Deployment cancelled by user.[/yellow]\n")
+        entry['outcome'] = 'cancelled'
+        return False
+    
+    # Step 5: Apply (with auth token)
+    console.print("\n[bold cyan]Stage 4:[/bold cyan] Deploying infrastructure...")
+    console.print("[dim]This may take 60-90 seconds...[/dim]\n")
+    
+    def run_apply():
+        if Progress is None:
+            return terraform_apply(terraform_dir, terraform_env, on_event=ApplyProgress())
+        with Progress(
+            SpinnerColumn(style="cyan", finished_text=" "),
+            TextColumn("{task.description}"),
+            TimeElapsedColumn(),
+            console=console,
+            transient=False
+        ) as progress:
+            return terraform_apply(terraform_dir, terraform_env, on_event=ApplyProgress(progress))
+    
+    deploy_started = time.monotonic()
+    with tracer.span("apply", "stage"):
+        success, full_output = apply_with_retries(terraform_dir, terraform_env, run_apply,
+                                                  project_id=config['project_id'])
+    
+    if full_output is None:
+        console.print()
+        print_error(f"Deployment timed out after {APPLY_TIMEOUT // 60} minutes")
+        entry['error'] = "terraform apply timed out"
+        return False
+    
+    if not success:
+        console.print()
+        print_error("Deployment failed")
+        console.print(f"\n[red]{escape_markup(full_output)}[/red]\n")
+        console.print(f"[dim]Full log: {terraform_dir / 'apply.log'}[/dim]\n")
+        entry['error'] = full_output
+        return False
+    
+    record_deploy(terraform_dir)
+    checkpoint_stage(terraform_dir, 'apply', changes=True)
+    entry['outcome'] = 'deployed'
+    console.print()
+    print_success("Infrastructure deployed successfully")
+    
+    return show_deploy_result(config, terraform_dir, terraform_env, entry=entry,
+                              deploy_started=deploy_started)
+
+
+# Readiness: a deploy only counts once the new revision answers requests
+# Time budget (seconds) for a single target; scaled like APPLY_TIMEOUT
+READY_TIMEOUT = 120
+# Poll interval: starts short and grows while nothing changes
+READY_POLL_INITIAL = 0.25
+READY_POLL_MAX = 5.0
+READY_POLL_GROWTH = 1.6
+# While the URL fails, check the Ready condition this often to fail fast
+READY_CONDITION_INTERVAL = 5.0
+# Per-request timeout of a URL probe
+READY_PROBE_TIMEOUT = 10.0
+
+# Set by --skip-readiness: do not wait for the service URL to answer
+check_readiness = True
+
+
+def service_condition(config, env=None):
+    """Read the service's Ready condition.
+    
+    Returns:
+        tuple: (ready, message); ready is True once the latest revision
+            serves, False if the rollout failed, None while in progress
+    """
+    result = run_subprocess(
+        ["gcloud", "run", "services", "describe", config['service_name'],
+         f"--project={config['project_id']}", f"--region={config['region']}",
+         "--platform=managed", "--format=json(status)"],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=env
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip() or "cannot describe the service"
+    
+    status = json.loads(result.stdout or "{}").get('status', {})
+    condition = next((condition for condition in status.get('conditions', [])
+                      if condition.get('type') == 'Ready'), {})
+    if condition.get('status') == 'False':
+        return False, condition.get('message') or condition.get('reason') or "revision failed"
+    latest = status.get('latestCreatedRevisionName')
+    if condition.get('status') == 'True' and latest == status.get('latestReadyRevisionName'):
+        return True, None
+    return None, condition.get('message') or "rollout in progress"
+
+
+async def _probe(url, headers):
+    connection = _HttpConnection(url, headers)
+    started = time.perf_counter()
+    _, status = await _timed_request(connection, READY_PROBE_TIMEOUT)
+    connection.close()
+    return status, (connection.first_byte - started if status is not None else None)
+
+
+def wait_until_ready(config, url, env=None, headers=None, started=None,
+                     timeout=READY_TIMEOUT, target=None):
+    """Poll the service URL until the new revision answers.
+    
+    Any response below 500 counts, except 401 and 403 from a public
+    service, which mean its IAM binding has not propagated yet. The poll
+    interval starts at READY_POLL_INITIAL and grows while the answer does
+    not change. While the URL fails, the Ready condition is checked every
+    READY_CONDITION_INTERVAL so a failed rollout ends the wait at once.
+    
+    Args:
+        started: time.monotonic() when the deploy began; time to ready is
+            measured from it (default: now)
+        target: Target argument for the stage span (fleet deploys)
+    
+    Returns:
+        dict: 'ready', 'seconds' (time to ready), 'first_byte_ms' of the
+            first good answer (the revision's first request) and 'reason'
+    """
+    _import_async()
+    started = time.monotonic() if started is None else started
+    deadline = time.monotonic() + timeout
+    public = config.get('allow_unauthenticated', True)
+    interval, last_answer, next_condition = READY_POLL_INITIAL, None, time.monotonic()
+    
+    with tracer.span("readiness", "stage", target=target):
+        while True:
+            status, first_byte = asyncio.run(_probe(url, headers))
+            if status is not None and status < 500 and not (public and status in (401, 403)):
+                return {'ready': True, 'seconds': round(time.monotonic() - started, 2),
+                        'first_byte_ms': round(first_byte * 1000, 1), 'reason': None}
+            reason = f"HTTP {status}" if status is not None else "no response"
+            
+            if time.monotonic() >= next_condition:
+                ready, message = service_condition(config, env)
+                if ready is False:
+                    return {'ready': False, 'seconds': None, 'first_byte_ms': None,
+                            'reason': message}
+                if message:
+                    reason = f"{reason}; {message}"
+                next_condition = time.monotonic() + READY_CONDITION_INTERVAL
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {'ready': False, 'seconds': None, 'first_byte_ms': None,
+                        'reason': f"not serving after {timeout:.0f}s ({reason})"}
+            interval = (min(interval * READY_POLL_GROWTH, READY_POLL_MAX)
+                        if status == last_answer else READY_POLL_INITIAL)
+            last_answer = status
+            time.sleep(min(interval, remaining))
+
+
+def show_deploy_result(config, terraform_dir, terraform_env=None, changed=True, entry=None,
+                       deploy_started=None):
+    """Retrieve the service URL, wait until it serves and display the summary.
+    
+    When a registry entry is given, the URL, time to ready and any
+    readiness or SLO failure are noted on it.
+    """
+    # Step 6: Get service URL
+    console.print("\n[bold cyan]Stage 5:[/bold cyan] Retrieving service information...")
+    with tracer.span("output", "stage"):
+        success, url = terraform_output(terraform_dir, "service_url", terraform_env)
+    
+    if success and url:
+        checkpoint_stage(terraform_dir, 'output', url=url)
+        if entry is not None:
+            entry['url'] = url
+        
+        headers = None
+        readiness = None
+        if needs_readiness_check(terraform_dir, changed):
+            if not changed:
+                console.print("[dim]The last deploy never served traffic; checking again.[/dim]")
+            headers = identity_token_headers(config)
+            with spinner("Waiting for the new revision to serve traffic..."):
+                readiness = wait_until_ready(config, url, terraform_env, headers, deploy_started)
+            record_serving(terraform_dir, readiness['ready'])
+            if not readiness['ready']:
+                print_error(f"The service is not serving traffic: {readiness['reason']}")
+                console.print(f"[dim]Check the logs: gcloud logging read "
+                              f"\"resource.labels.service_name={config['service_name']}\" --limit=20[/dim]")
+                if entry is not None:
+                    entry.update(outcome='failed', error=f"not serving: {readiness['reason']}")
+                return False
+            checkpoint_stage(terraform_dir, 'readiness', seconds=readiness['seconds'])
+            print_success(f"Serving traffic {readiness['seconds']:.1f}s after the deploy started")
+            if entry is not None:
+                entry['time_to_ready'] = readiness['seconds']
+        
+        console.print()
+        console.print("═" * 90, style="bold green")
+        console.print("                          DEPLOYMENT COMPLETE", style="bold white")
+        console.print("═" * 90, style="bold green")
+        console.print()
+        
+        headline = "Your service is now live!" if changed else "Your service is live (no changes were needed)."
+        
+        # Display results
+        result_panel = f"""
+[bold white]{headline}[/bold white]
+
+[bold cyan]Service URL:[/bold cyan]
+  {url}
+
+[bold cyan]Quick Commands:[/bold cyan]
+  Test service:  curl {url}
+  View logs:     gcloud logging read "resource.labels.service_name={config['service_name']}" --limit=20
+  View service:  gcloud run services describe {config['service_name']} --region={config['region']}
+
+[bold yellow]Cleanup:[/bold yellow]
+  To remove resources: ./cleanup.sh
+"""
+        
+        if Panel is None:
+            console.print(result_panel)
+        else:
+            console.print(Panel(
+                result_panel,
+                border_style="green",
+                box=box.DOUBLE,
+                padding=(1, 2)
+            ))
+        console.print()
+        
+        if changed and (measure_latency or config.get('profile') == 'latency-sensitive'):
+            if headers is None:
+                headers = identity_token_headers(config)
+            # The readiness probe sent the new revision's first request
+            report_startup_latency(config, terraform_dir, url, headers,
+                                   cold_ms=readiness['first_byte_ms'] if readiness else None)
+        if load_test:
+            if headers is None:
+                headers = identity_token_headers(config)
+            if not verify_service_slo(url, load_test, headers):
+                if entry is not None:
+                    entry['error'] = "load test did not meet the latency SLO"
+                return False
+        return True
+    
+    return True
+
+
+# Post-deploy load test: settings from --load-test and the loadtest command.
+# Set by main(); None means no load test after a deploy.
+load_test = None
+
+LOAD_TEST_DEFAULTS = {
+    'concurrency': 10,
+    'duration': 10.0,
+    'rate': None,
+    'timeout': 30.0,
+    'slo_p95_ms': None,
+    'slo_p99_ms': None,
+    'slo_error_rate': None,
+}
+
+# Pause after a failed request before the same connection tries again
+LOAD_TEST_ERROR_BACKOFF = 0.1
+
+
+class _HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection for the load generator.
+    
+    Built on asyncio streams so hundreds of concurrent requests need only
+    one thread and no third-party HTTP library.
+    """
+    
+    def __init__(self, url, headers=None, method="GET"):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        self.method = method
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}",
+                 "User-Agent: datacommons-deploy-loadtest", "Accept: */*"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.request_bytes = ("\r\n".join(lines) + "\r\n\r\n").encode()
+        self.reader = self.writer = None
+        # perf_counter() when the last response's status line arrived
+        self.first_byte = None
+    
+    async def request(self):
+        """Send the request and read the whole response; returns the status code."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl,
+                server_hostname=self.host if self.ssl else None
+            )
+        self.writer.write(self.request_bytes)
+        await self.writer.drain()
+        
+        self.first_byte = None
+        while True:
+            status_line = await self.reader.readline()
+            if self.first_byte is None:
+                self.first_byte = time.perf_counter()
+            if not status_line:
+                raise ConnectionError("connection closed by server")
+            status = int(status_line.split()[1])
+            
+            headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+            # Interim responses such as 100 Continue precede the real one
+            if not 100 <= status < 200:
+                break
+        
+        if self.method == "HEAD" or status in (204, 304):
+            # These never have a body, whatever the headers say
+            pass
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+            headers['connection'] = 'close'
+        
+        if headers.get('connection') == 'close':
+            self.close()
+        return status
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def _import_async():
+    """Import asyncio and ssl on first use (see the module-level note)."""
+    global asyncio, ssl
+    import asyncio
+    import ssl
+
+
+async def _timed_request(connection, timeout):
+    """Return (latency seconds, status or None on error) for one request."""
+    started = time.perf_counter()
+    try:
+        status = await asyncio.wait_for(connection.request(), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+        connection.close()
+        status = None
+    return time.perf_counter() - started, status
+
+
+async def _load_test(url, settings, headers):
+    timeout = settings['timeout']
+    
+    # The first request goes out alone so it measures the new revision's
+    # cold start rather than queueing behind the rest of the load
+    first = _HttpConnection(url, headers)
+    first_latency, first_status = await _timed_request(first, timeout)
+    first.close()
+    
+    loop = asyncio.get_running_loop()
+    rate = settings['rate']
+    start = loop.time()
+    deadline = start + settings['duration']
+    state = {'scheduled': 0}
+    latencies = []
+    ok_latencies = []
+    statuses = {}
+    
+    async def worker():
+        connection = _HttpConnection(url, headers)
+        try:
+            while True:
+                if rate:
+                    # Requests are paced against one shared schedule so the
+                    # total rate holds whatever the concurrency
+                    send_at = start + state['scheduled'] / rate
+                    state['scheduled'] += 1
+                    if send_at >= deadline:
+                        return
+                    await asyncio.sleep(max(0, send_at - loop.time()))
+                elif loop.time() >= deadline:
+                    return
+                latency, status = await _timed_request(connection, timeout)
+                latencies.append(latency)
+                if status is not None and status < 400:
+                    ok_latencies.append(latency)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status is None:
+                    # Don't spin on a service that refuses connections
+                    await asyncio.sleep(LOAD_TEST_ERROR_BACKOFF)
+        finally:
+            connection.close()
+    
+    await asyncio.gather(*(worker() for _ in range(settings['concurrency'])))
+    elapsed = loop.time() - start
+    
+    return {
+        'first_request': (first_latency, first_status),
+        'latencies': latencies,
+        'ok_latencies': ok_latencies,
+        'statuses': statuses,
+        'elapsed': elapsed,
+    }
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def run_load_test(url, settings, headers=None):
+    """Load test url and summarize the results.
+    
+    Args:
+        url: Service URL to send GET requests to
+        settings: Dict with the keys of LOAD_TEST_DEFAULTS
+        headers: Extra request headers, e.g. Authorization
+    
+    Returns:
+        dict: Request count, throughput, latency percentiles (ms), error
+              rate and first-request latency
+    """
+    _import_async()
+    with tracer.span("load test", "stage", url=url):
+        raw = asyncio.run(_load_test(url, settings, headers))
+    
+    latencies = raw['latencies']
+    # Failed and timed-out requests would skew the percentiles
+    ok_latencies = sorted(raw['ok_latencies'])
+    errors = sum(count for status, count in raw['statuses'].items()
+                 if status is None or status >= 400)
+    first_latency, first_status = raw['first_request']
+    
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 1)
+    
+    return {
+        'url': url,
+        'requests': len(latencies),
+        'duration_s': round(raw['elapsed'], 2),
+        'throughput_rps': round(len(latencies) / raw['elapsed'], 1) if raw['elapsed'] else 0.0,
+        'p50_ms': ms(_percentile(ok_latencies, 50)),
+        'p95_ms': ms(_percentile(ok_latencies, 95)),
+        'p99_ms': ms(_percentile(ok_latencies, 99)),
+        'error_rate': round(errors / len(latencies), 4) if latencies else 1.0,
+        'status_counts': {str(status or 'error'): count
+                          for status, count in sorted(raw['statuses'].items(),
+                                                      key=lambda item: item[0] or 0)},
+        'first_request_ms': ms(first_latency),
+        'first_request_status': first_status,
+    }
+
+
+def check_slo(results, settings):
+    """Return the SLO thresholds the results violate (empty if none)."""
+    violations = []
+    for key, label in (('p95_ms', "p95 latency"), ('p99_ms', "p99 latency")):
+        limit = settings.get(f"slo_{key}")
+        if limit is not None and (results[key] is None or results[key] > limit):
+            violations.append(f"{label} {results[key]} ms exceeds {limit:g} ms")
+    limit = settings.get('slo_error_rate')
+    if limit is not None and results['error_rate'] * 100 > limit:
+        violations.append(f"error rate {results['error_rate']:.2%} exceeds {limit:g}%")
+    first_status = results['first_request_status']
+    if first_status is None:
+        violations.append("first request failed (no response)")
+    elif first_status >= 400:
+        violations.append(f"first request failed (status {first_status})")
+    return violations
+
+
+def print_load_test_report(results):
+    """Show the load test results."""
+    status_counts = ", ".join(f"{status}: {count}" for status, count in results['status_counts'].items())
+    rows = [
+        ("First request", f"{results['first_request_ms']} ms "
+                          f"({results['first_request_status'] or 'no response'})"),
+        ("Requests", f"{results['requests']} in {results['duration_s']}s"),
+        ("Throughput", f"{results['throughput_rps']} req/s"),
+        ("Latency p50", f"{results['p50_ms']} ms"),
+        ("Latency p95", f"{results['p95_ms']} ms"),
+        ("Latency p99", f"{results['p99_ms']} ms"),
+        ("Error rate", f"{results['error_rate']:.2%}"),
+        ("Responses", status_counts or "none"),
+    ]
+    
+    console.print()
+    if Table is None:
+        console.print("Load test")
+        for metric, value in rows:
+            console.print(f"  {metric:<20}{value}")
+        return
+    
+    table = Table(title="Load test", box=box.SIMPLE, padding=(0, 1))
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value")
+    for metric, value in rows:
+        table.add_row(metric, value)
+    console.print(table)
+
+
+# Startup latency history, kept per Terraform working directory
+LATENCY_HISTORY_FILE = ".dc-latency.json"
+LATENCY_HISTORY_KEEP = 20
+WARM_SAMPLES = 5
+
+# Set by --measure-latency: measure startup latency after every deploy,
+# not only for the latency-sensitive profile
+measure_latency = False
+
+# Cloud Run list prices for instances kept running (USD per second, tier 1)
+ALWAYS_ON_CPU_PRICE_PER_VCPU_SECOND = 0.000018
+ALWAYS_ON_MEMORY_PRICE_PER_GIB_SECOND = 0.000002
+SECONDS_PER_MONTH = 730 * 3600
+
+
+async def _first_byte_latencies(url, headers, count):
+    """Time to first byte of count sequential requests, each on a new connection."""
+    latencies = []
+    for _ in range(count):
+        connection = _HttpConnection(url, headers)
+        started = time.perf_counter()
+        _, status = await _timed_request(connection, LOAD_TEST_DEFAULTS['timeout'])
+        connection.close()
+        ok = status is not None and status < 400
+        latencies.append(connection.first_byte - started if ok else None)
+    return latencies
+
+
+def measure_startup_latency(url, headers=None, warm_samples=WARM_SAMPLES, cold_ms=None):
+    """Measure cold and warm time to first byte of a just-deployed revision.
+    
+    The first request to a new revision is the cold one (unless an instance
+    is kept warm); the median of the requests after it is the warm one.
+    
+    Args:
+        cold_ms: First byte time of the revision's first request, if it was
+            already sent (by the readiness probe); only warm samples are taken
+    
+    Returns:
+        dict: 'cold_ms' and 'warm_ms' (None where requests failed)
+    """
+    _import_async()
+    with tracer.span("startup latency", "stage", url=url):
+        latencies = asyncio.run(_first_byte_latencies(
+            url, headers, warm_samples + (cold_ms is None)
+        ))
+    if cold_ms is not None:
+        latencies.insert(0, cold_ms / 1000)
+    
+    warm = sorted(latency for latency in latencies[1:] if latency is not None)
+    return {
+        'cold_ms': None if latencies[0] is None else round(latencies[0] * 1000, 1),
+        'warm_ms': round(warm[len(warm) // 2] * 1000, 1) if warm else None,
+    }
+
+
+def warm_instance_cost(config):
+    """Estimated monthly cost (USD) of the instances the profile keeps warm."""
+    settings = profile_settings(config)
+    instances = settings.get('min_instances', 0)
+    return instances * SECONDS_PER_MONTH * (
+        _vcpus(config.get('cpu_limit') or "1000m") * ALWAYS_ON_CPU_PRICE_PER_VCPU_SECOND
+        + _gib(config.get('memory_limit') or "256Mi") * ALWAYS_ON_MEMORY_PRICE_PER_GIB_SECOND
+    )
+
+
+def latency_history(terraform_dir):
+    """Return the startup latency measurements recorded in terraform_dir."""
+    try:
+        return json.loads((Path(terraform_dir) / LATENCY_HISTORY_FILE).read_text())
+    except (OSError, ValueError):
+        return []
+
+
+def report_startup_latency(config, terraform_dir, url, headers=None, cold_ms=None):
+    """Measure startup latency, record it and compare it with the previous profile."""
+    console.print("\n[bold cyan]Startup latency:[/bold cyan] measuring cold and warm time to first byte...")
+    measurement = {
+        'profile': config.get('profile') or 'standard',
+        'measured_at': time.time(),
+        **measure_startup_latency(url, headers, cold_ms=cold_ms),
+    }
+    
+    history = latency_history(terraform_dir)
+    before = next((entry for entry in reversed(history)
+                   if entry['profile'] != measurement['profile']), None)
+    history = (history + [measurement])[-LATENCY_HISTORY_KEEP:]
+    (Path(terraform_dir) / LATENCY_HISTORY_FILE).write_text(json.dumps(history))
+    
+    def ms(value):
+        return "failed" if value is None else f"{value:.0f} ms"
+    
+    rows = [(entry['profile'], ms(entry['cold_ms']), ms(entry['warm_ms']),
+             time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['measured_at'])))
+            for entry in (before, measurement) if entry]
+    
+    console.print()
+    if Table is None:
+        for profile, cold, warm, when in rows:
+            console.print(f"  {profile:<20}cold {cold:<12}warm {warm:<12}{when}")
+    else:
+        table = Table(title="Time to first byte", box=box.SIMPLE, padding=(0, 1))
+        table.add_column("Profile", style="cyan")
+        table.add_column("Cold", justify="right")
+        table.add_column("Warm", justify="right")
+        table.add_column("Measured", style="dim")
+        for row in rows:
+            table.add_row(*row)
+        console.print(table)
+    
+    if before is None:
+        console.print("[dim]No measurement with another profile yet; deploy once with "
+                      "--profile standard --measure-latency for a baseline.[/dim]")
+    
+    cost = warm_instance_cost(config)
+    if cost:
+        console.print(
+            f"[dim]Keeping {profile_settings(config)['min_instances']} instance(s) warm costs "
+            f"about ${cost:.0f}/month at list prices.[/dim]"
+        )
+    return measurement
+
+
+def identity_token_headers(config):
+    """Authorization headers for load testing a service that is not public."""
+    if config.get('allow_unauthenticated', True):
+        return {}
+    result = run_subprocess(
+        ["gcloud", "auth", "print-identity-token"],
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        return {}
+    return {'Authorization': f"Bearer {result.stdout.strip()}"}
+
+
+def verify_service_slo(url, settings, headers=None):
+    """Load test a deployed service and report whether it meets its SLO.
+    
+    Returns:
+        bool: True if no SLO threshold was violated
+    """
+    console.print(
+        f"\n[bold cyan]Load test:[/bold cyan] {settings['concurrency']} connections for "
+        f"{settings['duration']:g}s"
+        + (f" at {settings['rate']:g} req/s" if settings['rate'] else "")
+        + "..."
+    )
+    results = run_load_test(url, settings, headers)
+    print_load_test_report(results)
+    
+    violations = check_slo(results, settings)
+    for violation in violations:
+        print_error(f"SLO violated: {violation}")
+    if not violations:
+        print_success("Service meets its SLO")
+    return not violations
+
+
+def load_test_settings(args):
+    """Collect the load test settings from parsed arguments."""
+    settings = dict(LOAD_TEST_DEFAULTS)
+    for key in settings:
+        value = getattr(args, key, None)
+        if value is not None:
+            settings[key] = value
+    return settings
+
+
+def run_loadtest_command(args):
+    """Load test a URL, e.g. a deployed service or a local stand-in server.
+    
+    Returns:
+        int: Process exit code
+    """
+    parts = urllib.parse.urlsplit(args.url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        print_error(f"Not an http(s) URL: {args.url}")
+        return 2
+    
+    settings = load_test_settings(args)
+    if not args.json:
+        return 0 if verify_service_slo(args.url, settings) else 1
+    
+    results = run_load_test(args.url, settings)
+    violations = check_slo(results, settings)
+    print(json.dumps({**results, 'slo_violations': violations}, indent=2))
+    return 1 if violations else 0
+
+
+# Fleet deploys: bounded concurrency across targets
+DEFAULT_FLEET_PARALLELISM = 4
+
+
+def load_manifest(path):
+    """Load fleet targets from a JSON or YAML manifest.
+    
+    The manifest holds an optional 'defaults' mapping and a 'targets'
+    list. Each target takes the same keys as a --config file; a target may
+    list several 'regions' (or 'all') instead of a single 'region'.
+    
+    Returns:
+        tuple: (configs, errors)
+    
+    Raises:
+        ValueError: If the manifest cannot be read or parsed
+    """
+    manifest = load_config_file(path)
+    defaults = manifest.get('defaults') or {}
+    targets = manifest.get('targets')
+    if not isinstance(targets, list) or not targets:
+        raise ValueError(f"Manifest {path} must contain a non-empty 'targets' list")
+    
+    configs, errors, seen = [], [], set()
+    for index, target in enumerate(targets, start=1):
+        if not isinstance(target, dict):
+            errors.append(f"target {index}: must be a mapping")
+            continue
+        
+        merged = {**CONFIG_DEFAULTS, **defaults, **target}
+        regions = merged.pop('regions', None)
+        if regions == 'all':
+            regions = get_region_ids()
+        elif regions is None:
+            regions = [merged.get('region')]
+        
+        unknown = set(merged) - set(CONFIG_ENV_VARS)
+        if unknown:
+            errors.append(f"target {index}: unknown setting(s) {', '.join(sorted(unknown))}")
+            continue
+        
+        for region in regions:
+            config = {key: merged.get(key) for key in CONFIG_ENV_VARS}
+            config['region'] = region
+            try:
+                coerce_config(config)
+            except ValueError as e:
+                errors.append(f"target {index}: {e}")
+                continue
+            
+            target_errors = validate_config(config)
+            if target_errors:
+                errors.extend(f"target {index} ({region}): {error}" for error in target_errors)
+                continue
+            
+            if target_key(config) in seen:
+                errors.append(f"target {index}: {target_key(config)} is listed more than once")
+                continue
+            seen.add(target_key(config))
+            configs.append(config)
+    
+    return configs, errors
+
+
+def deploy_target(config, env, on_stage=None, fleet_size=1):
+    """Run the full Terraform pipeline for one target without prompting.
+    
+    Args:
+        config: Validated target configuration
+        env: Terraform environment from terraform_env()
+        on_stage: Optional callback invoked with each stage name
+        fleet_size: Number of targets deployed together; scales the
+            apply and readiness time budgets
+    
+    Returns:
+        dict: Result with 'target', 'success', 'url', 'stage', 'error',
+            'outcome', 'time_to_ready', 'first_byte_ms' and 'elapsed' (seconds)
+    """
+    key = target_key(config)
+    entry = start_registry_entry(config, target_state_dir(config))
+    
+    def on_wait():
+        if on_stage is not None:
+            on_stage("waiting for another run")
+    
+    try:
+        # _deploy_target() prepares the working directory under the lock
+        with target_lock(key, on_wait):
+            result = _deploy_target(config, env, on_stage, fleet_size)
+    except Exception as e:
+        entry['error'] = str(e)
+        raise
+    else:
+        entry.update(
+            outcome=result['outcome'] if result['success'] else 'failed',
+            url=result['url'],
+            plan_hash=result['plan_hash'],
+            error=result['error'],
+            time_to_ready=result['time_to_ready'],
+        )
+        return result
+    finally:
+        save_registry_entry(entry, target=key)
+
+
+def _deploy_target(config, env, on_stage, fleet_size):
+    started = time.monotonic()
+    key = target_key(config)
+    result = {'target': key, 'success': False, 'url': None, 'error': None,
+              'changed': False, 'outcome': None, 'plan_hash': None,
+              'time_to_ready': None, 'first_byte_ms': None}
+    
+    def stage(name):
+        result['stage'] = name
+        if on_stage is not None:
+            on_stage(name)
+    
+    def on_retry(attempt, delay, output):
+        stage(f"{result['stage'].split(':')[0]}: retry {attempt + 1} in {delay:.0f}s")
+    
+    def fail(error):
+        result['error'] = error.strip()[-2000:] if error else "timed out"
+        result['elapsed'] = time.monotonic() - started
+        return result
+    
+    stage("configure")
+    with tracer.span("configure", "stage", target=key):
+        terraform_dir = prepare_target_dir(config)
+        generate_tfvars(config, terraform_dir)
+    result['plan_hash'] = deploy_fingerprint(terraform_dir)
+    
+    # Image or environment-only changes skip Terraform
+    updated = False
+    changes = fast_path_changes(terraform_dir)
+    if changes:
+        stage("revision update")
+        with tracer.span("revision update", "stage", target=key):
+            updated, output = update_service_revision(config, changes, env)
+        if updated:
+            record_deploy(terraform_dir, pending_sync=True)
+            result['changed'] = True
+            result['outcome'] = 'updated'
+    
+    if not updated:
+        apis = start_api_enablement(config['project_id'])
+        stage("init")
+        with tracer.span("init", "stage", target=key):
+            success, output = retry_transient(lambda: terraform_init(terraform_dir, env),
+                                              "terraform init", on_retry)
+        if not success:
+            return fail(output)
+        
+        stage("enable apis")
+        with tracer.span("enable apis", "stage", target=key):
+            success, output = apis.result()
+        if not success:
+            return fail(output)
+        
+        stage("plan")
+        with tracer.span("plan", "stage", target=key):
+            status, output = retry_transient(lambda: plan_deploy(terraform_dir, env),
+                                             "terraform plan", on_retry, config['project_id'])
+        if status == 'failed':
+            return fail(output)
+        result['changed'] = status == 'planned'
+        result['outcome'] = 'deployed' if result['changed'] else 'unchanged'
+        
+        if result['changed']:
+            stage("apply")
+            
+            def on_event(event):
+                if event.get('type') == 'apply_start':
+                    addr = ((event.get('hook') or {}).get('resource') or {}).get('addr', '')
+                    stage(f"apply: {resource_label(addr)}")
+            
+            with tracer.span("apply", "stage", target=key):
+                success, output = apply_with_retries(
+                    terraform_dir, env,
+                    lambda: terraform_apply(terraform_dir, env,
+                                            timeout=scaled_timeout(APPLY_TIMEOUT, fleet_size),
+                                            on_event=on_event),
+                    on_retry, config['project_id']
+                )
+            if not success:
+                return fail(output)
+            record_deploy(terraform_dir)
+    
+    stage("output")
+    with tracer.span("output", "stage", target=key):
+        success, url = terraform_output(terraform_dir, "service_url", env)
+    if updated:
+        start_state_sync(terraform_dir, env, key)
+    if not success:
+        return fail(url)
+    
+    if needs_readiness_check(terraform_dir, result['changed']):
+        stage("readiness")
+        readiness = wait_until_ready(config, url, env, identity_token_headers(config), started,
+                                     timeout=scaled_timeout(READY_TIMEOUT, fleet_size), target=key)
+        record_serving(terraform_dir, readiness['ready'])
+        if not readiness['ready']:
+            result['url'] = url
+            return fail(f"not serving: {readiness['reason']}")
+        result['time_to_ready'] = readiness['seconds']
+        result['first_byte_ms'] = readiness['first_byte_ms']
+    
+    stage("done")
+    result['success'] = True
+    result['url'] = url
+    result['elapsed'] = time.monotonic() - started
+    return result
+
+
+def _fleet_status_table(status):
+    """Render the live per-target status table."""
+    table = Table(box=box.SIMPLE, padding=(0, 1))
+    table.add_column("Target", style="cyan")
+    table.add_column("Stage")
+    table.add_column("Elapsed", justify="right")
+    table.add_column("Result")
+    
+    now = time.monotonic()
+    for key, entry in status.items():
+        stage = entry['stage']
+        elapsed = (entry.get('finished') or now) - entry['started'] if entry.get('started') else 0
+        if stage == "done":
+            outcome = f"[green]{entry.get('url') or 'deployed'}[/green]"
+        elif stage == "failed":
+            outcome = "[red]failed[/red]"
+        else:
+            outcome = "[dim]...[/dim]"
+        table.add_row(key, stage, f"{elapsed:.0f}s", outcome)
+    return table
+
+
+def run_fleet(args):
+    """Deploy every target in a manifest concurrently.
+    
+    Returns:
+        int: Process exit code (0 only if every target succeeded)
+    """
+    try:
+        configs, errors = load_manifest(args.manifest)
+    except ValueError as e:
+        print_error(str(e))
+        return 2
+    
+    if errors:
+        for error in errors:
+            print_error(error)
+        return 2
+    
+    token = fetch_access_token()
+    if not token:
+        print_error("Not authenticated with gcloud")
+        console.print("  Run: gcloud auth login (or gcloud auth activate-service-account)")
+        return 1
+    
+    # One access check per project, all at once
+    projects = sorted({config['project_id'] for config in configs})
+    access = {project: run_in_background(verify_project_access, project) for project in projects}
+    denied = [project for project, future in access.items() if not future.result()]
+    if denied:
+        for project in denied:
+            print_error(f"Cannot access project: {project}")
+        return 1
+    
+    console.print(
+        f"[bold cyan]Fleet deploy:[/bold cyan] {len(configs)} target(s), "
+        f"up to {args.max_parallel} at a time"
+    )
+    
+    lock = threading.Lock()
+    status = {target_key(config): {'stage': "queued", 'started': None} for config in configs}
+    
+    def on_stage(key, stage):
+        with lock:
+            entry = status[key]
+            if entry['started'] is None:
+                entry['started'] = time.monotonic()
+            entry['stage'] = stage
+        if Live is None:
+            console.print(f"  {key}: {stage}")
+    
+    def run_one(config):
+        key = target_key(config)
+        env = terraform_env(config['project_id'], token)
+        try:
+            result = deploy_target(config, env, lambda stage: on_stage(key, stage),
+                                   fleet_size=len(configs))
+        except Exception as e:
+            result = {'target': key, 'success': False, 'url': None, 'stage': "configure",
+                      'error': str(e), 'elapsed': 0}
+        with lock:
+            status[key].update(
+                stage="done" if result['success'] else "failed",
+                url=result['url'],
+                finished=time.monotonic(),
+            )
+        return result
+    
+    results = []
+    live = (
+        Live(get_renderable=lambda: _fleet_status_table(status), console=console,
+             refresh_per_second=4)
+        if Live is not None else contextlib.nullcontext()
+    )
+    with live:
+        with ThreadPoolExecutor(max_workers=args.max_parallel) as pool:
+            futures = [pool.submit(run_one, config) for config in configs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if Live is None:
+                    outcome = result['url'] if result['success'] else "FAILED"
+                    console.print(f"  {result['target']}: {outcome} ({result['elapsed']:.0f}s)")
+    
+    results.sort(key=lambda result: result['target'])
+    failed = [result for result in results if not result['success']]
+    
+    console.print()
+    for result in failed:
+        print_error(f"{result['target']} failed during {result['stage']}")
+        console.print(f"[dim]{escape_markup(result['error'] or '')}[/dim]")
+    
+    if args.json:
+        print(json.dumps({'results': results}, indent=2))
+    else:
+        console.print()
+        for result in results:
+            if result['success']:
+                note = (f" (ready in {result['time_to_ready']:.1f}s)" if result.get('time_to_ready')
+                        else "" if result['changed'] else " (unchanged)")
+                print_success(f"{result['target']}: {result['url']}{note}")
+    
+    console.print()
+    console.print(
+        f"[bold]{len(results) - len(failed)}/{len(results)} target(s) deployed[/bold]"
+    )
+    return 1 if failed else 0
+
+
+# Cleanup: find every deployment this tool created and destroy them concurrently
+# Labels set on the service by terraform/main.tf
+MANAGED_SERVICE_FILTER = "metadata.labels.managed-by=terraform AND metadata.labels.service=nginx"
+
+
+def _state_has_resources(terraform_dir):
+    try:
+        state = json.loads((Path(terraform_dir) / "terraform.tfstate").read_text())
+    except (OSError, ValueError):
+        return False
+    return bool(state.get('resources'))
+
+
+def find_local_targets():
+    """Return the deployments with Terraform state in this directory.
+    
+    Covers every target under .deploy/targets/ and any state older
+    versions left in the shared terraform/ directory.
+    """
+    dirs = [TERRAFORM_DIR] + sorted(
+        path.parent for path in (DEPLOY_STATE_DIR / "targets").glob("*/*/*/terraform.tfstate")
+    )
+    targets = []
+    for terraform_dir in dirs:
+        values = read_tfvars(terraform_dir)
+        if not _state_has_resources(terraform_dir) or 'project_id' not in values:
+            continue
+        target = {key: values.get(key) for key in ('project_id', 'region', 'service_name')}
+        targets.append({**target, 'target': target_key(target), 'terraform_dir': terraform_dir})
+    return targets
+
+
+def discover_labeled_services(project_id):
+    """List the Cloud Run services in a project that carry this tool's labels.
+    
+    Returns:
+        list: Targets without a terraform_dir (deleted with gcloud)
+    """
+    result = run_subprocess(
+        ["gcloud", "run", "services", "list", f"--project={project_id}",
+         "--platform=managed", f"--filter={MANAGED_SERVICE_FILTER}", "--format=json"],
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"cannot list services in {project_id}")
+    
+    targets = []
+    for service in json.loads(result.stdout or "[]"):
+        metadata = service.get('metadata', {})
+        target = {
+            'project_id': project_id,
+            'region': metadata.get('labels', {}).get('cloud.googleapis.com/location'),
+            'service_name': metadata.get('name'),
+        }
+        targets.append({**target, 'target': target_key(target), 'terraform_dir': None})
+    return targets
+
+
+def destroy_target(target, env):
+    """Destroy one deployment: terraform destroy, or gcloud for label-only finds.
+    
+    Returns:
+        tuple: (success, output)
+    """
+    terraform_dir = target['terraform_dir']
+    if terraform_dir is None:
+        return run_command(
+            ["gcloud", "run", "services", "delete", target['service_name'],
+             f"--project={target['project_id']}", f"--region={target['region']}",
+             "--platform=managed", "--quiet"],
+            description="gcloud run services delete",
+            env=env
+        )
+    
+    with target_lock(target['target']):
+        success, output = terraform_init(terraform_dir, env)
+        if not success:
+            return False, output
+        success, output = run_command(
+            ["terraform", "destroy", "-auto-approve", "-input=false",
+             f"-lock-timeout={STATE_LOCK_TIMEOUT}"],
+            cwd=terraform_dir,
+            description="terraform destroy",
+            env=env
+        )
+        if not success:
+            return False, output
+        
+        # Deploy records and saved plans describe infrastructure that is gone
+        if Path(terraform_dir).resolve().is_relative_to((DEPLOY_STATE_DIR / "targets").resolve()):
+            shutil.rmtree(terraform_dir, ignore_errors=True)
+            # Drop the region and project directories once they are empty
+            for parent in (Path(terraform_dir).parent, Path(terraform_dir).parent.parent):
+                with contextlib.suppress(OSError):
+                    parent.rmdir()
+        else:
+            (Path(terraform_dir) / ".dc-last-deploy.json").unlink(missing_ok=True)
+            (Path(terraform_dir) / "tfplan").unlink(missing_ok=True)
+            shutil.rmtree(Path(terraform_dir) / ".dc-plans", ignore_errors=True)
+        return True, output
+
+
+def destroy_and_record(target, env):
+    """Destroy one deployment with destroy_target() and record it in the registry.
+    
+    Returns:
+        tuple: (success, output)
+    """
+    entry = start_registry_entry(
+        {key: target[key] for key in ('project_id', 'region', 'service_name')},
+        target['terraform_dir'],
+        action="destroy"
+    )
+    with tracer.span("destroy", "stage", target=target['target']):
+        try:
+            success, output = destroy_target(target, env)
+        except Exception as e:
+            success, output = False, str(e)
+    entry.update(outcome='destroyed' if success else 'failed',
+                 error=None if success else output)
+    save_registry_entry(entry, target=target['target'])
+    return success, output
+
+
+def run_cleanup(args):
+    """Destroy every deployment this tool created, concurrently.
+    
+    Returns:
+        int: Process exit code (0 only if every target was destroyed)
+    """
+    targets = {target['target']: target for target in find_local_targets()}
+    
+    token = fetch_access_token()
+    if not token:
+        print_error("Not authenticated with gcloud")
+        console.print("  Run: gcloud auth login (or gcloud auth activate-service-account)")
+        return 1
+    
+    if args.discover:
+        # Look in the given project, or in every project with local state
+        projects = ([args.project_id] if args.project_id
+                    else sorted({target['project_id'] for target in targets.values()}))
+        found = {project: run_in_background(discover_labeled_services, project)
+                 for project in projects}
+        for project, future in found.items():
+            try:
+                for target in future.result():
+                    targets.setdefault(target['target'], target)
+            except RuntimeError as e:
+                print_error(f"Cannot list services in {project}: {escape_markup(str(e))}")
+                return 1
+    
+    selected = [target for key, target in sorted(targets.items())
+                if not args.target or any(fnmatch.fnmatch(key, pattern) for pattern in args.target)]
+    if not selected:
+        console.print("No deployments to clean up.")
+        return 0
+    
+    console.print(f"[bold]{len(selected)} deployment(s) to destroy:[/bold]")
+    for target in selected:
+        source = target['terraform_dir'] or "found by label, deleted with gcloud"
+        console.print(f"  {target['target']}  [dim]({source})[/dim]")
+    
+    if args.dry_run:
+        return 0
+    if not args.yes:
+        if not sys.stdin.isatty():
+            print_error("Not asking for confirmation without a terminal; pass --yes to destroy them")
+            return 1
+        console.print()
+        console.print("[bold yellow]This will DELETE these resources and cannot be undone.[/bold yellow]")
+        # The prompt goes through the console, which is stderr with --json
+        console.print("Are you sure you want to destroy them? (yes/no): ", end="")
+        if input().strip() != "yes":
+            console.print("Cleanup cancelled. Resources preserved.")
+            return 0
+    
+    console.print(
+        f"\n[bold cyan]Cleanup:[/bold cyan] destroying up to {args.max_parallel} at a time"
+        + ("" if args.keep_going else ", stopping at the first failure")
+    )
+    
+    # Set on the first failure unless --keep-going; targets not yet started
+    # are then skipped
+    stop = threading.Event()
+    
+    def run_one(target):
+        if stop.is_set():
+            return None
+        started = time.monotonic()
+        env = terraform_env(target['project_id'], token)
+        success, output = destroy_and_record(target, env)
+        if not success and not args.keep_going:
+            stop.set()
+        return {'target': target['target'], 'success': success,
+                'error': None if success else (output or "").strip()[-2000:],
+                'elapsed': time.monotonic() - started}
+    
+    results, skipped = [], []
+    with ThreadPoolExecutor(max_workers=args.max_parallel) as pool:
+        futures = {pool.submit(run_one, target): target for target in selected}
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                skipped.append(futures[future]['target'])
+                continue
+            results.append(result)
+            if result['success']:
+                print_success(f"{result['target']} destroyed ({result['elapsed']:.0f}s)")
+            else:
+                print_error(f"{result['target']} failed ({result['elapsed']:.0f}s)")
+                console.print(f"[dim]{escape_markup(result['error'])}[/dim]")
+    
+    skipped.sort()
+    for key in skipped:
+        console.print(f"  [yellow]-[/yellow] {key} skipped")
+    
+    failed = [result for result in results if not result['success']]
+    if args.json:
+        print(json.dumps({'results': sorted(results, key=lambda result: result['target']),
+                          'skipped': skipped}, indent=2))
+    
+    console.print()
+    console.print(
+        f"[bold]{len(results) - len(failed)}/{len(selected)} deployment(s) destroyed[/bold]"
+    )
+    return 1 if failed or skipped else 0
+
+
+# Autoscaling tuner: measure candidate settings on a scratch service
+DEFAULT_TUNE_CONCURRENCY = "20,80,160"
+DEFAULT_TUNE_RESOURCES = "1000m/512Mi,2000m/1Gi"
+DEFAULT_TUNE_MIN_INSTANCES = "0"
+
+# max_instances is recommended with this much headroom over the fitted need
+TUNE_HEADROOM = 2.0
+
+# Cloud Run list prices (USD per second, tier 1); only used to rank candidates
+CPU_PRICE_PER_VCPU_SECOND = 0.000024
+MEMORY_PRICE_PER_GIB_SECOND = 0.0000025
+
+
+def _vcpus(cpu_limit):
+    return int(cpu_limit[:-1]) / 1000
+
+
+def _gib(memory_limit):
+    return int(memory_limit[:-2]) / (1 if memory_limit.endswith("Gi") else 1024)
+
+
+def tune_candidates(args):
+    """Expand the tune options into candidate autoscaling settings.
+    
+    Raises:
+        ValueError: If an option is malformed
+    """
+    def numbers(text, option):
+        try:
+            return [int(value) for value in text.split(",") if value.strip()]
+        except ValueError:
+            raise ValueError(f"{option}: expected comma-separated whole numbers, got {text!r}")
+    
+    resources = []
+    for pair in args.resources.split(","):
+        cpu, _, memory = pair.strip().partition("/")
+        if not re.match(CPU_LIMIT_PATTERN, cpu) or not re.match(MEMORY_LIMIT_PATTERN, memory):
+            raise ValueError(f"--resources: expected CPU/MEMORY pairs like 1000m/512Mi, got {pair!r}")
+        resources.append((cpu, memory))
+    
+    return [
+        {'container_concurrency': concurrency, 'cpu_limit': cpu, 'memory_limit': memory,
+         'min_instances': min_instances}
+        for concurrency in numbers(args.concurrency_options, "--concurrency-options")
+        for cpu, memory in resources
+        for min_instances in numbers(args.min_instances_options, "--min-instances-options")
+    ]
+
+
+def evaluate_candidate(candidate, results, args):
+    """Fit one candidate's measurements to the target load.
+    
+    The candidate ran on a single instance at its own concurrency limit, so
+    the measured throughput is what one instance sustains.
+    """
+    per_instance = results['throughput_rps'] * (1 - results['error_rate'])
+    needed = math.ceil(args.target_rps / per_instance) if per_instance else None
+    
+    problems = []
+    if results['p95_ms'] is None or results['p95_ms'] > args.target_p95_ms:
+        problems.append(f"p95 {results['p95_ms']} ms")
+    if results['error_rate'] * 100 > args.max_error_rate:
+        problems.append(f"errors {results['error_rate']:.1%}")
+    if (args.max_cold_start_ms is not None and candidate['min_instances'] == 0
+            and (results['first_request_ms'] or 0) > args.max_cold_start_ms):
+        problems.append(f"cold start {results['first_request_ms']} ms")
+    if needed is None:
+        problems.append("no successful requests")
+    
+    instances = max(needed or 0, candidate['min_instances'])
+    cost = instances * 3600 * (
+        _vcpus(candidate['cpu_limit']) * CPU_PRICE_PER_VCPU_SECOND
+        + _gib(candidate['memory_limit']) * MEMORY_PRICE_PER_GIB_SECOND
+    )
+    return {
+        **candidate,
+        'per_instance_rps': round(per_instance, 1),
+        'p95_ms': results['p95_ms'],
+        'error_rate': results['error_rate'],
+        'first_request_ms': results['first_request_ms'],
+        'instances_needed': needed,
+        'max_instances': max(math.ceil((needed or 0) * TUNE_HEADROOM), candidate['min_instances'], 1),
+        'cost_per_hour': round(cost, 4),
+        'problems': problems,
+    }
+
+
+def _tune_table(evaluations, recommended):
+    rows = []
+    for evaluation in evaluations:
+        if 'error' in evaluation:
+            verdict = "deploy failed"
+        elif evaluation['problems']:
+            verdict = "misses target: " + ", ".join(evaluation['problems'])
+        else:
+            verdict = "recommended" if evaluation is recommended else "meets target"
+        rows.append((
+            str(evaluation['container_concurrency']),
+            f"{evaluation['cpu_limit']}/{evaluation['memory_limit']}",
+            str(evaluation['min_instances']),
+            f"{evaluation.get('per_instance_rps', '-')}",
+            f"{evaluation.get('p95_ms', '-')}",
+            f"{evaluation.get('instances_needed') or '-'}",
+            f"${evaluation['cost_per_hour']:.3f}" if 'cost_per_hour' in evaluation else "-",
+            verdict,
+        ))
+    
+    headers = ("Concurrency", "CPU/Memory", "Min", "Req/s per instance", "p95 ms",
+               "Instances", "Cost/h", "Result")
+    console.print()
+    if Table is None:
+        console.print("Tuning results")
+        for row in rows:
+            console.print("  " + "  ".join(f"{header}={value}" for header, value in zip(headers, row)))
+        return
+    
+    table = Table(title="Tuning results", box=box.SIMPLE, padding=(0, 1))
+    for header in headers:
+        table.add_column(header, justify="left" if header in ("CPU/Memory", "Result") else "right")
+    for row in rows:
+        table.add_row(*row)
+    console.print(table)
+
+
+def run_tune(args):
+    """Find the cheapest autoscaling settings that meet a latency target.
+    
+    Each candidate (concurrency, CPU/memory, min instances) is deployed to a
+    scratch service named <service>-tune, pinned to one instance, and load
+    tested at its concurrency limit. The measured per-instance throughput
+    gives the instances needed for --target-rps, and so an hourly cost.
+    
+    Returns:
+        int: Process exit code
+    """
+    try:
+        config = build_config(args)
+        candidates = tune_candidates(args)
+    except ValueError as e:
+        print_error(str(e))
+        return 2
+    
+    errors = validate_config(config)
+    if errors:
+        for error in errors:
+            print_error(error)
+        return 2
+    
+    token_future = run_in_background(fetch_access_token)
+    if not verify_project_access(config['project_id']):
+        print_error(f"Cannot access project: {config['project_id']}")
+        return 1
+    token = token_future.result()
+    if not token:
+        print_error("Not authenticated with gcloud")
+        console.print("  Run: gcloud auth login (or gcloud auth activate-service-account)")
+        return 1
+    
+    scratch = {**config, 'service_name': f"{config['service_name'][:58].rstrip('-')}-tune",
+               'max_instances': 1}
+    env = terraform_env(config['project_id'], token)
+    console.print(
+        f"[bold cyan]Tuning:[/bold cyan] {len(candidates)} candidate(s) on "
+        f"{scratch['service_name']}, {args.round_duration:g}s each, "
+        f"target p95 {args.target_p95_ms:g} ms at {args.target_rps:g} req/s"
+    )
+    
+    evaluations = []
+    scratch_dir = None
+    for number, candidate in enumerate(candidates, start=1):
+        round_config = {**scratch, **candidate}
+        console.print(
+            f"\n[bold]Round {number}/{len(candidates)}:[/bold] concurrency "
+            f"{candidate['container_concurrency']}, {candidate['cpu_limit']}/"
+            f"{candidate['memory_limit']}, min instances {candidate['min_instances']}"
+        )
+        with spinner("Deploying candidate..."):
+            result = deploy_target(round_config, env)
+        scratch_dir = target_state_dir(scratch)
+        if not result['success']:
+            print_error(f"Deploy failed during {result['stage']}")
+            console.print(f"[dim]{escape_markup(result['error'] or '')}[/dim]")
+            evaluations.append({**candidate, 'error': result['error']})
+            continue
+        
+        settings = {**LOAD_TEST_DEFAULTS, 'concurrency': candidate['container_concurrency'],
+                    'duration': args.round_duration}
+        results = run_load_test(result['url'], settings, identity_token_headers(round_config))
+        if result['first_byte_ms'] is not None:
+            # The readiness probe sent the candidate revision's first request
+            results['first_request_ms'] = result['first_byte_ms']
+        evaluation = evaluate_candidate(candidate, results, args)
+        evaluations.append(evaluation)
+        console.print(
+            f"  {evaluation['per_instance_rps']} req/s per instance, p95 "
+            f"{evaluation['p95_ms']} ms, errors {evaluation['error_rate']:.1%}"
+        )
+    
+    passing = [evaluation for evaluation in evaluations
+               if 'error' not in evaluation and not evaluation['problems']]
+    recommended = min(
+        passing,
+        key=lambda evaluation: (evaluation['cost_per_hour'], evaluation['instances_needed']),
+        default=None
+    )
+    
+    if args.json:
+        print(json.dumps({'candidates': evaluations, 'recommended': recommended}, indent=2))
+    else:
+        _tune_table(evaluations, recommended)
+    
+    if scratch_dir is not None and not args.keep_scratch:
+        with spinner(f"Removing {scratch['service_name']}..."):
+            success, _ = destroy_and_record(
+                {**scratch, 'target': target_key(scratch), 'terraform_dir': scratch_dir}, env
+            )
+        if not success:
+            print_error(f"Could not remove {scratch['service_name']}; remove it with "
+                        f"terraform destroy in {scratch_dir}")
+    
+    if recommended is None:
+        print_error("No candidate met the target; try larger resources or a lower concurrency")
+        return 1
+    
+    settings = {key: recommended[key] for key in
+                ('container_concurrency', 'cpu_limit', 'memory_limit', 'min_instances', 'max_instances')}
+    flags = " ".join(f"--{key.replace('_', '-')} {value}" for key, value in settings.items())
+    print_success(
+        f"Recommended: {flags} (about {recommended['instances_needed']} instance(s), "
+        f"${recommended['cost_per_hour']:.3f}/h at {args.target_rps:g} req/s)"
+    )
+    
+    if not args.apply:
+        console.print(f"  Deploy with: python3 setup.py --non-interactive --project "
+                      f"{config['project_id']} --service-name {config['service_name']} "
+                      f"--region {config['region']} {flags}")
+        return 0
+    
+    final = {**config, **settings}
+    print_configuration_summary(final)
+    success = deploy_infrastructure(final, {'token': token_future}, assume_yes=True)
+    return 0 if success else 1
+
+
+def mirror_providers(mirror_dir):
+    """Download the providers this configuration needs into a local mirror.
+    
+    The mirror can then be used with --provider-mirror, e.g. on runners
+    without internet access.
+    
+    Returns:
+        int: Process exit code
+    """
+    mirror_dir = Path(mirror_dir).expanduser().resolve()
+    console.print(f"Mirroring Terraform providers into {mirror_dir}...")
+    success, output = run_command(
+        ["terraform", "providers", "mirror", str(mirror_dir)],
+        cwd=TERRAFORM_DIR,
+        description="terraform providers mirror"
+    )
+    if not success:
+        print_error("Provider mirror failed")
+        console.print(f"\n[red]{escape_markup(output)}[/red]\n")
+        return 1
+    
+    print_success(f"Providers mirrored: {', '.join(_mirrored_providers(mirror_dir))}")
+    console.print(f"  Use with: python3 setup.py --provider-mirror {mirror_dir}")
+    return 0
+
+
+# Registry commands: answer from the local registry, without cloud calls
+REGISTRY_TARGET_SQL = "project_id || '/' || region || '/' || service_name"
+
+
+def _registry_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def _registry_json(rows):
+    """Decode the JSON columns of registry rows for --json output."""
+    return [
+        {**row, 'target': target_key(row),
+         'config': json.loads(row['config'] or "{}"), 'stages': json.loads(row['stages'] or "{}")}
+        for row in rows
+    ]
+
+
+def _registry_table(title, headers, rows):
+    if Table is None:
+        console.print(title)
+        for row in rows:
+            console.print("  " + "  ".join(row))
+        return
+    table = Table(title=title, box=box.SIMPLE, padding=(0, 1))
+    for header in headers:
+        table.add_column(header, justify="right" if header == "Duration" else "left")
+    for row in rows:
+        table.add_row(*(escape_markup(value) for value in row))
+    console.print(table)
+
+
+def run_list(args):
+    """List the deployed targets the registry knows about."""
+    rows = registry_latest(include_failed=args.all)
+    if not args.all:
+        rows = [row for row in rows if row['outcome'] in LIVE_OUTCOMES]
+    
+    if args.json:
+        print(json.dumps({'targets': _registry_json(rows)}, indent=2))
+        return 0
+    if not rows:
+        console.print("No deployments recorded." if args.all else "No live deployments recorded.")
+        return 0
+    _registry_table(
+        "Deployments",
+        ("Target", "Outcome", "Last change", "URL"),
+        [(target_key(row), row['outcome'], _registry_time(row['started_at']), row['url'] or "-")
+         for row in rows]
+    )
+    return 0
+
+
+def run_status(args):
+    """Show the latest deploy, stage timings and last failure of matching targets.
+    
+    Returns:
+        int: Process exit code (1 if no target matched)
+    """
+    targets = [row for row in registry_latest()
+               if any(fnmatch.fnmatch(target_key(row), pattern) for pattern in args.patterns)]
+    if not targets:
+        print_error(f"No recorded deployments match: {' '.join(args.patterns)}")
+        return 1
+    
+    statuses = []
+    for latest in targets:
+        key = (latest['project_id'], latest['region'], latest['service_name'])
+        
+        def last(outcomes):
+            # Served by the deploys_by_target index
+            rows = query_registry(
+                f"SELECT * FROM deploys WHERE project_id = ? AND region = ? AND service_name = ? "
+                f"AND outcome IN ({', '.join('?' * len(outcomes))}) "
+                f"ORDER BY started_at DESC LIMIT 1",
+                key + tuple(outcomes)
+            )
+            return rows[0] if rows else None
+        
+        statuses.append({
+            'latest': latest,
+            'last_success': last(LIVE_OUTCOMES),
+            'last_failure': last(('failed',)),
+        })
+    
+    if args.json:
+        print(json.dumps({'targets': [
+            {name: _registry_json([row])[0] if row else None for name, row in status.items()}
+            for status in statuses
+        ]}, indent=2))
+        return 0
+    
+    for status in statuses:
+        latest, success, failure = status['latest'], status['last_success'], status['last_failure']
+        console.print(f"\n[bold cyan]{target_key(latest)}[/bold cyan]")
+        console.print(f"  {'Last ' + latest['action'] + ':':<14}{latest['outcome']} at "
+                      f"{_registry_time(latest['started_at'])} ({latest['duration'] or 0:.1f}s)")
+        # Details of the revision that is serving, which a failed deploy left in place
+        if success and latest['outcome'] != 'destroyed':
+            config = json.loads(success['config'] or "{}")
+            console.print(f"  URL:          {success['url'] or '-'}")
+            console.print(f"  Image:        {config.get('container_image') or DEFAULT_CONTAINER_IMAGE}")
+            console.print(f"  Plan hash:    {(success['plan_hash'] or '-')[:12]}")
+            if success['time_to_ready'] is not None:
+                console.print(f"  Ready after:  {success['time_to_ready']:.1f}s")
+            stages = json.loads(success['stages'] or "{}")
+            if stages:
+                console.print("  Stages:       " + ", ".join(
+                    f"{name} {seconds:.1f}s" for name, seconds in stages.items()))
+        if failure:
+            error = (failure['error'] or "no details recorded").strip().splitlines()[-1]
+            console.print(f"  Last failure: {_registry_time(failure['started_at'])}: "
+                          f"[red]{escape_markup(error)}[/red]")
+    console.print()
+    return 0
+
+
+def run_history(args):
+    """Show recorded deploys and destroys, newest first."""
+    condition, parameters = "", []
+    if args.pattern:
+        condition, parameters = f"WHERE {REGISTRY_TARGET_SQL} GLOB ?", [args.pattern]
+    rows = query_registry(
+        f"SELECT * FROM deploys {condition} ORDER BY started_at DESC LIMIT ?",
+        parameters + [args.limit]
+    )
+    
+    if args.json:
+        print(json.dumps({'deploys': _registry_json(rows)}, indent=2))
+        return 0
+    if not rows:
+        console.print("No deployments recorded.")
+        return 0
+    _registry_table(
+        "Deploy history",
+        ("Time", "Target", "Action", "Outcome", "Duration", "Plan"),
+        [(_registry_time(row['started_at']), target_key(row), row['action'], row['outcome'],
+          f"{row['duration'] or 0:.1f}s", (row['plan_hash'] or "-")[:12])
+         for row in rows]
+    )
+    return 0
+
+
+REGISTRY_COMMANDS = {'list': run_list, 'status': run_status, 'history': run_history}
+
+
+def add_load_test_arguments(parser, default=None):
+    """Add the load test and SLO options shared by --load-test and loadtest."""
+    parser.add_argument(
+        "--load-concurrency",
+        dest="concurrency",
+        type=int,
+        default=default,
+        metavar="N",
+        help=f"concurrent connections (default: {LOAD_TEST_DEFAULTS['concurrency']})"
+    )
+    parser.add_argument(
+        "--load-duration",
+        dest="duration",
+        type=float,
+        default=default,
+        metavar="SECONDS",
+        help=f"how long to send requests (default: {LOAD_TEST_DEFAULTS['duration']:g})"
+    )
+    parser.add_argument(
+        "--load-rate",
+        dest="rate",
+        type=float,
+        default=default,
+        metavar="RPS",
+        help="total requests per second (default: as fast as responses arrive)"
+    )
+    parser.add_argument(
+        "--load-timeout",
+        dest="timeout",
+        type=float,
+        default=default,
+        metavar="SECONDS",
+        help=f"per-request timeout (default: {LOAD_TEST_DEFAULTS['timeout']:g})"
+    )
+    parser.add_argument(
+        "--slo-p95-ms",
+        type=float,
+        default=default,
+        metavar="MS",
+        help="fail if p95 latency exceeds MS milliseconds"
+    )
+    parser.add_argument(
+        "--slo-p99-ms",
+        type=float,
+        default=default,
+        metavar="MS",
+        help="fail if p99 latency exceeds MS milliseconds"
+    )
+    parser.add_argument(
+        "--slo-error-rate",
+        type=float,
+        default=default,
+        metavar="PERCENT",
+        help="fail if more than PERCENT of requests fail"
+    )
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Deploy a Cloud Run service with Terraform."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="ignore cached gcloud results (project list, access checks, tokens)"
+    )
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        help="deploy without prompts, using the flags below, DC_DEPLOY_* "
+             "environment variables or --config"
+    )
+    parser.add_argument(
+        "--config",
+        default=os.environ.get('DC_DEPLOY_CONFIG'),
+        metavar="FILE",
+        help="JSON or YAML file with deployment settings (non-interactive mode)"
+    )
+    parser.add_argument("--project", dest="project_id", help="GCP project ID")
+    parser.add_argument("--service-name", help="Cloud Run service name")
+    parser.add_argument("--region", help="deployment region (e.g. us-central1)")
+    parser.add_argument(
+        "--allow-unauthenticated",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="allow public (unauthenticated) access"
+    )
+    parser.add_argument(
+        "--image",
+        dest="container_image",
+        help=f"container image to deploy (default: {DEFAULT_CONTAINER_IMAGE})"
+    )
+    parser.add_argument(
+        "--env",
+        dest="env_vars",
+        action="append",
+        metavar="KEY=VALUE",
+        help="container environment variable (repeatable)"
+    )
+    parser.add_argument("--cpu-limit", help="container CPU limit (e.g. 1000m)")
+    parser.add_argument("--memory-limit", help="container memory limit (e.g. 512Mi)")
+    parser.add_argument("--min-instances", type=int, help="minimum instances kept warm (default: 0)")
+    parser.add_argument("--max-instances", type=int, help="maximum instances (default: 10)")
+    parser.add_argument(
+        "--profile",
+        choices=list(DEPLOY_PROFILES),
+        help="performance profile; latency-sensitive keeps an instance warm and "
+             "boosts startup CPU (default: standard)"
+    )
+    parser.add_argument(
+        "--container-concurrency",
+        type=int,
+        metavar="N",
+        help="concurrent requests per instance (default: 80)"
+    )
+    parser.add_argument(
+        "--upgrade",
+        action="store_true",
+        help="upgrade Terraform providers and modules during init"
+    )
+    parser.add_argument(
+        "--force-plan",
+        action="store_true",
+        help="always run terraform plan, even if nothing changed since the last deploy"
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="refresh every resource when planning, not only those whose inputs changed "
+             f"(happens automatically every {FULL_REFRESH_INTERVAL // 3600} hours)"
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=os.environ.get('DC_DEPLOY_PARALLELISM'),
+        metavar="N",
+        help="concurrent resource operations in terraform plan and apply "
+             "(default: DC_DEPLOY_PARALLELISM or Terraform's 10)"
+    )
+    parser.add_argument(
+        "--provider-mirror",
+        default=provider_mirror,
+        metavar="DIR",
+        help="install Terraform providers from this local filesystem mirror "
+             "(see the mirror-providers command)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last deploy from the first stage it did not complete, "
+             "with the configuration it used"
+    )
+    parser.add_argument(
+        "--skip-readiness",
+        action="store_true",
+        help="do not wait for the service URL to answer after a deploy "
+             "(e.g. when it is not reachable from this machine)"
+    )
+    parser.add_argument(
+        "--projects-in",
+        default=project_parent,
+        metavar="PARENT",
+        help="only offer projects directly under folders/ID or organizations/ID "
+             "in the project picker"
+    )
+    parser.add_argument(
+        "--project-label",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="only offer projects with this label in the project picker (repeatable)"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write the timing trace (Chrome trace format) to FILE instead of "
+             f"{TRACE_DIR}/"
+    )
+    parser.add_argument(
+        "--fast-start",
+        action="store_true",
+        default=os.environ.get('DC_DEPLOY_FAST_START') == '1',
+        help="skip the dependency check and assume rich/questionary are installed"
+    )
+    parser.add_argument(
+        "--load-test",
+        action="store_true",
+        help="load test the service after deploying and fail if it misses its SLO"
+    )
+    add_load_test_arguments(parser)
+    parser.add_argument(
+        "--measure-latency",
+        action="store_true",
+        help="measure cold and warm time to first byte after deploying "
+             "(always done for the latency-sensitive profile)"
+    )
+    
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    
+    fleet = commands.add_parser(
+        "fleet",
+        help="deploy every target in a manifest concurrently"
+    )
+    fleet.add_argument("manifest", help="JSON or YAML manifest of targets")
+    fleet.add_argument(
+        "--max-parallel",
+        type=int,
+        default=DEFAULT_FLEET_PARALLELISM,
+        metavar="N",
+        help=f"deploy at most N targets at once (default: {DEFAULT_FLEET_PARALLELISM})"
+    )
+    fleet.add_argument(
+        "--json",
+        action="store_true",
+        help="print the aggregated results as JSON"
+    )
+    
+    mirror = commands.add_parser(
+        "mirror-providers",
+        help="download the required Terraform providers into a local mirror"
+    )
+    mirror.add_argument("mirror_dir", metavar="DIR", help="mirror directory")
+    
+    cleanup = commands.add_parser(
+        "cleanup",
+        help="destroy every deployment this tool created, concurrently"
+    )
+    cleanup.add_argument(
+        "--target",
+        action="append",
+        metavar="PATTERN",
+        help="only destroy targets matching PROJECT/REGION/SERVICE glob PATTERN (repeatable)"
+    )
+    cleanup.add_argument(
+        "--discover",
+        action="store_true",
+        help="also delete labelled Cloud Run services without local state "
+             "(in --project, or the projects with local state)"
+    )
+    cleanup.add_argument(
+        "--max-parallel",
+        type=int,
+        default=DEFAULT_FLEET_PARALLELISM,
+        metavar="N",
+        help=f"destroy at most N targets at once (default: {DEFAULT_FLEET_PARALLELISM})"
+    )
+    cleanup.add_argument(
+        "--keep-going",
+        action="store_true",
+        help="keep destroying the other targets after a failure"
+    )
+    cleanup.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only list what would be destroyed"
+    )
+    cleanup.add_argument(
+        "-y", "--yes",
+        action="store_true",
+        help="do not ask for confirmation"
+    )
+    cleanup.add_argument(
+        "--json",
+        action="store_true",
+        help="print the results as JSON"
+    )
+    
+    listing = commands.add_parser(
+        "list",
+        help="list the deployed services recorded locally (no cloud calls)"
+    )
+    listing.add_argument(
+        "--all",
+        action="store_true",
+        help="also list destroyed targets and targets whose last deploy failed"
+    )
+    listing.add_argument(
+        "--json",
+        action="store_true",
+        help="print the targets as JSON"
+    )
+    
+    status = commands.add_parser(
+        "status",
+        help="show the recorded state of targets (no cloud calls)"
+    )
+    status.add_argument(
+        "patterns",
+        nargs="+",
+        metavar="PATTERN",
+        help="PROJECT/REGION/SERVICE glob pattern"
+    )
+    status.add_argument(
+        "--json",
+        action="store_true",
+        help="print the status as JSON"
+    )
+    
+    history = commands.add_parser(
+        "history",
+        help="show recorded deploys and destroys, newest first (no cloud calls)"
+    )
+    history.add_argument(
+        "pattern",
+        nargs="?",
+        metavar="PATTERN",
+        help="only show targets matching PROJECT/REGION/SERVICE glob PATTERN"
+    )
+    history.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        metavar="N",
+        help="show at most N entries (default: 20)"
+    )
+    history.add_argument(
+        "--json",
+        action="store_true",
+        help="print the entries as JSON"
+    )
+    
+    sync = commands.add_parser(
+        "sync-state",
+        help="refresh Terraform state after a direct revision update (run automatically)"
+    )
+    sync.add_argument("terraform_dir", metavar="DIR", help="Terraform working directory")
+    sync.add_argument("--target", required=True, metavar="KEY",
+                      help="target (PROJECT/REGION/SERVICE) whose lock to hold")
+    sync.add_argument("--tfvars-hash", required=True, metavar="SHA256",
+                      help="hash of the terraform.tfvars that was rolled out")
+    
+    loadtest = commands.add_parser(
+        "loadtest",
+        help="load test a URL and report throughput, latency and errors"
+    )
+    loadtest.add_argument("url", help="URL to send GET requests to")
+    # SUPPRESS keeps options given before the command from being reset
+    add_load_test_arguments(loadtest, default=argparse.SUPPRESS)
+    loadtest.add_argument(
+        "--json",
+        action="store_true",
+        help="print the results as JSON"
+    )
+    
+    tune = commands.add_parser(
+        "tune",
+        help="find the cheapest autoscaling settings that meet a latency target "
+             "(uses --project, --service-name and --region)"
+    )
+    tune.add_argument(
+        "--target-p95-ms",
+        type=float,
+        required=True,
+        metavar="MS",
+        help="p95 latency each candidate must stay under"
+    )
+    tune.add_argument(
+        "--target-rps",
+        type=float,
+        required=True,
+        metavar="RPS",
+        help="peak load the service must handle, in requests per second"
+    )
+    tune.add_argument(
+        "--concurrency-options",
+        default=DEFAULT_TUNE_CONCURRENCY,
+        metavar="LIST",
+        help=f"container concurrency values to try (default: {DEFAULT_TUNE_CONCURRENCY})"
+    )
+    tune.add_argument(
+        "--resources",
+        default=DEFAULT_TUNE_RESOURCES,
+        metavar="LIST",
+        help=f"CPU/memory pairs to try (default: {DEFAULT_TUNE_RESOURCES})"
+    )
+    tune.add_argument(
+        "--min-instances-options",
+        default=DEFAULT_TUNE_MIN_INSTANCES,
+        metavar="LIST",
+        help=f"minimum instance counts to try (default: {DEFAULT_TUNE_MIN_INSTANCES})"
+    )
+    tune.add_argument(
+        "--round-duration",
+        type=float,
+        default=30.0,
+        metavar="SECONDS",
+        help="load test length per candidate (default: 30)"
+    )
+    tune.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=1.0,
+        metavar="PERCENT",
+        help="highest acceptable error rate (default: 1)"
+    )
+    tune.add_argument(
+        "--max-cold-start-ms",
+        type=float,
+        metavar="MS",
+        help="reject candidates that scale to zero if their first request is slower"
+    )
+    tune.add_argument(
+        "--apply",
+        action="store_true",
+        help="deploy the recommended settings to the service"
+    )
+    tune.add_argument(
+        "--keep-scratch",
+        action="store_true",
+        help="keep the <service>-tune scratch service afterwards"
+    )
+    tune.add_argument(
+        "--json",
+        action="store_true",
+        help="print the candidates and recommendation as JSON"
+    )
+    
+    args = parser.parse_args(argv)
+    if getattr(args, 'max_parallel', 1) < 1:
+        parser.error("--max-parallel must be at least 1")
+    if args.parallelism is not None and args.parallelism < 1:
+        parser.error("--parallelism must be at least 1")
+    if args.projects_in and not re.fullmatch(r'(folders|organizations)/\d+', args.projects_in):
+        parser.error("--projects-in must be folders/ID or organizations/ID")
+    for label in args.project_label:
+        if not re.fullmatch(r'[a-z][a-z0-9_-]*=[a-z0-9_-]*', label):
+            parser.error(f"--project-label must be KEY=VALUE with a valid label key: {label}")
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--load-concurrency must be at least 1")
+    if args.duration is not None and args.duration <= 0:
+        parser.error("--load-duration must be positive")
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--load-rate must be positive")
+    if args.command == "tune":
+        for flag in ('target_p95_ms', 'target_rps', 'round_duration'):
+            if getattr(args, flag) <= 0:
+                parser.error(f"--{flag.replace('_', '-')} must be positive")
+    return args
+
+
+def main(argv=None):
+    """Main deployment workflow."""
+    global cache_bypass, upgrade_providers, provider_mirror, force_plan, load_test, measure_latency
+    global project_parent, project_labels, check_readiness, full_refresh, terraform_parallelism
+    
+    args = parse_args(argv)
+    if args.no_cache:
+        cache_bypass = True
+    upgrade_providers = args.upgrade
+    force_plan = args.force_plan
+    full_refresh = args.full_refresh
+    terraform_parallelism = args.parallelism
+    provider_mirror = args.provider_mirror
+    project_parent = args.projects_in
+    project_labels = args.project_label
+    check_readiness = not args.skip_readiness
+    measure_latency = args.measure_latency
+    if args.load_test:
+        load_test = load_test_settings(args)
+    prune_cache()
+    
+    if args.command == "mirror-providers":
+        sys.exit(mirror_providers(args.mirror_dir))
+    
+    if args.command == "sync-state":
+        sys.exit(sync_state(args.terraform_dir, args.target, args.tfvars_hash))
+    
+    if args.command in REGISTRY_COMMANDS:
+        if sys.stdout.isatty() and not args.json:
+            load_ui(check_dependencies=not args.fast_start)
+        sys.exit(REGISTRY_COMMANDS[args.command](args))
+    
+    if args.command == "loadtest":
+        if sys.stdout.isatty() and not args.json:
+            load_ui(check_dependencies=not args.fast_start)
+        sys.exit(run_loadtest_command(args))
+    
+    if args.command == "cleanup":
+        if args.json:
+            use_stderr_console()
+        elif sys.stdout.isatty():
+            load_ui(check_dependencies=not args.fast_start)
+        exit_code = run_cleanup(args)
+    elif args.command == "tune":
+        if args.json:
+            use_stderr_console()
+        elif sys.stdout.isatty():
+            load_ui(check_dependencies=not args.fast_start)
+        exit_code = run_tune(args)
+    elif args.command == "fleet":
+        # Only a live status table needs the UI libraries
+        if args.json:
+            use_stderr_console()
+        elif sys.stdout.isatty():
+            load_ui(check_dependencies=not args.fast_start)
+        exit_code = run_fleet(args)
+    elif args.non_interactive:
+        # No terminal UI is loaded on this path
+        exit_code = run_non_interactive(args)
+    else:
+        exit_code = run_interactive(args)
+    
+    finish_trace(args.trace, quiet=getattr(args, 'json', False))
+    sys.exit(exit_code)
+
+
+def run_interactive(args):
+    """Run the interactive wizard and deploy.
+    
+    Returns:
+        int: Process exit code
+    """
+    if args.resume:
+        # The checkpoint has the configuration; no wizard, no project listing
+        preflight = {'token': run_in_background(fetch_access_token)}
+        load_ui(check_dependencies=not args.fast_start)
+        config = checkpoint_config()
+        if config is None:
+            return 2
+    else:
+        # Start the gcloud preflight calls (including the slow project listing)
+        # before anything is drawn, so they run while the banner is being read
+        preflight = start_preflight()
+        
+        load_ui(check_dependencies=not args.fast_start)
+        print_welcome_banner()
+        
+        # Collect configuration
+        config = collect_configuration(preflight)
+        
+        if not config:
+            console.print("\n[yellow]Configuration cancelled.[/yellow]\n")
+            return 0
+    
+    # Show summary
+    print_configuration_summary(config)
+    
+    # Deploy
+    success = deploy_infrastructure(config, preflight, resume=args.resume)
+    return 0 if success else 1
+
+
+def finish_trace(path=None, quiet=False):
+    """Print the timing summary and write the trace once a deploy has run.
+    
+    Args:
+        quiet: Only write the trace file (stdout holds a --json document)
+    """
+    if not any(category == 'stage' for category, *_ in tracer.summary()):
+        return
+    
+    if not quiet:
+        print_timing_summary()
+    try:
+        trace_path = write_trace(path)
+        if not quiet:
+            console.print(f"[dim]Timing trace: {trace_path}[/dim]")
+    except OSError as e:
+        console.print(f"[yellow]Warning: could not write timing trace: {e}[/yellow]")
+
+
+def run():
+    """Run main() as the command-line entry point, reporting errors and Ctrl-C."""
+    try:
+        main()
+    except KeyboardInterrupt:
+        console.print("\n\n[yellow]Deployment cancelled by user.[/yellow]\n")
+        sys.exit(0)
+    except Exception as e:
+        # Escape any Rich markup in the error message
+        console.print(f"\n\n[red]Error: {escape_markup(str(e))}[/red]\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
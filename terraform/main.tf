@@ -10,7 +10,7 @@
  */
 
 terraform {
-  required_version = ">= 1.5.0"
+  required_version = ">= 1.7.0"
 
   required_providers {
     google = {
@@ -25,26 +25,42 @@ provider "google" {
   region  = var.region
 }
 
-# Enable required GCP APIs
-resource "google_project_service" "cloudrun_api" {
-  project = var.project_id
-  service = "run.googleapis.com"
+# Required GCP APIs are enabled once per project by setup.py before the
+# first plan, outside this configuration, so deploys do not refresh them.
+# setup.py reads this list. Without setup.py, enable them first:
+#   gcloud services enable run.googleapis.com artifactregistry.googleapis.com iam.googleapis.com
+locals {
+  required_apis = [
+    "run.googleapis.com",
+    "artifactregistry.googleapis.com",
+    "iam.googleapis.com",
+  ]
+}
 
-  disable_on_destroy = false
+# Earlier versions managed the APIs as resources. Forget them without
+# destroying anything, so existing states do not plan "3 to destroy".
+removed {
+  from = google_project_service.cloudrun_api
+
+  lifecycle {
+    destroy = false
+  }
 }
 
-resource "google_project_service" "artifactregistry_api" {
-  project = var.project_id
-  service = "artifactregistry.googleapis.com"
+removed {
+  from = google_project_service.artifactregistry_api
 
-  disable_on_destroy = false
+  lifecycle {
+    destroy = false
+  }
 }
 
-resource "google_project_service" "iam_api" {
-  project = var.project_id
-  service = "iam.googleapis.com"
+removed {
+  from = google_project_service.iam_api
 
-  disable_on_destroy = false
+  lifecycle {
+    destroy = false
+  }
 }
 
 # Cloud Run Service
@@ -52,26 +68,33 @@ resource "google_cloud_run_service" "nginx" {
   name     = var.service_name
   location = var.region
 
-  # Ensure APIs are enabled before creating the service
-  depends_on = [
-    google_project_service.cloudrun_api,
-    google_project_service.artifactregistry_api,
-    google_project_service.iam_api
-  ]
-
   template {
     metadata {
-      annotations = {
-        # Autoscaling configuration (revision-level)
-        "autoscaling.knative.dev/minScale" = "0"
-        "autoscaling.knative.dev/maxScale" = "10"
-      }
+      annotations = merge(
+        {
+          # Autoscaling configuration (revision-level)
+          "autoscaling.knative.dev/minScale" = tostring(var.min_instances)
+          "autoscaling.knative.dev/maxScale" = tostring(var.max_instances)
+        },
+        # Cold-start mitigation (latency-sensitive profile)
+        var.startup_cpu_boost ? { "run.googleapis.com/startup-cpu-boost" = "true" } : {},
+        var.cpu_always_allocated ? { "run.googleapis.com/cpu-throttling" = "false" } : {}
+      )
     }
 
     spec {
       containers {
         image = var.container_image
 
+        # Environment variables
+        dynamic "env" {
+          for_each = var.env_vars
+          content {
+            name  = env.key
+            value = env.value
+          }
+        }
+
         # Resource limits
         resources {
           limits = {
@@ -84,10 +107,25 @@ resource "google_cloud_run_service" "nginx" {
         ports {
           container_port = 8080
         }
+
+        # Startup probe: hold traffic until the container listens
+        dynamic "startup_probe" {
+          for_each = var.startup_probe ? [1] : []
+          content {
+            initial_delay_seconds = 0
+            period_seconds        = 1
+            timeout_seconds       = 1
+            failure_threshold     = 30
+
+            tcp_socket {
+              port = 8080
+            }
+          }
+        }
       }
 
       # Concurrency: Maximum number of requests per container instance
-      container_concurrency = 80
+      container_concurrency = var.container_concurrency
 
       # Service account (uses default if not specified)
       # service_account_name = google_service_account.cloudrun_sa.email
@@ -42,10 +42,6 @@ output "resource_limits" {
 }
 
 output "enabled_apis" {
-  description = "GCP APIs enabled for this deployment"
-  value = [
-    google_project_service.cloudrun_api.service,
-    google_project_service.artifactregistry_api.service,
-    google_project_service.iam_api.service
-  ]
+  description = "GCP APIs this deployment requires (enabled by setup.py)"
+  value       = local.required_apis
 }
@@ -57,6 +57,12 @@ variable "container_image" {
   # "nginx:alpine"
 }
 
+variable "env_vars" {
+  description = "Environment variables passed to the container"
+  type        = map(string)
+  default     = {}
+}
+
 variable "cpu_limit" {
   description = "CPU limit for container (e.g., '1000m' = 1 vCPU, '2000m' = 2 vCPU)"
   type        = string
@@ -79,3 +85,54 @@ variable "memory_limit" {
   }
 }
 
+
+variable "min_instances" {
+  description = "Minimum number of instances kept warm (0 allows scaling to zero)"
+  type        = number
+  default     = 0
+
+  validation {
+    condition     = var.min_instances >= 0 && var.min_instances <= 1000 && floor(var.min_instances) == var.min_instances
+    error_message = "Minimum instances must be a whole number between 0 and 1000."
+  }
+}
+
+variable "max_instances" {
+  description = "Maximum number of instances the service may scale out to"
+  type        = number
+  default     = 10
+
+  validation {
+    condition     = var.max_instances >= 1 && var.max_instances <= 1000 && floor(var.max_instances) == var.max_instances
+    error_message = "Maximum instances must be a whole number between 1 and 1000."
+  }
+}
+
+variable "container_concurrency" {
+  description = "Maximum number of concurrent requests per container instance"
+  type        = number
+  default     = 80
+
+  validation {
+    condition     = var.container_concurrency >= 1 && var.container_concurrency <= 1000 && floor(var.container_concurrency) == var.container_concurrency
+    error_message = "Container concurrency must be a whole number between 1 and 1000."
+  }
+}
+
+variable "startup_cpu_boost" {
+  description = "Give instances extra CPU while they start, shortening cold starts"
+  type        = bool
+  default     = false
+}
+
+variable "cpu_always_allocated" {
+  description = "Keep CPU allocated between requests instead of only while serving one"
+  type        = bool
+  default     = false
+}
+
+variable "startup_probe" {
+  description = "Only route traffic to an instance once its port accepts connections"
+  type        = bool
+  default     = false
+}
@@ -0,0 +1,29 @@
+"""Shared fixtures for the datacommons_deploy unit tests."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import datacommons_deploy as dc  # noqa: E402
+
+
+def make_config(*args):
+    """Build a non-interactive configuration from command-line flags."""
+    return dc.build_config(dc.parse_args([
+        "--non-interactive", "--project", "test-project", "--service-name", "svc",
+        "--region", "us-central1", *args,
+    ]))
+
+
+@pytest.fixture
+def target_dir(tmp_path):
+    """A target working directory holding copies of the Terraform files."""
+    source = Path(__file__).resolve().parent.parent / "terraform"
+    directory = tmp_path / "target"
+    directory.mkdir()
+    for tf_file in source.glob("*.tf"):
+        (directory / tf_file.name).write_bytes(tf_file.read_bytes())
+    return directory
@@ -0,0 +1,52 @@
+"""Tests for deploy checkpoints and --resume."""
+
+from conftest import dc, make_config
+
+
+def start(target_dir, *args):
+    config = make_config(*args)
+    dc.generate_tfvars(config, target_dir)
+    return dc.start_checkpoint(target_dir, config)
+
+
+def test_same_inputs_keep_completed_stages(target_dir):
+    start(target_dir)
+    dc.checkpoint_stage(target_dir, 'init')
+    dc.checkpoint_stage(target_dir, 'plan', status='planned')
+    checkpoint = start(target_dir)
+    assert set(checkpoint['stages']) == {'configure', 'init', 'plan'}
+    assert dc.resume_stage(checkpoint) == 'apply'
+
+
+def test_changed_inputs_start_over(target_dir):
+    start(target_dir)
+    dc.checkpoint_stage(target_dir, 'init')
+    checkpoint = start(target_dir, "--image", "gcr.io/test/app:2")
+    assert set(checkpoint['stages']) == {'configure'}
+    assert dc.resume_stage(checkpoint) == 'init'
+
+
+def test_state_changes_do_not_invalidate_the_checkpoint(target_dir):
+    first = start(target_dir)
+    (target_dir / "terraform.tfstate").write_text('{"lineage": "x", "serial": 3}')
+    assert start(target_dir)['inputs'] == first['inputs']
+
+
+def test_completing_a_stage_drops_the_later_ones(target_dir):
+    start(target_dir)
+    for stage in ('init', 'plan', 'apply', 'output'):
+        dc.checkpoint_stage(target_dir, stage)
+    dc.checkpoint_stage(target_dir, 'plan')
+    assert set(dc.load_checkpoint(target_dir)['stages']) == {'configure', 'init', 'plan'}
+
+
+def test_resume_follows_the_last_completed_stage():
+    # The fast path completes apply without init or plan checkpoints
+    assert dc.resume_stage({'stages': {'configure': {}, 'apply': {}}}) == 'output'
+    assert dc.resume_stage({'stages': {}}) == 'configure'
+    assert dc.resume_stage({'stages': {stage: {} for stage in dc.DEPLOY_STAGES}}) is None
+
+
+def test_checkpoint_stage_without_checkpoint_is_ignored(target_dir):
+    dc.checkpoint_stage(target_dir, 'init')
+    assert dc.load_checkpoint(target_dir) is None
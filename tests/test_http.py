@@ -0,0 +1,102 @@
+"""Tests for the load generator's HTTP client and its statistics."""
+
+import pytest
+
+from conftest import dc
+
+dc._import_async()
+asyncio = dc.asyncio
+
+
+def exchange(responses, method="GET", close=False):
+    """Send one request per scripted raw response over a single connection.
+
+    Returns:
+        list: The status of each response
+    """
+    async def main():
+        async def handle(reader, writer):
+            for response in responses:
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                writer.write(response)
+                await writer.drain()
+            if not close:
+                # Keep the connection open, as a keep-alive server does
+                await reader.read()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        connection = dc._HttpConnection(f"http://127.0.0.1:{port}/", method=method)
+        try:
+            return [await asyncio.wait_for(connection.request(), 2) for _ in responses]
+        finally:
+            connection.close()
+            server.close()
+
+    return asyncio.run(main())
+
+
+def test_content_length_body():
+    response = b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello"
+    assert exchange([response, response]) == [200, 200]
+
+
+def test_chunked_body():
+    response = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                b"5;ext=1\r\nhello\r\n0\r\n\r\n")
+    assert exchange([response, response]) == [200, 200]
+
+
+@pytest.mark.parametrize("status", [204, 304])
+def test_bodyless_statuses_on_a_keep_alive_connection(status):
+    response = f"HTTP/1.1 {status} X\r\n\r\n".encode()
+    assert exchange([response, response]) == [status, status]
+
+
+def test_head_response_has_no_body():
+    response = b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n"
+    assert exchange([response, response], method="HEAD") == [200, 200]
+
+
+def test_interim_response_is_skipped():
+    response = b"HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 201 Created\r\nContent-Length: 0\r\n\r\n"
+    assert exchange([response]) == [201]
+
+
+def test_body_until_close():
+    assert exchange([b"HTTP/1.1 200 OK\r\n\r\nuntil the end"], close=True) == [200]
+
+
+def test_rejects_non_http_urls():
+    with pytest.raises(ValueError):
+        dc._HttpConnection("ftp://example.com/")
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert dc._percentile(values, 50) == 50
+    assert dc._percentile(values, 95) == 95
+    assert dc._percentile(values, 100) == 100
+    assert dc._percentile([7], 99) == 7
+    assert dc._percentile([], 50) is None
+
+
+def test_percentiles_come_from_successful_requests(monkeypatch):
+    async def fake_load_test(url, settings, headers):
+        return {
+            'first_request': (0.5, 200),
+            'latencies': [0.01] * 8 + [3.0, 3.0],
+            'ok_latencies': [0.01] * 8,
+            'statuses': {200: 8, None: 2},
+            'elapsed': 2.0,
+        }
+
+    monkeypatch.setattr(dc, "_load_test", fake_load_test)
+    results = dc.run_load_test("http://127.0.0.1/", dict(dc.LOAD_TEST_DEFAULTS))
+    assert results['requests'] == 10
+    assert results['p99_ms'] == 10.0
+    assert results['error_rate'] == 0.2
+    assert results['status_counts'] == {'error': 2, '200': 8}
+    assert results['first_request_ms'] == 500.0
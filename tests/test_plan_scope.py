@@ -0,0 +1,107 @@
+"""Tests for narrowing plans to the resources whose inputs changed."""
+
+import subprocess
+
+import pytest
+
+from conftest import dc, make_config
+
+
+@pytest.fixture
+def deployed(target_dir):
+    """A target directory whose current tfvars were deployed successfully."""
+    dc.generate_tfvars(make_config("--image", "gcr.io/test/app:1"), target_dir)
+    dc.record_deploy(target_dir)
+    dc.mark_full_refresh(target_dir)
+    return target_dir
+
+
+def redeploy(target_dir, *args):
+    dc.generate_tfvars(make_config(*args), target_dir)
+
+
+def test_no_previous_deploy_plans_everything(target_dir):
+    dc.generate_tfvars(make_config(), target_dir)
+    assert dc.plan_scope(target_dir) is None
+
+
+def test_unchanged_inputs_skip_the_refresh(deployed):
+    redeploy(deployed, "--image", "gcr.io/test/app:1")
+    assert dc.plan_scope(deployed) == []
+
+
+def test_mapped_variable_narrows_to_its_resources(deployed):
+    redeploy(deployed, "--image", "gcr.io/test/app:2")
+    assert dc.plan_scope(deployed) == [dc.SERVICE_RESOURCE]
+
+
+def test_unmapped_variable_plans_everything(deployed):
+    dc.generate_tfvars(dc.build_config(dc.parse_args([
+        "--non-interactive", "--project", "test-project", "--service-name", "other",
+        "--region", "us-central1", "--image", "gcr.io/test/app:1",
+    ])), deployed)
+    assert dc.plan_scope(deployed) is None
+
+
+def test_pending_sync_and_changed_tf_files_plan_everything(deployed):
+    dc.record_deploy(deployed, pending_sync=True)
+    assert dc.plan_scope(deployed) is None
+
+    dc.record_deploy(deployed)
+    with open(deployed / "main.tf", "a") as f:
+        f.write("\n# changed\n")
+    assert dc.plan_scope(deployed) is None
+
+
+def test_full_refresh_is_due_after_the_interval(deployed, monkeypatch):
+    monkeypatch.setattr(dc, "FULL_REFRESH_INTERVAL", -1)
+    assert dc.plan_scope(deployed) is None
+
+
+def test_fast_path_only_for_image_and_env_changes(deployed):
+    assert dc.fast_path_changes(deployed) is None
+
+    redeploy(deployed, "--image", "gcr.io/test/app:2", "--env", "A=1")
+    assert dc.fast_path_changes(deployed) == {
+        'container_image': "gcr.io/test/app:2", 'env_vars': {'A': "1"},
+    }
+
+    redeploy(deployed, "--image", "gcr.io/test/app:2", "--cpu-limit", "2000m")
+    assert dc.fast_path_changes(deployed) is None
+
+
+def test_fast_path_waits_for_a_pending_sync(deployed):
+    dc.record_deploy(deployed, pending_sync=True)
+    redeploy(deployed, "--image", "gcr.io/test/app:2")
+    assert dc.fast_path_changes(deployed) is None
+
+
+@pytest.mark.parametrize("scope, expected", [
+    (None, []),
+    ([], ["-refresh=false"]),
+    ([dc.SERVICE_RESOURCE, dc.PUBLIC_ACCESS_RESOURCE],
+     [f"-target={dc.SERVICE_RESOURCE}", f"-target={dc.PUBLIC_ACCESS_RESOURCE}"]),
+])
+def test_plan_targets_the_scope(target_dir, monkeypatch, scope, expected):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 2, stdout="1 to change", stderr="")
+
+    monkeypatch.setattr(dc, "run_subprocess", fake_run)
+    assert dc.terraform_plan(target_dir, {}, scope) == (True, "1 to change", True)
+    extra = [arg for arg in calls[0] if arg.startswith(("-target=", "-refresh="))]
+    assert extra == expected
+
+
+@pytest.mark.parametrize("returncode, success, has_changes", [
+    (0, True, False), (2, True, True), (1, False, False), (127, False, False), (-9, False, False),
+])
+def test_plan_exit_codes(target_dir, monkeypatch, returncode, success, has_changes):
+    monkeypatch.setattr(dc, "run_subprocess", lambda cmd, **kwargs: subprocess.CompletedProcess(
+        cmd, returncode, stdout="", stderr=""))
+    result = dc.terraform_plan(target_dir, {})
+    assert result[0] is success and result[2] is has_changes
+    if not success:
+        assert result[1] == f"terraform plan exited with {returncode}"
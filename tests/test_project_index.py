@@ -0,0 +1,58 @@
+"""Tests for the project picker's search index."""
+
+from conftest import dc
+
+PROJECTS = [
+    {'id': "beta-prod", 'name': "Apps"},
+    {'id': "alpha", 'name': "Alpha Apps"},
+    {'id': "alpha-staging", 'name': "Staging"},
+    {'id': "data-commons-dev", 'name': "Data Commons Development"},
+    {'id': "x-a-p-a", 'name': "Zed"},
+]
+
+
+def ids(projects):
+    return [project['id'] for project in projects]
+
+
+def test_exact_id_ranks_before_prefix_matches():
+    index = dc.ProjectIndex(PROJECTS)
+    assert ids(index.search("alpha")) == ["alpha", "alpha-staging"]
+
+
+def test_word_prefix_of_id_or_name():
+    index = dc.ProjectIndex(PROJECTS)
+    assert ids(index.search("commons")) == ["data-commons-dev"]
+    assert ids(index.search("staging")) == ["alpha-staging"]
+
+
+def test_substring_and_fuzzy_matches():
+    index = dc.ProjectIndex(PROJECTS)
+    assert ids(index.search("ommon")) == ["data-commons-dev"]
+    assert ids(index.search("dcd")) == ["data-commons-dev"]
+
+
+def test_fuzzy_match_does_not_span_id_and_name():
+    index = dc.ProjectIndex(PROJECTS)
+    # "beta-prod" + "Apps" would contain a..p..a only across the boundary
+    assert "beta-prod" not in ids(index.search("apa"))
+    assert ids(index.search("apa")) == ["alpha", "alpha-staging", "x-a-p-a"]
+
+
+def test_search_is_case_insensitive_and_trims():
+    index = dc.ProjectIndex(PROJECTS)
+    assert ids(index.search("  ZED ")) == ["x-a-p-a"]
+
+
+def test_empty_query_lists_ids_in_order_across_pages():
+    index = dc.ProjectIndex(PROJECTS[:2])
+    index.add(PROJECTS[2:])
+    assert ids(index.search("")) == sorted(project['id'] for project in PROJECTS)
+    assert len(index) == len(PROJECTS)
+
+
+def test_limit_and_lookup():
+    index = dc.ProjectIndex(PROJECTS)
+    assert len(index.search("a", limit=2)) == 2
+    assert index.lookup(" alpha ")['name'] == "Alpha Apps"
+    assert index.lookup("missing") is None
@@ -0,0 +1,92 @@
+"""Tests for classifying and retrying transient Google API errors."""
+
+import pytest
+
+from conftest import dc
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(dc.time, "sleep", lambda seconds: None)
+
+
+@pytest.mark.parametrize("output", [
+    "Error 429: rateLimitExceeded",
+    "googleapi: Error 503: The service is currently unavailable.",
+    "RESOURCE_EXHAUSTED: Quota exceeded for quota metric",
+    "Error 403: Cloud Run Admin API has not been used in project 123 before or it is disabled.",
+    "reason: SERVICE_DISABLED",
+    "read tcp 10.0.0.1:443: connection reset by peer",
+])
+def test_transient_errors(output):
+    assert dc.is_transient_error(output)
+
+
+@pytest.mark.parametrize("output", [
+    "", None,
+    "Error 403: Permission 'run.services.create' denied",
+    "Error 409: Resource already exists",
+    "Error: Invalid value for variable",
+])
+def test_permanent_errors(output):
+    assert not dc.is_transient_error(output)
+
+
+def test_disabled_api_pattern():
+    assert dc.API_DISABLED_PATTERN.search("reason: SERVICE_DISABLED")
+    assert not dc.API_DISABLED_PATTERN.search("Error 429: rateLimitExceeded")
+
+
+@pytest.mark.parametrize("attempt", [1, 2, 3, 10])
+def test_retry_delay_is_jittered_backoff(attempt):
+    backoff = min(dc.RETRY_MAX_DELAY, dc.RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    for _ in range(20):
+        assert backoff / 2 <= dc.retry_delay(attempt) <= backoff
+
+
+def scripted(*results):
+    calls = []
+
+    def operation():
+        calls.append(None)
+        return results[min(len(calls), len(results)) - 1]
+
+    return operation, calls
+
+
+def test_retries_transient_failures_until_success():
+    operation, calls = scripted((False, "Error 503"), ('failed', "Error 429"), (True, "ok"))
+    assert dc.retry_transient(operation, "test", on_retry=lambda *args: None) == (True, "ok")
+    assert len(calls) == 3
+
+
+def test_permanent_failure_is_not_retried():
+    operation, calls = scripted((False, "Error 403: denied"))
+    assert dc.retry_transient(operation, "test") == (False, "Error 403: denied")
+    assert len(calls) == 1
+
+
+def test_gives_up_after_the_last_attempt():
+    operation, calls = scripted((False, "Error 503"))
+    assert dc.retry_transient(operation, "test", on_retry=lambda *args: None)[0] is False
+    assert len(calls) == dc.TRANSIENT_RETRY_ATTEMPTS
+
+
+def test_disabled_api_is_enabled_again_once(monkeypatch):
+    reenabled = []
+    monkeypatch.setattr(dc, "reenable_required_apis",
+                        lambda project_id: reenabled.append(project_id) or (True, ""))
+    operation, calls = scripted((False, "SERVICE_DISABLED"), (False, "SERVICE_DISABLED"),
+                                (True, "ok"))
+    result = dc.retry_transient(operation, "test", on_retry=lambda *args: None,
+                                project_id="test-project")
+    assert result == (True, "ok")
+    assert reenabled == ["test-project"]
+
+
+def test_failed_reenable_stops_retrying(monkeypatch):
+    monkeypatch.setattr(dc, "reenable_required_apis", lambda project_id: (False, "denied"))
+    operation, calls = scripted((False, "SERVICE_DISABLED"))
+    assert dc.retry_transient(operation, "test", project_id="test-project") == (
+        False, "SERVICE_DISABLED")
+    assert len(calls) == 1
@@ -0,0 +1,37 @@
+"""Tests for generating and reading back terraform.tfvars."""
+
+from conftest import dc, make_config
+
+
+def test_round_trip(target_dir):
+    config = make_config("--image", "gcr.io/test/app:1", "--env", "A=1", "--env", "B=two words")
+    dc.generate_tfvars(config, target_dir)
+    assert dc.read_tfvars(target_dir) == dc.tfvars_values(config)
+
+
+def test_template_sequences_are_escaped_and_read_back(target_dir):
+    config = make_config("--image", "gcr.io/test/app:${TAG}",
+                         "--env", "A=x${y}", "--env", "B=%{if}", "--env", "C=$${z}")
+    dc.generate_tfvars(config, target_dir)
+
+    text = (target_dir / "terraform.tfvars").read_text()
+    assert 'container_image = "gcr.io/test/app:$${TAG}"' in text
+    assert '"x$${y}"' in text and '"%%{if}"' in text
+
+    values = dc.read_tfvars(target_dir)
+    assert values['container_image'] == "gcr.io/test/app:${TAG}"
+    assert values['env_vars'] == {'A': "x${y}", 'B': "%{if}", 'C': "$${z}"}
+
+
+def test_unchanged_file_is_not_rewritten(target_dir):
+    config = make_config()
+    path = dc.generate_tfvars(config, target_dir)
+    before = path.stat().st_mtime_ns
+    dc.generate_tfvars(config, target_dir)
+    assert path.stat().st_mtime_ns == before
+
+
+def test_missing_or_unparseable_file_reads_as_empty(target_dir):
+    assert dc.read_tfvars(target_dir) == {}
+    (target_dir / "terraform.tfvars").write_text('project_id = var.other\n')
+    assert dc.read_tfvars(target_dir) == {}